@@ -1,200 +1,244 @@
-using System;
-using System.Collections.Generic;
-using System.Threading;
-
-namespace EnhanceExcel2Anything
-{
-    public class AutoLru<TKey, TValue> where TValue : class
-    {
-        private class CacheItem
-        {
-            public TValue Value;
-            public LinkedListNode<TKey> Node;
-            public int ActiveUsageCount;
-            public DateTime LastAccessTime;
-        }
-
-        private readonly Dictionary<TKey, CacheItem> _items = new();
-        private readonly LinkedList<TKey> _accessOrder = new();
-        private readonly ReaderWriterLockSlim _lock = new();
-
-        private int _currentCount;
-        private readonly int _maxCount;
-        private Timer _cleanupTimer;
-
-        /// <summary>
-        /// 全自动LRU管理，根据限定最高个数，自动清理最不活跃的
-        /// </summary>
-        /// <param name="maxCount">容器个数</param>
-        /// <param name="cleanupInterval">定时清理时间</param>
-        public AutoLru(int maxCount, TimeSpan cleanupInterval)
-        {
-            _maxCount = maxCount;
-            _cleanupTimer = new Timer(_ => Cleanup(), null, cleanupInterval, cleanupInterval);
-        }
-
-        /// <summary>
-        /// 获取或添加一个值，如果已存在，则更新访问时间，否则创建一个新值并添加到容器中。
-        /// </summary>
-        /// <param name="key"></param>
-        /// <param name="valueFactory"></param>
-        /// <returns></returns>
-        public TValue GetOrAdd(TKey key, Func<TValue> valueFactory)
-        {
-            _lock.EnterUpgradeableReadLock();
-            try
-            {
-                if (_items.TryGetValue(key, out var item))
-                {
-                    UpdateAccess(item);
-                    return item.Value;
-                }
-
-                _lock.EnterWriteLock();
-                try
-                {
-                    while (_currentCount >= _maxCount)
-                    {
-                        EvictOne();
-                    }
-
-                    var value = valueFactory();
-                    var node = new LinkedListNode<TKey>(key);
-
-                    _accessOrder.AddFirst(node);
-                    _items.Add(key, new CacheItem
-                    {
-                        Value = value,
-                        Node = node,
-                        LastAccessTime = DateTime.UtcNow
-                    });
-                    Interlocked.Increment(ref _currentCount);
-                    return value;
-                }
-                finally
-                {
-                    _lock.ExitWriteLock();
-                }
-            }
-            finally
-            {
-                _lock.ExitUpgradeableReadLock();
-            }
-        }
-
-        /// <summary>
-        /// 标记一个值被使用,增加内部引用计数
-        /// </summary>
-        /// <param name="value"></param>
-        public void MarkUsage(TValue value)
-        {
-            _lock.EnterReadLock();
-            try
-            {
-                foreach (var item in _items)
-                {
-                    if (ReferenceEquals(item.Value.Value, value))
-                    {
-                        Interlocked.Increment(ref item.Value.ActiveUsageCount);
-                        break;
-                    }
-                }
-            }
-            finally
-            {
-                _lock.ExitReadLock();
-            }
-        }
-
-        /// <summary>
-        /// 强制清空所有缓存
-        /// </summary>
-        public void Clear()
-        {
-            _lock.EnterWriteLock();
-            try
-            {
-                _accessOrder.Clear();
-                _items.Clear();
-                _currentCount = 0;
-            }
-            finally
-            {
-                _lock.ExitWriteLock();
-            }
-        }
-
-        private void UpdateAccess(CacheItem item)
-        {
-            _lock.EnterWriteLock();
-            try
-            {
-                _accessOrder.Remove(item.Node);
-                _accessOrder.AddFirst(item.Node);
-                item.LastAccessTime = DateTime.UtcNow;
-                item.ActiveUsageCount = Math.Max(0, item.ActiveUsageCount - 1);
-            }
-            finally
-            {
-                _lock.ExitWriteLock();
-            }
-        }
-
-        private void EvictOne()
-        {
-            var node = _accessOrder.Last;
-            while (node != null)
-            {
-                if (_items.TryGetValue(node.Value, out var item))
-                {
-                    // 引用次数小于等于0，则移除该节点
-                    if (item.ActiveUsageCount <= 0)
-                    {
-                        _accessOrder.Remove(node);
-                        _items.Remove(node.Value);
-                        Interlocked.Decrement(ref _currentCount);
-                        (item.Value as IDisposable)?.Dispose();
-                        return;
-                    }
-                }
-
-                node = node.Previous;
-            }
-        }
-
-        private void Cleanup()
-        {
-            _lock.EnterWriteLock();
-            try
-            {
-                var threshold = DateTime.UtcNow.AddMilliseconds(-5);
-                var nodesToRemove = new List<LinkedListNode<TKey>>();
-
-                var node = _accessOrder.Last;
-                while (node != null)
-                {
-                    if (_items.TryGetValue(node.Value, out var item))
-                    {
-                        if (item.LastAccessTime < threshold && item.ActiveUsageCount <= 0)
-                        {
-                            nodesToRemove.Add(node);
-                        }
-                    }
-
-                    node = node.Previous;
-                }
-
-                foreach (var listNode in nodesToRemove)
-                {
-                    _accessOrder.Remove(listNode);
-                    _items.Remove(listNode.Value);
-                    Interlocked.Decrement(ref _currentCount);
-                }
-            }
-            finally
-            {
-                _lock.ExitWriteLock();
-            }
-        }
-    }
+using System;
+using System.Collections.Generic;
+using System.Threading;
+
+namespace EnhanceExcel2Anything
+{
+    public class AutoLru<TKey, TValue> where TValue : class
+    {
+        private class CacheItem
+        {
+            public TValue Value;
+            public LinkedListNode<TKey> Node;
+            public int ActiveUsageCount;
+            public long Weight;
+            public DateTime LastAccessTime;
+        }
+
+        private readonly Dictionary<TKey, CacheItem> _items = new();
+        private readonly LinkedList<TKey> _accessOrder = new();
+        private readonly ReaderWriterLockSlim _lock = new();
+
+        private int _currentCount;
+        private readonly int _maxCount;
+        private long _currentWeight;
+        private long _maxWeight;
+        private Timer _cleanupTimer;
+
+        /// <summary>
+        /// 全自动LRU管理，根据限定最高个数，自动清理最不活跃的
+        /// </summary>
+        /// <param name="maxCount">容器个数</param>
+        /// <param name="cleanupInterval">定时清理时间</param>
+        public AutoLru(int maxCount, TimeSpan cleanupInterval) : this(maxCount, cleanupInterval, 0)
+        {
+        }
+
+        /// <summary>
+        /// 全自动LRU管理，同时按个数和总权重限制，超出任意一个时清理最不活跃的
+        /// </summary>
+        /// <param name="maxCount">容器个数</param>
+        /// <param name="cleanupInterval">定时清理时间</param>
+        /// <param name="maxWeight">总权重上限，小于等于0时不限制</param>
+        public AutoLru(int maxCount, TimeSpan cleanupInterval, long maxWeight)
+        {
+            _maxCount = maxCount;
+            _maxWeight = maxWeight;
+            _cleanupTimer = new Timer(_ => Cleanup(), null, cleanupInterval, cleanupInterval);
+        }
+
+        /// <summary>
+        /// 当前所有值的总权重
+        /// </summary>
+        public long CurrentWeight => Interlocked.Read(ref _currentWeight);
+
+        /// <summary>
+        /// 总权重上限，小于等于0时不限制，调小后在下次添加时淘汰
+        /// </summary>
+        public long MaxWeight
+        {
+            get => Interlocked.Read(ref _maxWeight);
+            set => Interlocked.Exchange(ref _maxWeight, value);
+        }
+
+        /// <summary>
+        /// 获取或添加一个值，如果已存在，则更新访问时间，否则创建一个新值并添加到容器中。
+        /// </summary>
+        /// <param name="key"></param>
+        /// <param name="valueFactory"></param>
+        /// <param name="weight">新值的权重，如占用的字节数，需在创建前给出以便先淘汰再创建</param>
+        /// <returns></returns>
+        public TValue GetOrAdd(TKey key, Func<TValue> valueFactory, long weight = 0)
+        {
+            _lock.EnterUpgradeableReadLock();
+            try
+            {
+                if (_items.TryGetValue(key, out var item))
+                {
+                    UpdateAccess(item);
+                    return item.Value;
+                }
+
+                _lock.EnterWriteLock();
+                try
+                {
+                    // 先淘汰再创建，新值与被淘汰的值不会同时占用内存
+                    // 所有值都在使用中时不再淘汰，允许暂时超出上限
+                    while (_currentCount >= _maxCount || IsOverWeight(weight))
+                    {
+                        if (!EvictOne()) break;
+                    }
+
+                    var value = valueFactory();
+                    var node = new LinkedListNode<TKey>(key);
+
+                    _accessOrder.AddFirst(node);
+                    _items.Add(key, new CacheItem
+                    {
+                        Value = value,
+                        Node = node,
+                        Weight = weight,
+                        LastAccessTime = DateTime.UtcNow
+                    });
+                    Interlocked.Increment(ref _currentCount);
+                    Interlocked.Add(ref _currentWeight, weight);
+                    return value;
+                }
+                finally
+                {
+                    _lock.ExitWriteLock();
+                }
+            }
+            finally
+            {
+                _lock.ExitUpgradeableReadLock();
+            }
+        }
+
+        /// <summary>
+        /// 标记一个值被使用,增加内部引用计数
+        /// </summary>
+        /// <param name="value"></param>
+        public void MarkUsage(TValue value)
+        {
+            _lock.EnterReadLock();
+            try
+            {
+                foreach (var item in _items)
+                {
+                    if (ReferenceEquals(item.Value.Value, value))
+                    {
+                        Interlocked.Increment(ref item.Value.ActiveUsageCount);
+                        break;
+                    }
+                }
+            }
+            finally
+            {
+                _lock.ExitReadLock();
+            }
+        }
+
+        /// <summary>
+        /// 强制清空所有缓存
+        /// </summary>
+        public void Clear()
+        {
+            _lock.EnterWriteLock();
+            try
+            {
+                _accessOrder.Clear();
+                _items.Clear();
+                _currentCount = 0;
+                Interlocked.Exchange(ref _currentWeight, 0);
+            }
+            finally
+            {
+                _lock.ExitWriteLock();
+            }
+        }
+
+        private void UpdateAccess(CacheItem item)
+        {
+            _lock.EnterWriteLock();
+            try
+            {
+                _accessOrder.Remove(item.Node);
+                _accessOrder.AddFirst(item.Node);
+                item.LastAccessTime = DateTime.UtcNow;
+                item.ActiveUsageCount = Math.Max(0, item.ActiveUsageCount - 1);
+            }
+            finally
+            {
+                _lock.ExitWriteLock();
+            }
+        }
+
+        private bool IsOverWeight(long weight)
+        {
+            var maxWeight = MaxWeight;
+            return maxWeight > 0 && _currentCount > 0 && _currentWeight + weight > maxWeight;
+        }
+
+        private bool EvictOne()
+        {
+            var node = _accessOrder.Last;
+            while (node != null)
+            {
+                if (_items.TryGetValue(node.Value, out var item))
+                {
+                    // 引用次数小于等于0，则移除该节点
+                    if (item.ActiveUsageCount <= 0)
+                    {
+                        _accessOrder.Remove(node);
+                        _items.Remove(node.Value);
+                        Interlocked.Decrement(ref _currentCount);
+                        Interlocked.Add(ref _currentWeight, -item.Weight);
+                        (item.Value as IDisposable)?.Dispose();
+                        return true;
+                    }
+                }
+
+                node = node.Previous;
+            }
+
+            return false;
+        }
+
+        private void Cleanup()
+        {
+            _lock.EnterWriteLock();
+            try
+            {
+                var threshold = DateTime.UtcNow.AddMilliseconds(-5);
+                var nodesToRemove = new List<LinkedListNode<TKey>>();
+
+                var node = _accessOrder.Last;
+                while (node != null)
+                {
+                    if (_items.TryGetValue(node.Value, out var item))
+                    {
+                        if (item.LastAccessTime < threshold && item.ActiveUsageCount <= 0)
+                        {
+                            nodesToRemove.Add(node);
+                        }
+                    }
+
+                    node = node.Previous;
+                }
+
+                foreach (var listNode in nodesToRemove)
+                {
+                    Interlocked.Add(ref _currentWeight, -_items[listNode.Value].Weight);
+                    _accessOrder.Remove(listNode);
+                    _items.Remove(listNode.Value);
+                    Interlocked.Decrement(ref _currentCount);
+                }
+            }
+            finally
+            {
+                _lock.ExitWriteLock();
+            }
+        }
+    }
 }
\ No newline at end of file
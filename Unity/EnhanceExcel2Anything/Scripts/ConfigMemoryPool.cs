@@ -1,45 +1,69 @@
-﻿using System;
-
-namespace EnhanceExcel2Anything
-{
-    /// <summary>
-    /// 所有配置对象缓存池
-    /// 统一获取统一管理配置对象，方便动态释放
-    /// </summary>
-    public static class ConfigMemoryPool
-    {
-        //最大保留50份配置，可以按照具体的配置体量调整，每10分钟清理一次
-        private static readonly AutoLru<string, ConfigBase> _configPool = new AutoLru<string, ConfigBase>(50, TimeSpan.FromMinutes(10));
-
-        public static T Get<T>() where T : ConfigBase, new()
-        {
-            var key = typeof(T).FullName;
-            return (T)_configPool.GetOrAdd(key, () => new T());
-        }
-        
-        public static bool TryGet<T>(out T config) where T : ConfigBase, new()
-        {
-            try
-            {
-                config = Get<T>();
-                return true;
-            }
-            catch (InvalidOperationException ex) when (ex.Message.Contains("full"))
-            {
-                //紧急扩容
-                config = new T();
-                return true;
-            }
-            catch
-            {
-                config = default;
-                return false;
-            }
-        }
-
-        internal static void MarkUsage(ConfigBase config)
-        {
-            _configPool.MarkUsage(config);
-        }
-    }
+﻿using System;
+
+namespace EnhanceExcel2Anything
+{
+    /// <summary>
+    /// 所有配置对象缓存池
+    /// 统一获取统一管理配置对象，方便动态释放
+    /// </summary>
+    public static class ConfigMemoryPool
+    {
+        //最大保留50份配置，可以按照具体的配置体量调整，每10分钟清理一次
+        //按导出时估算的内存占用计算权重，字节预算默认不限制，可按平台通过MaxBytes设置(参考导出目录的footprint.json)
+        private static readonly AutoLru<string, ConfigBase> _configPool = new AutoLru<string, ConfigBase>(50, TimeSpan.FromMinutes(10), 0);
+
+        /// <summary>
+        /// 所有配置估算的内存占用上限(字节)，小于等于0时只按个数限制
+        /// </summary>
+        public static long MaxBytes
+        {
+            get => _configPool.MaxWeight;
+            set => _configPool.MaxWeight = value;
+        }
+
+        /// <summary>
+        /// 当前缓存的配置估算的内存占用(字节)
+        /// </summary>
+        public static long CurrentBytes => _configPool.CurrentWeight;
+
+        public static T Get<T>() where T : ConfigBase, new()
+        {
+            var key = typeof(T).FullName;
+            return (T)_configPool.GetOrAdd(key, () => new T(), Footprint<T>.Bytes);
+        }
+        
+        public static bool TryGet<T>(out T config) where T : ConfigBase, new()
+        {
+            try
+            {
+                config = Get<T>();
+                return true;
+            }
+            catch (InvalidOperationException ex) when (ex.Message.Contains("full"))
+            {
+                //紧急扩容
+                config = new T();
+                return true;
+            }
+            catch
+            {
+                config = default;
+                return false;
+            }
+        }
+
+        internal static void MarkUsage(ConfigBase config)
+        {
+            _configPool.MarkUsage(config);
+        }
+
+        /// <summary>
+        /// 每种配置导出时估算的字节数，在创建缓存的配置前给出以便先淘汰
+        /// 配置在首次访问时才构造数据，空实例不占用配置数据的内存
+        /// </summary>
+        private static class Footprint<T> where T : ConfigBase, new()
+        {
+            public static readonly long Bytes = new T().EstimatedBytes;
+        }
+    }
 }
\ No newline at end of file
@@ -0,0 +1,114 @@
+﻿using System;
+using System.Text;
+
+namespace EnhanceExcel2Anything
+{
+    /// <summary>
+    /// 二进制多语言分片，与导出工具 string_pool.py 的格式对应
+    /// 文件头(魔数 E2SP, 版本, 条目数) + 按键哈希排序的索引(哈希, 偏移, 长度) + UTF-8数据区
+    /// 查找时二分索引，只解码命中的字符串，不会分配整个语言的内存
+    /// </summary>
+    public sealed class StringPoolShard
+    {
+        private const int HeaderSize = 12;
+        private const int EntrySize = 16;
+        private const uint Version = 1;
+        private const ulong FnvOffset = 0xcbf29ce484222325;
+        private const ulong FnvPrime = 0x100000001b3;
+
+        private readonly byte[] _data;
+        private readonly int _count;
+        private readonly int _blobOffset;
+
+        /// <summary>
+        /// 计算键哈希时复用的缓冲区，每个线程一份
+        /// </summary>
+        [ThreadStatic] private static byte[] _keyBuffer;
+
+        public int Count => _count;
+
+        public StringPoolShard(byte[] data)
+        {
+            if (data == null || data.Length < HeaderSize || data[0] != 'E' || data[1] != '2' || data[2] != 'S' ||
+                data[3] != 'P' || ReadUInt32(data, 4) != Version)
+            {
+                throw new FormatException("不是有效的多语言分片");
+            }
+
+            _data = data;
+            _count = (int)ReadUInt32(data, 8);
+            _blobOffset = HeaderSize + EntrySize * _count;
+        }
+
+        /// <summary>
+        /// 查找键对应的文本
+        /// </summary>
+        /// <param name="key"></param>
+        /// <param name="value"></param>
+        /// <returns></returns>
+        public bool TryGet(string key, out string value)
+        {
+            ulong hash = Hash(key);
+            int low = 0;
+            int high = _count - 1;
+            while (low <= high)
+            {
+                int mid = (low + high) >> 1;
+                int entry = HeaderSize + EntrySize * mid;
+                ulong midHash = ReadUInt64(_data, entry);
+                if (midHash == hash)
+                {
+                    int offset = (int)ReadUInt32(_data, entry + 8);
+                    int length = (int)ReadUInt32(_data, entry + 12);
+                    value = Encoding.UTF8.GetString(_data, _blobOffset + offset, length);
+                    return true;
+                }
+
+                if (midHash < hash)
+                {
+                    low = mid + 1;
+                }
+                else
+                {
+                    high = mid - 1;
+                }
+            }
+
+            value = null;
+            return false;
+        }
+
+        /// <summary>
+        /// FNV-1a 64位哈希，与导出工具一致
+        /// </summary>
+        private static ulong Hash(string key)
+        {
+            int maxBytes = Encoding.UTF8.GetMaxByteCount(key.Length);
+            if (_keyBuffer == null || _keyBuffer.Length < maxBytes)
+            {
+                _keyBuffer = new byte[Math.Max(maxBytes, 256)];
+            }
+
+            int byteCount = Encoding.UTF8.GetBytes(key, 0, key.Length, _keyBuffer, 0);
+            ulong hash = FnvOffset;
+            for (int i = 0; i < byteCount; i++)
+            {
+                hash ^= _keyBuffer[i];
+                hash *= FnvPrime;
+            }
+
+            return hash;
+        }
+
+        // 文件为小端序，与平台字节序无关
+        private static uint ReadUInt32(byte[] data, int offset)
+        {
+            return (uint)(data[offset] | data[offset + 1] << 8 | data[offset + 2] << 16 | data[offset + 3] << 24);
+        }
+
+        private static ulong ReadUInt64(byte[] data, int offset)
+        {
+            return ReadUInt32(data, offset) | (ulong)ReadUInt32(data, offset + 4) << 32;
+        }
+    }
+}
@@ -1,6 +1,6 @@
-﻿namespace EnhanceExcel2Anything
-{
-    public partial class ATestSkillDB
-    {
-    }
+﻿namespace EnhanceExcel2Anything
+{
+    public partial class ATestSkillDB
+    {
+    }
 }
\ No newline at end of file
@@ -0,0 +1,182 @@
+﻿import argparse
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import openpyxl
+import yaml
+
+# 可生成的列类型，权重决定各类型在表中出现的比例
+DEFAULT_TYPE_MIX = {
+    'int': 3,
+    'long': 1,
+    'float': 2,
+    'bool': 1,
+    'string': 3,
+    'datetime': 1,
+    'list<int>': 2,
+    'map<int,string>': 1,
+    'struct': 2,
+    'enum': 1,
+}
+
+CHINESE_WORDS = ['长剑', '盾牌', '药水', '火焰', '冰霜', '雷电', '勇者', '森林', '王国', '宝箱', '任务', '奖励']
+
+
+@dataclass
+class WorkbookSpec:
+    """生成参数，相同参数和种子生成的数据完全一致"""
+    rows: int = 1000
+    columns: int = 12
+    sheets: int = 2
+    # 除主键外引用其它表主键的列占比
+    link_density: float = 0.1
+    seed: int = 1
+    type_mix: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_TYPE_MIX))
+
+
+class WorkbookGenerator:
+    """按配置生成用于基准测试的Excel文件"""
+
+    def __init__(self, custom_types_file: str = './custom/custom_types.yaml'):
+        with open(custom_types_file, 'r', encoding='utf-8') as f:
+            custom_types = yaml.safe_load(f) or {}
+        # 只使用字段均为内置类型的结构体，以便直接生成单元格内容
+        self.struct_types = {
+            name: defs['fields'] for name, defs in custom_types.items()
+            if defs.get('type') in ('struct', 'class')
+            and all(self.__is_simple_type(t) for t in defs.get('fields', {}).values())
+        }
+        self.enum_types = {
+            name: defs['fields'] for name, defs in custom_types.items() if defs.get('type') == 'enum'
+        }
+
+    def generate(self, output_dir: str, spec: WorkbookSpec, count: int = 1) -> List[Path]:
+        """生成count个Excel，返回文件路径"""
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        files = []
+        for index in range(count):
+            rng = random.Random(f'{spec.seed}-{index}')
+            file_path = Path(output_dir) / f'bench_{index:03d}.xlsx'
+            self.__generate_workbook(file_path, spec, index, rng)
+            files.append(file_path)
+        return files
+
+    def __generate_workbook(self, file_path: Path, spec: WorkbookSpec, index: int, rng: random.Random):
+        wb = openpyxl.Workbook()
+        wb.remove(wb.active)
+        # 第一张表作为被链接的目标表
+        target_name = f'BenchW{index}S0'
+        for sheet_idx in range(spec.sheets):
+            export_name = f'BenchW{index}S{sheet_idx}'
+            columns = self.__pick_columns(spec, rng, link_target=target_name if sheet_idx > 0 else None)
+            sheet = wb.create_sheet(f'Sheet{sheet_idx}')
+            sheet.append([export_name] + [name for name, _, _ in columns])
+            sheet.append([None] + [field_type for _, field_type, _ in columns])
+            sheet.append([None] + [checks for _, _, checks in columns])
+            sheet.append([None] + [f'{name}说明' for name, _, _ in columns])
+            for row_idx in range(spec.rows):
+                row = [None]
+                for name, field_type, checks in columns:
+                    if name == 'id':
+                        row.append(row_idx + 1)
+                    elif checks.startswith('CheckLink'):
+                        row.append(rng.randint(1, spec.rows))
+                    else:
+                        row.append(self.__make_value(field_type, rng))
+                sheet.append(row)
+        # 固定文档属性，避免生成时间写入文件内容
+        wb.properties.created = wb.properties.modified = datetime(2024, 1, 1)
+        wb.save(file_path)
+
+    def __pick_columns(self, spec: WorkbookSpec, rng: random.Random, link_target: str = None) -> list:
+        """返回(字段名, 类型, 标签)列表，第一列为主键"""
+        columns = [('id', 'int', 'CheckRepeat')]
+        link_count = round((spec.columns - 1) * spec.link_density) if link_target else 0
+        kinds = [kind for kind in spec.type_mix if self.__is_available_kind(kind)]
+        weights = [spec.type_mix[kind] for kind in kinds]
+        for col_idx in range(1, spec.columns):
+            name = f'f{col_idx}'
+            if col_idx <= link_count:
+                columns.append((name, 'int', f'CheckLink:{link_target}_id'))
+                continue
+            kind = rng.choices(kinds, weights)[0]
+            if kind == 'struct':
+                field_type = rng.choice(sorted(self.struct_types))
+            elif kind == 'enum':
+                field_type = rng.choice(sorted(self.enum_types))
+            else:
+                field_type = kind
+            checks = 'DateFormat:%Y-%m-%d %H:%M:%S' if kind == 'datetime' else ''
+            columns.append((name, field_type, checks))
+        return columns
+
+    def __make_value(self, field_type: str, rng: random.Random):
+        if field_type in self.struct_types:
+            fields = self.struct_types[field_type]
+            return '{' + ','.join(f'{name}:{self.__make_struct_field(t, rng)}' for name, t in fields.items()) + '}'
+        if field_type in self.enum_types:
+            return rng.choice(self.enum_types[field_type])
+        if field_type == 'list<int>':
+            return '|'.join(str(rng.randint(0, 999)) for _ in range(rng.randint(1, 5)))
+        if field_type == 'map<int,string>':
+            return '|'.join(f'{k}:{self.__make_string(rng)}' for k in rng.sample(range(100), rng.randint(1, 4)))
+        if field_type == 'datetime':
+            moment = datetime(2024, 1, 1) + timedelta(seconds=rng.randint(0, 365 * 86400))
+            return moment.strftime('%Y-%m-%d %H:%M:%S')
+        return self.__make_scalar(field_type, rng)
+
+    def __make_struct_field(self, field_type: str, rng: random.Random) -> str:
+        if field_type.startswith('list<'):
+            inner = field_type[5:-1]
+            return '"' + '|'.join(str(self.__make_scalar(inner, rng)) for _ in range(rng.randint(1, 3))) + '"'
+        value = self.__make_scalar(field_type, rng)
+        return f'"{value}"' if field_type == 'string' else str(value).lower()
+
+    def __make_scalar(self, field_type: str, rng: random.Random):
+        if field_type in ('int', 'long'):
+            return rng.randint(-1000, 100000)
+        if field_type in ('float', 'double', 'decimal'):
+            return round(rng.uniform(0, 1000), 2)
+        if field_type == 'bool':
+            return rng.choice(['true', 'false'])
+        return self.__make_string(rng)
+
+    def __make_string(self, rng: random.Random) -> str:
+        # 约一半字符串包含中文，覆盖多语言提取
+        if rng.random() < 0.5:
+            return ''.join(rng.choice(CHINESE_WORDS) for _ in range(rng.randint(1, 3)))
+        return f'text{rng.randint(0, 9999)}'
+
+    def __is_available_kind(self, kind: str) -> bool:
+        if kind == 'struct':
+            return bool(self.struct_types)
+        if kind == 'enum':
+            return bool(self.enum_types)
+        return True
+
+    @staticmethod
+    def __is_simple_type(field_type: str) -> bool:
+        simple = ('int', 'long', 'float', 'double', 'bool', 'string')
+        return field_type in simple or (field_type.startswith('list<') and field_type[5:-1] in simple)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成基准测试用的Excel')
+    parser.add_argument('output_dir', type=str)
+    parser.add_argument('--workbooks', type=int, default=1)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--columns', type=int, default=12)
+    parser.add_argument('--sheets', type=int, default=2)
+    parser.add_argument('--link_density', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    spec = WorkbookSpec(args.rows, args.columns, args.sheets, args.link_density, args.seed)
+    for file_path in WorkbookGenerator().generate(args.output_dir, spec, args.workbooks):
+        print(f'已生成: {file_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+﻿import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from benchmarks.generator import WorkbookGenerator, WorkbookSpec
+from core.excel_reader import ExcelProcessor
+from core.exporters.factory import create_exporter
+from core.i18n.extractor import I18NExtractor
+from core.processors.merger import SheetMergerProcessor
+from core.processors.validators import RepeatValidator, LinkValidator, ExportNameValidator
+from core.utils.type_system import TypeSystem
+
+EXPORT_TYPES = ['csharp', 'json', 'bin']
+
+
+class BenchmarkHarness:
+    """
+    分阶段计时：读取Excel、合并、每个校验器、每个导出器
+    每个阶段重复执行多次，记录最小值和中位数
+    """
+
+    def __init__(self, spec: WorkbookSpec, workbooks: int = 1, repeat: int = 3):
+        self.spec = spec
+        self.workbooks = workbooks
+        self.repeat = repeat
+        self.custom_dir = Path('./custom').resolve()
+        self.results = {}
+
+    def run(self) -> dict:
+        # 导出器会在当前目录写入多语言文件，在临时目录中运行避免污染工程
+        work_dir = Path(tempfile.mkdtemp(prefix='excel_bench_'))
+        cwd = os.getcwd()
+        try:
+            shutil.copytree(self.custom_dir, work_dir / 'custom')
+            os.chdir(work_dir)
+            self.__run_stages(work_dir)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return {
+            'meta': {
+                'spec': asdict(self.spec),
+                'workbooks': self.workbooks,
+                'repeat': self.repeat,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+            },
+            'stages': self.results,
+        }
+
+    def __run_stages(self, work_dir: Path):
+        input_dir = work_dir / 'excels'
+        files = WorkbookGenerator('./custom/custom_types.yaml').generate(str(input_dir), self.spec, self.workbooks)
+
+        type_system = self.__measure('type_system', lambda: self.__create_type_system(input_dir, work_dir, 'csharp'))
+
+        def read_all():
+            processor = ExcelProcessor(type_system)
+            return [config for file_path in files for config in processor.process_workbook(str(file_path))]
+
+        configs = self.__measure('process_workbook', read_all)
+        merged = self.__measure('merge', lambda: SheetMergerProcessor(type_system).merge(configs))
+        merged_sorted = self.__measure('merge_sorted', lambda: SheetMergerProcessor(type_system, True).merge(configs))
+
+        for validator_class in (RepeatValidator, LinkValidator, ExportNameValidator):
+            errors = self.__measure(f'validate.{validator_class.__name__}',
+                                    lambda: validator_class().validate(merged))
+            if errors:
+                raise RuntimeError(f'生成的数据校验失败: {errors[:5]}')
+        self.__measure('validate.RepeatValidator.sorted', lambda: RepeatValidator().validate(merged_sorted))
+
+        for export_type in EXPORT_TYPES:
+            export_type_system = self.__create_type_system(input_dir, work_dir, export_type)
+            self.__measure(f'export.{export_type}', lambda: self.__export_all(export_type_system, merged))
+
+    def __measure(self, stage: str, func):
+        durations = []
+        result = None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = func()
+            durations.append(time.perf_counter() - start)
+        self.results[stage] = {
+            'min': min(durations),
+            'median': statistics.median(durations),
+        }
+        print(f'{stage:<40} 中位数 {self.results[stage]["median"] * 1000:>10.2f} ms')
+        return result
+
+    @staticmethod
+    def __create_type_system(input_dir: Path, work_dir: Path, export_type: str) -> TypeSystem:
+        type_system = TypeSystem(str(input_dir), str(work_dir / f'out_{export_type}'), 'cs', export_type)
+        type_system.load_custom_types('./custom/custom_types.yaml')
+        return type_system
+
+    @staticmethod
+    def __export_all(type_system: TypeSystem, configs: list):
+        exporter = create_exporter(type_system)
+        exporter.before_export()
+        extractor = I18NExtractor(type_system, exporter.i18n)
+        for config in configs:
+            extractor.extract(config)
+            exporter.export_base_language_class(config)
+            exporter.export_data(config)
+        exporter.after_export()
+
+
+def compare_results(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """对比中位数，超过基线(1+threshold)倍的阶段视为性能回退"""
+    regressions = []
+    for stage, result in current['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if base is None or base['median'] <= 0:
+            continue
+        ratio = result['median'] / base['median']
+        if ratio > 1 + threshold:
+            regressions.append(
+                f'{stage}: {base["median"] * 1000:.2f} ms -> {result["median"] * 1000:.2f} ms (+{(ratio - 1) * 100:.1f}%)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分阶段性能基准测试，需在src目录下运行')
+    parser.add_argument('--workbooks', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--columns', type=int, default=12)
+    parser.add_argument('--sheets', type=int, default=2)
+    parser.add_argument('--link_density', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', type=str, help='保存本次结果为JSON基线')
+    parser.add_argument('--baseline', type=str, help='与指定的JSON基线对比')
+    parser.add_argument('--threshold', type=float, default=0.2, help='允许的性能回退比例，默认0.2即20%%')
+    args = parser.parse_args()
+
+    spec = WorkbookSpec(args.rows, args.columns, args.sheets, args.link_density, args.seed)
+    current = BenchmarkHarness(spec, args.workbooks, args.repeat).run()
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f'结果已保存: {args.save}')
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('spec') != current['meta']['spec']:
+            print('警告: 基线的生成参数与本次不同，对比结果可能没有意义')
+        regressions = compare_results(current, baseline, args.threshold)
+        if regressions:
+            print('性能回退:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('未发现性能回退')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+﻿import re
+import threading
+from typing import Any, Dict, Tuple
+from core.models import FieldMeta
+from core.utils.type_system import TypeSystem, TypeDescriptor, TypeKind
+from core.utils.exceptions import TypeCastError, JsonTypeCastError
+from core.utils.utils import FrozenDict
+
+LIST = TypeKind.LIST
+MAP = TypeKind.MAP
+# struct和class的配置语法相同
+STRUCT = TypeKind.STRUCT
+
+DEFAULT_SEPARATORS = frozenset('|')
+PAIR_SEPARATOR = ':'
+# Json上下文中无引号值的结束字符
+JSON_VALUE_STOPS = frozenset(',}] \t\r\n')
+WHITESPACE = frozenset(' \t\r\n')
+JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+JSON_NUMBER_PATTERN = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+
+
+class TypeNode:
+    """编译后的字段类型：类型描述加上字段标签决定的分隔符，解析时直接按节点产出目标类型的值"""
+    __slots__ = ('kind', 'type_name', 'checks', 'converter', 'children', 'fields', 'list_seps', 'map_seps')
+
+    def __init__(self, descriptor: TypeDescriptor, checks: Tuple[str, ...]):
+        self.kind = STRUCT if descriptor.kind == TypeKind.CLASS else descriptor.kind
+        self.type_name = descriptor.name
+        self.checks = checks
+        self.converter = descriptor.converter
+        self.children = ()
+        self.fields = {}
+        self.list_seps = DEFAULT_SEPARATORS
+        self.map_seps = DEFAULT_SEPARATORS
+
+
+class CellParser:
+    """
+    单元格配置语法解析器，一次线性扫描解析嵌套值：
+    - 列表: 1|2|3 分隔符由ListSeparator指定
+    - 字典: key:value|key:value 分隔符由MapSeparator指定
+    - 结构体/类: {id:1,value:"a"} 键可不加双引号的Json对象
+    分隔符标签中的每个字符都视为一个分隔符
+    解析结果为不可变对象：列表为tuple，字典和结构体为FrozenDict
+    """
+
+    def __init__(self, type_system: TypeSystem):
+        self.type_system = type_system
+        self.__nodes: Dict[tuple, TypeNode] = {}
+        self.__lock = threading.Lock()
+
+    def parse(self, raw_value: Any, field: FieldMeta) -> Any:
+        """按字段类型解析单元格"""
+        node = self.compile(field.type, tuple(field.checks))
+        text = raw_value if isinstance(raw_value, str) else str(raw_value)
+        return self.__parse_cell(node, text)
+
+    def compile(self, type_name: str, checks: Tuple[str, ...] = ()) -> TypeNode:
+        """编译字段类型，结果按(类型,标签)缓存"""
+        descriptor = self.type_system.describe(type_name)
+        node = self.__nodes.get((descriptor, checks))
+        if node is None:
+            with self.__lock:
+                # 解析线程不加锁读取缓存，节点编译完整后才加入缓存
+                pending = {}
+                node = self.__compile(descriptor, checks, pending)
+                self.__nodes.update(pending)
+        return node
+
+    def __compile(self, descriptor: TypeDescriptor, checks: Tuple[str, ...], pending: dict) -> TypeNode:
+        key = (descriptor, checks)
+        node = self.__nodes.get(key) or pending.get(key)
+        if node is not None:
+            return node
+
+        node = TypeNode(descriptor, checks)
+        # 先登记再编译子节点，自定义类型自引用时不会无限递归
+        pending[key] = node
+
+        for tag in checks:
+            if tag.startswith('ListSeparator:'):
+                node.list_seps = frozenset(tag.split(':', 1)[1]) or DEFAULT_SEPARATORS
+            elif tag.startswith('MapSeparator:'):
+                node.map_seps = frozenset(tag.split(':', 1)[1]) or DEFAULT_SEPARATORS
+
+        if node.kind in (LIST, MAP):
+            node.children = tuple(self.__compile(child, checks, pending) for child in descriptor.children)
+        elif node.kind == STRUCT:
+            # 结构体内部字段不继承外部字段的标签
+            node.fields = {
+                field_name: self.__compile(field_type, (), pending)
+                for field_name, field_type in zip(descriptor.field_names, descriptor.children)
+            }
+        return node
+
+    def __parse_cell(self, node: TypeNode, text: str):
+        """解析完整的单元格文本"""
+        if node.kind == STRUCT:
+            value, pos = self.__parse_object(node, text, self.__skip_ws(text, 0))
+        else:
+            value, pos = self.__parse_delimited(node, text, 0, frozenset())
+        pos = self.__skip_ws(text, pos)
+        if pos < len(text):
+            self.__raise_syntax(node, text, pos, f"多余的字符 '{text[pos]}'")
+        return value
+
+    def __parse_delimited(self, node: TypeNode, text: str, pos: int, stops: frozenset):
+        """解析分隔符语法的值，遇到stops中的字符结束"""
+        if node.kind == LIST:
+            return self.__parse_list(node, text, pos, stops)
+        if node.kind == MAP:
+            return self.__parse_map(node, text, pos, stops)
+        if node.kind == STRUCT:
+            return self.__parse_object(node, text, self.__skip_ws(text, pos))
+
+        start = pos
+        length = len(text)
+        while pos < length and text[pos] not in stops:
+            pos += 1
+        return self.__cast_token(node, text[start:pos].strip()), pos
+
+    def __parse_list(self, node: TypeNode, text: str, pos: int, stops: frozenset):
+        result = []
+        seps = node.list_seps
+        item_stops = stops | seps
+        length = len(text)
+        while True:
+            pos = self.__skip_ws(text, pos)
+            # 外层分隔符优先，与先切分外层再切分内层的语义一致
+            if pos >= length or text[pos] in stops:
+                break
+            if text[pos] in seps:
+                pos += 1
+                continue
+            item, pos = self.__parse_delimited(node.children[0], text, pos, item_stops)
+            result.append(item)
+            pos = self.__skip_ws(text, pos)
+            if pos < length and text[pos] not in stops:
+                if text[pos] not in seps:
+                    self.__raise_syntax(node, text, pos, f"列表元素之后应为分隔符，实际为 '{text[pos]}'")
+                pos += 1
+        return tuple(result), pos
+
+    def __parse_map(self, node: TypeNode, text: str, pos: int, stops: frozenset):
+        result = {}
+        seps = node.map_seps
+        value_stops = stops | seps
+        key_stops = value_stops | {PAIR_SEPARATOR}
+        key_node, value_node = node.children
+        length = len(text)
+        while True:
+            pos = self.__skip_ws(text, pos)
+            if pos >= length or text[pos] in stops:
+                break
+            if text[pos] in seps:
+                pos += 1
+                continue
+            key, pos = self.__parse_delimited(key_node, text, pos, key_stops)
+            if pos >= length or text[pos] != PAIR_SEPARATOR:
+                self.__raise_syntax(node, text, pos, "键值对缺少 ':'")
+            value, pos = self.__parse_delimited(value_node, text, pos + 1, value_stops)
+            result[key] = value
+            pos = self.__skip_ws(text, pos)
+            if pos < length and text[pos] not in stops:
+                if text[pos] not in seps:
+                    self.__raise_syntax(node, text, pos, f"键值对之后应为分隔符，实际为 '{text[pos]}'")
+                pos += 1
+        return FrozenDict(result), pos
+
+    def __parse_object(self, node: TypeNode, text: str, pos: int):
+        """解析Json对象，node为None时不做类型约束"""
+        length = len(text)
+        if pos >= length or text[pos] != '{':
+            self.__raise_json(text, pos, "应为 '{'")
+        pos = self.__skip_ws(text, pos + 1)
+        values = {}
+        extra = []
+        if pos < length and text[pos] == '}':
+            pos += 1
+        else:
+            while True:
+                pos = self.__skip_ws(text, pos)
+                key, pos = self.__parse_key(text, pos)
+                pos = self.__skip_ws(text, pos)
+                if pos >= length or text[pos] != ':':
+                    self.__raise_json(text, pos, f"字段 '{key}' 之后应为 ':'")
+                field_node = node.fields.get(key) if node is not None else None
+                if node is not None and field_node is None:
+                    # 多余字段仍需跳过其值，统一在后面报错
+                    _, pos = self.__parse_json_value(None, text, pos + 1)
+                    extra.append(key)
+                else:
+                    values[key], pos = self.__parse_field_value(field_node, key, text, pos + 1)
+                pos = self.__skip_ws(text, pos)
+                if pos < length and text[pos] == ',':
+                    pos += 1
+                    continue
+                if pos < length and text[pos] == '}':
+                    pos += 1
+                    break
+                self.__raise_json(text, pos, "应为 ',' 或 '}'")
+
+        if node is None:
+            return FrozenDict(values), pos
+
+        # 验证字段完整性
+        if missing := [name for name in node.fields if name not in values]:
+            raise JsonTypeCastError(
+                f"缺少必要字段: {', '.join(missing)}",
+                original_value=text,
+                missing_fields=missing
+            )
+        # 检查多余字段
+        if extra:
+            raise JsonTypeCastError(
+                f"存在多余字段: {', '.join(extra)}",
+                original_value=text,
+                extra_fields=extra
+            )
+        return FrozenDict((name, values[name]) for name in node.fields), pos
+
+    def __parse_field_value(self, node: TypeNode, field_name: str, text: str, pos: int):
+        try:
+            return self.__parse_json_value(node, text, pos)
+        except JsonTypeCastError as e:
+            e.add_context(f"字段 '{field_name}'")
+            raise
+        except Exception as e:
+            raise JsonTypeCastError(
+                f"字段 '{field_name}' 转换失败: {e}",
+                original_value=text,
+                data_type=node.type_name
+            )
+
+    def __parse_json_value(self, node: TypeNode, text: str, pos: int):
+        """解析Json上下文中的值，按字段类型直接转换"""
+        pos = self.__skip_ws(text, pos)
+        if pos >= len(text):
+            self.__raise_json(text, pos, "缺少值")
+        char = text[pos]
+        if char == '"':
+            value, pos = self.__parse_string(text, pos)
+            return self.__from_string(node, value), pos
+        if char == '{':
+            if node is not None and node.kind != STRUCT:
+                self.__raise_json(text, pos, f"类型 {node.type_name} 不能配置为对象")
+            return self.__parse_object(node, text, pos)
+        if char == '[':
+            if node is not None and node.kind != LIST:
+                self.__raise_json(text, pos, f"类型 {node.type_name} 不能配置为数组")
+            return self.__parse_array(node, text, pos)
+
+        start = pos
+        length = len(text)
+        while pos < length and text[pos] not in JSON_VALUE_STOPS:
+            pos += 1
+        token = text[start:pos]
+        # 布尔值和null不区分大小写
+        lower_token = token.lower()
+        if lower_token == 'true':
+            literal = True
+        elif lower_token == 'false':
+            literal = False
+        elif lower_token == 'null':
+            literal = None
+        elif JSON_NUMBER_PATTERN.fullmatch(token):
+            literal = int(token) if token.lstrip('-').isdigit() else float(token)
+        else:
+            self.__raise_json(text, start, f"无效的值 '{token}'")
+        return self.__from_literal(node, literal), pos
+
+    def __parse_array(self, node: TypeNode, text: str, pos: int):
+        item_node = node.children[0] if node is not None else None
+        result = []
+        pos = self.__skip_ws(text, pos + 1)
+        if pos < len(text) and text[pos] == ']':
+            return (), pos + 1
+        while True:
+            item, pos = self.__parse_json_value(item_node, text, pos)
+            result.append(item)
+            pos = self.__skip_ws(text, pos)
+            if pos < len(text) and text[pos] == ',':
+                pos += 1
+                continue
+            if pos < len(text) and text[pos] == ']':
+                return tuple(result), pos + 1
+            self.__raise_json(text, pos, "应为 ',' 或 ']'")
+
+    def __parse_key(self, text: str, pos: int):
+        if pos < len(text) and text[pos] == '"':
+            return self.__parse_string(text, pos)
+        start = pos
+        while pos < len(text) and (text[pos].isalnum() or text[pos] == '_'):
+            pos += 1
+        if pos == start or text[start].isdigit():
+            self.__raise_json(text, start, "应为字段名")
+        return text[start:pos], pos
+
+    def __parse_string(self, text: str, pos: int):
+        """解析带转义的Json字符串，pos指向起始双引号"""
+        parts = []
+        pos += 1
+        length = len(text)
+        while True:
+            quote = text.find('"', pos)
+            escape = text.find('\\', pos, quote if quote >= 0 else length)
+            if escape < 0:
+                if quote < 0:
+                    self.__raise_json(text, length, "字符串缺少结束的双引号")
+                parts.append(text[pos:quote])
+                return ''.join(parts), quote + 1
+            parts.append(text[pos:escape])
+            code = text[escape + 1:escape + 2]
+            if code == 'u':
+                hex_code = text[escape + 2:escape + 6]
+                if len(hex_code) != 4 or not all(c in '0123456789abcdefABCDEF' for c in hex_code):
+                    self.__raise_json(text, escape, "无效的\\u转义")
+                parts.append(chr(int(hex_code, 16)))
+                pos = escape + 6
+            elif code in JSON_ESCAPES:
+                parts.append(JSON_ESCAPES[code])
+                pos = escape + 2
+            else:
+                self.__raise_json(text, escape, f"无效的转义字符 '\\{code}'")
+
+    def __from_string(self, node: TypeNode, value: str):
+        """Json字符串转为字段类型，复合类型按单元格语法继续解析"""
+        if node is None:
+            return value
+        value = value.strip()
+        if not value:
+            return None
+        if node.kind in (LIST, MAP, STRUCT):
+            return self.__parse_cell(node, value)
+        return self.__cast_token(node, value)
+
+    def __from_literal(self, node: TypeNode, literal):
+        if node is None or literal is None:
+            return literal
+        if node.kind in (LIST, MAP, STRUCT):
+            return self.__parse_cell(node, str(literal))
+        return node.converter(literal, node.checks)
+
+    def __cast_token(self, node: TypeNode, token: str):
+        if not token:
+            return None
+        return node.converter(token, node.checks)
+
+    @staticmethod
+    def __skip_ws(text: str, pos: int) -> int:
+        length = len(text)
+        while pos < length and text[pos] in WHITESPACE:
+            pos += 1
+        return pos
+
+    @staticmethod
+    def __position(text: str, pos: int) -> str:
+        line = text.count('\n', 0, pos) + 1
+        col = pos - (text.rfind('\n', 0, pos) + 1) + 1
+        return f"第{line}行，列{col}"
+
+    def __raise_json(self, text: str, pos: int, message: str):
+        position = self.__position(text, pos)
+        raise JsonTypeCastError(
+            f"无效的JSON格式: {message} ({position})",
+            original_value=text,
+            error_position=position
+        )
+
+    def __raise_syntax(self, node: TypeNode, text: str, pos: int, message: str):
+        raise TypeCastError(f"{node.type_name} 配置格式错误: {message} ({self.__position(text, pos)}) 原始值: {text}")
@@ -1,116 +1,149 @@
-﻿import core.utils.utils
-from core.models import SheetConfig, FieldMeta
-from abc import ABC, abstractmethod
-from core.utils.type_system import TypeSystem
-from pathlib import Path
-
-
-class ExporterBase(ABC):
-    def __init__(self, type_system: TypeSystem):
-        self.type_system = type_system
-        # 准备好数据导出目录
-        self.export_data_dir = Path(self.type_system.output_dir) / 'data'
-        Path(self.export_data_dir).mkdir(parents=True, exist_ok=True)
-        self.__export_base_logic = {
-            'cs': self.__export_base_cs,
-            'cpp': self.__export_base_cpp
-        }
-
-    @abstractmethod
-    def export_data(self, sheet_config: SheetConfig):
-        """导出可读取数据"""
-        pass
-
-    @abstractmethod
-    def before_export(self):
-        """导出数据前"""
-        pass
-
-    @abstractmethod
-    def after_export(self):
-        """导出数据后"""
-        pass
-
-    def export_base_language_class(self, sheet_config: SheetConfig):
-        """导出基础的可序列化的语言类"""
-        self.__export_base_logic[self.type_system.base_language](sheet_config)
-
-    def __export_base_cs(self, sheet_config: SheetConfig):
-        """导出基础的可序列化的C#类"""
-        Path(f'{self.type_system.output_dir}/scripts').mkdir(parents=True, exist_ok=True)
-        with open('./custom/TableScriptTemplate.txt', 'r', encoding='utf-8') as f:
-            code_template = f.read()
-        all_using = set()
-        field_lines = []
-        assignments = []
-        ctor_fields = []
-        fields_values = self.__sort_fields_cs(sheet_config.fields)
-        for field in fields_values:
-            code_line, usings = self.type_system.generate_field_code_cs(field.name, field.type)
-            all_using.update(usings)
-            if field.comment:
-                comment = field.comment.strip().replace('\n',' ')
-                code_line = f'\n        /// <summary>\n        /// {comment}\n        /// </summary>\n        {code_line}'
-            field_lines.append(code_line)
-            csharp_type = self.type_system.map_to_csharp_type(field.type)
-            ctor_fields.append(f'{csharp_type} {field.name}')
-            assignments.append(f'this.{field.name} = {field.name};')
-        using_code = '\n    '.join(sorted(all_using)) + '\n' if all_using else ''
-        field_code = '\n        '.join(field_lines)
-        ctor_code = f'\n        internal {sheet_config.export_name}({", ".join(ctor_fields)})\n        ' + '{\n            ' + '\n            '.join(
-            assignments) + '\n        }'
-
-        finale_code = code_template \
-            .replace('$LastModifyDate$', core.utils.utils.get_current_date()) \
-            .replace('$SourceTable$', sheet_config.source_file.replace('\\', '/').split('/')[-1]) \
-            .replace('$Usings$', using_code) \
-            .replace('$TableName$', sheet_config.export_name) \
-            .replace('$Filed$', field_code) \
-            .replace('$Constructor$', ctor_code)
-        with open(f'{self.type_system.output_dir}/scripts/{sheet_config.export_name}.cs', 'w', encoding='utf-8') as f:
-            f.write(finale_code)
-
-    def __export_base_cpp(self, sheet_config: SheetConfig):
-        """导出基础的可序列化的C++类"""
-        # 根据需求扩展
-        pass
-
-    def __sort_fields_cs(self, fields: dict[str, FieldMeta]) -> list:
-        """对字段进行排序
-        值类型和引用类型统一布局
-        使值类型在内存中连续存储无需堆分配，以减少内存碎片提升CPU缓存命中率
-        使引用类型减少对象头的分散，降低GC压力"""
-        return sorted(fields.values(),
-                      key=lambda x: (
-                          not (self.type_system.is_builtin_support_type(x.type) and not self.__is_string_type(x.type)),
-                          not self.__is_string_type(x.type),
-                          self.__custom_value_type_sort_weight(x.type),
-                          not self.__is_builtin_ref_type(x.type),
-                          self.__custom_ref_type_sort_weight(x.type),
-                          x.name
-                      ))
-
-    def __is_string_type(self, type_name: str):
-        return type_name.lower() == 'string'
-
-    def __is_builtin_ref_type(self, type_name: str):
-        return type_name.lower().startswith(('list', 'dict', 'map'))
-
-    def __custom_value_type_sort_weight(self, type_name: str):
-        if not self.type_system.is_custom_support_type(type_name):
-            return 2
-        custom_types = self.type_system.get_type_definition(type_name)
-        if custom_types['type'] == 'enum':
-            return 0
-        elif custom_types['type'] == 'struct':
-            return 1
-        else:
-            return 2
-
-    def __custom_ref_type_sort_weight(self, type_name: str):
-        if not self.type_system.is_custom_support_type(type_name):
-            return 0
-        custom_types = self.type_system.get_type_definition(type_name)
-        if custom_types['type'] == 'class':
-            return 0
-        return 1
+﻿import core.utils.utils
+from core.models import SheetConfig, FieldMeta
+from abc import ABC, abstractmethod
+from core.utils.type_system import TypeSystem, TypeKind
+from pathlib import Path
+from core.utils.trace import tracer
+from core.i18n.i18n_manager import I18NManager
+from core.utils.layout import ManagedLayout, optimize_order, layout_report
+
+
+class ExporterBase(ABC):
+    def __init__(self, type_system: TypeSystem, i18n: I18NManager = None):
+        self.type_system = type_system
+        # 多语言管理器，由导出前的多语言提取阶段填充
+        self.i18n = i18n if i18n is not None else I18NManager()
+        # 准备好数据导出目录
+        self.export_data_dir = Path(self.type_system.output_dir) / 'data'
+        Path(self.export_data_dir).mkdir(parents=True, exist_ok=True)
+        # 本次写入的文件，分片导出时记录到清单
+        self.artifacts = []
+        self.__cpp_generator = None
+        self.__managed_layout = ManagedLayout(type_system)
+        self.__export_base_logic = {
+            'cs': self.__export_base_cs,
+            'cpp': self.__export_base_cpp
+        }
+
+    @abstractmethod
+    def export_data(self, sheet_config: SheetConfig):
+        """导出可读取数据"""
+        pass
+
+    @abstractmethod
+    def before_export(self):
+        """导出数据前"""
+        pass
+
+    @abstractmethod
+    def after_export(self):
+        """导出数据后"""
+        pass
+
+    def sync_tables(self, sources: dict) -> set:
+        """
+        在before_export之后与输出中已有的表同步，输出中已不存在的表由导出器删除
+        :param sources: 本次读取到的所有表的来源Excel {导出名称: {文件路径: 文件哈希}}
+        :return: 输出中缺少或来源不一致的表，即使来源Excel未修改也需要导出
+        """
+        return set()
+
+    def check_options(self, export_names) -> list[str]:
+        """导出前校验导出器参数中引用的表是否存在，export_names为本次读取到的所有导出名称"""
+        return []
+
+    def export_base_language_class(self, sheet_config: SheetConfig):
+        """导出基础的可序列化的语言类"""
+        self.__export_base_logic[self.type_system.base_language](sheet_config)
+
+    @staticmethod
+    def get_source_table_names(sheet_config: SheetConfig) -> str:
+        """配置来源的Excel文件名，跨Excel合并时列出所有文件"""
+        files = sheet_config.source_files or {sheet_config.source_file: sheet_config.source_file_md5}
+        return ', '.join(file.replace('\\', '/').split('/')[-1] for file in files)
+
+    def __export_base_cs(self, sheet_config: SheetConfig):
+        """导出基础的可序列化的C#类"""
+        Path(f'{self.type_system.output_dir}/scripts').mkdir(parents=True, exist_ok=True)
+        with open('./custom/TableScriptTemplate.txt', 'r', encoding='utf-8') as f:
+            code_template = f.read()
+        all_using = set()
+        field_lines = []
+        assignments = []
+        ctor_fields = []
+        fields_values = self.__sort_fields_cs(sheet_config)
+        for field in fields_values:
+            code_line, usings = self.type_system.generate_field_code_cs(field.name, field.type)
+            all_using.update(usings)
+            if field.comment:
+                comment = field.comment.strip().replace('\n',' ')
+                code_line = f'\n        /// <summary>\n        /// {comment}\n        /// </summary>\n        {code_line}'
+            field_lines.append(code_line)
+            csharp_type = self.type_system.map_to_csharp_type(field.type)
+            ctor_fields.append(f'{csharp_type} {field.name}')
+            assignments.append(f'this.{field.name} = {field.name};')
+        using_code = '\n    '.join(sorted(all_using)) + '\n' if all_using else ''
+        field_code = '\n        '.join(field_lines)
+        ctor_code = f'\n        internal {sheet_config.export_name}({", ".join(ctor_fields)})\n        ' + '{\n            ' + '\n            '.join(
+            assignments) + '\n        }'
+
+        finale_code = code_template \
+            .replace('$LastModifyDate$', core.utils.utils.get_current_date()) \
+            .replace('$SourceTable$', self.get_source_table_names(sheet_config)) \
+            .replace('$Usings$', using_code) \
+            .replace('$TableName$', sheet_config.export_name) \
+            .replace('$Filed$', field_code) \
+            .replace('$Constructor$', ctor_code)
+        script_file = f'{self.type_system.output_dir}/scripts/{sheet_config.export_name}.cs'
+        with tracer.span('write', 'io', file=script_file) as span, open(script_file, 'w', encoding='utf-8') as f:
+            f.write(finale_code)
+            span.set(bytes=f.tell())
+        self.artifacts.append(script_file)
+
+    def __export_base_cpp(self, sheet_config: SheetConfig):
+        """导出基础的C++结构体，与二进制数据的布局一致"""
+        from core.exporters.cpp import CppCodeGenerator
+        if self.__cpp_generator is None:
+            self.__cpp_generator = CppCodeGenerator(self.type_system)
+        Path(f'{self.type_system.output_dir}/scripts').mkdir(parents=True, exist_ok=True)
+        final_code = self.__cpp_generator.generate_table(sheet_config, self.get_source_table_names(sheet_config))
+        if layout_report.enabled:
+            builder = self.__cpp_generator.layout_builder
+            layout_report.record(sheet_config.export_name, len(sheet_config.rows_values),
+                                 builder.table_layout(sheet_config, optimized=False).size,
+                                 builder.table_layout(sheet_config).size)
+        script_file = f'{self.type_system.output_dir}/scripts/{sheet_config.export_name}.h'
+        with tracer.span('write', 'io', file=script_file) as span, open(script_file, 'w', encoding='utf-8') as f:
+            f.write(final_code)
+            span.set(bytes=f.tell())
+        self.artifacts.append(script_file)
+
+    def __sort_fields_cs(self, sheet_config: SheetConfig) -> list:
+        """对字段进行排序
+        按字段实际的字节数和对齐从大到小排列，除末尾外没有填充字节，每行占用的内存最小
+        对齐相同时值类型和引用类型统一布局
+        使值类型在内存中连续存储无需堆分配，以减少内存碎片提升CPU缓存命中率
+        使引用类型减少对象头的分散，降低GC压力"""
+        grouped = sorted(sheet_config.fields.values(), key=self.__field_sort_key_cs)
+        descriptors = {field.name: self.type_system.describe(field.type) for field in grouped}
+        ordered = optimize_order(grouped, lambda field: self.__managed_layout.measure(descriptors[field.name])[1])
+        if layout_report.enabled:
+            layout_report.record(sheet_config.export_name, len(sheet_config.rows_values),
+                                 self.__managed_layout.struct_size([descriptors[field.name] for field in grouped]),
+                                 self.__managed_layout.struct_size([descriptors[field.name] for field in ordered]))
+        return ordered
+
+    def __field_sort_key_cs(self, field: FieldMeta) -> tuple:
+        descriptor = self.type_system.describe(field.type)
+        kind = descriptor.kind
+        is_string = kind == TypeKind.BUILTIN and descriptor.name == 'string'
+        return (
+            not (kind == TypeKind.BUILTIN and not is_string),
+            not is_string,
+            # 自定义值类型 枚举 > 结构体
+            {TypeKind.ENUM: 0, TypeKind.STRUCT: 1}.get(kind, 2),
+            kind not in (TypeKind.LIST, TypeKind.MAP),
+            # 自定义引用类型 类 > 其它自定义类型
+            1 if kind in (TypeKind.ENUM, TypeKind.STRUCT) else 0,
+            field.name
+        )
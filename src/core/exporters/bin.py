@@ -1,14 +1,72 @@
-﻿from core.exporters.base import ExporterBase
-from core.models import SheetConfig
-
-
-class BinaryExporter(ExporterBase):
-
-    def before_export(self):
-        pass
-
-    def after_export(self):
-        pass
-
-    def export_data(self, sheet_config: SheetConfig):
-        pass
+﻿from pathlib import Path
+
+from core.exporters.base import ExporterBase
+from core.exporters.block import BlockCompressor
+from core.exporters.patch import RowPatcher
+from core.exporters.pod import PodLayoutBuilder, PodEncoder, find_key_field
+from core.i18n.i18n_manager import I18NManager
+from core.models import SheetConfig
+from core.utils.cache import CacheSystem
+from core.utils.trace import tracer
+from core.utils.type_system import TypeSystem
+
+
+class BinaryExporter(ExporterBase):
+    """
+    导出平坦的二进制数据，每张表一个文件，C++中通过ConfigLoader.h映射后直接访问，读取时没有逐行的内存分配
+
+    文件头 | 行数据(按表布局的POD结构体数组) | 主键索引(按主键排序的行序号) | 数据块(字符串及列表元素)
+    """
+
+    def __init__(self, type_system: TypeSystem, i18n: I18NManager = None, row_snapshots: CacheSystem = None,
+                 compress: str = None, block_rows: int = 256):
+        """
+        :param row_snapshots: 保存每张表上次导出的行快照，指定时为修改的表生成增量补丁
+        :param compress: 压缩算法(zlib/lzma)，指定时导出分块压缩的 .blocks 文件
+        :param block_rows: 分块压缩时每块的行数
+        """
+        super().__init__(type_system, i18n)
+        self.layout_builder = PodLayoutBuilder(type_system)
+        self.encoder = PodEncoder(self.layout_builder)
+        self.patcher = None
+        if row_snapshots is not None:
+            self.patcher = RowPatcher(self.encoder, row_snapshots, self.export_data_dir / 'patch')
+        self.compressor = None
+        if compress is not None:
+            self.compressor = BlockCompressor(self.encoder, compress, block_rows)
+
+    def before_export(self):
+        pass
+
+    def after_export(self):
+        if self.patcher is not None:
+            self.patcher.write_changelog()
+        if self.compressor is not None and self.compressor.stats:
+            print(self.compressor.report())
+        self.i18n.write_master_file()
+
+    def export_data(self, sheet_config: SheetConfig):
+        layout = self.layout_builder.table_layout(sheet_config)
+        key_meta = find_key_field(sheet_config, self.type_system)
+        if self.compressor is not None:
+            with tracer.span('compress', 'table', table=sheet_config.export_name):
+                content = self.compressor.build(layout, sheet_config, key_meta)
+            self.__write(self.export_data_dir / f'{sheet_config.export_name}.blocks', content)
+            return
+        data_file = self.export_data_dir / f'{sheet_config.export_name}.bytes'
+        if self.patcher is not None:
+            content, patch_file = self.patcher.export(layout, sheet_config, key_meta, data_file)
+            if patch_file is not None:
+                self.artifacts.append(str(patch_file))
+            # 没有变化时不重写文件
+            if data_file.exists() and data_file.stat().st_size == len(content) and data_file.read_bytes() == content:
+                return
+        else:
+            content = self.encoder.build_file(layout, sheet_config, key_meta)
+        self.__write(data_file, content)
+
+    def __write(self, data_file: Path, content: bytes):
+        with tracer.span('write', 'io', file=str(data_file)) as span, open(data_file, 'wb') as f:
+            f.write(content)
+            span.set(bytes=f.tell())
+        self.artifacts.append(str(data_file))
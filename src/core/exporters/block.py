@@ -0,0 +1,248 @@
+﻿import bisect
+import lzma
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from core.exporters.pod import PodEncoder, PodBlob, PodLayout, REF_FORMAT, build_data_file, parse_data_file
+from core.models import SheetConfig, FieldMeta
+from core.utils.cache import LruCache
+from core.utils.exceptions import BinaryExportError
+from core.utils.memory import MB
+
+BLOCK_MAGIC = b'E2CZ'
+BLOCK_VERSION = 1
+# 魔数, 版本, 压缩算法, 布局哈希, 行数, 行字节数, 每块行数, 块数, 主键类型, 主键在行中的偏移, 主键数据块字节数, 主键的struct格式
+BLOCK_HEADER = struct.Struct('<4sIIIIIIIIII4s')
+# 块在文件中的偏移, 压缩后字节数, 解压后字节数, 第一行的序号
+BLOCK_ENTRY = struct.Struct('<QIII')
+# 压缩算法，zlib解压快适合运行时按需读取，lzma压缩率高适合归档
+CODECS = {'zlib': 1, 'lzma': 2}
+# 主键类型
+KEY_NONE = 0
+KEY_INT = 1
+KEY_FLOAT = 2
+KEY_STRING = 3
+
+
+def compress_block(codec: int, data: bytes) -> bytes:
+    if codec == CODECS['zlib']:
+        return zlib.compress(data, 9)
+    return lzma.compress(data, preset=9)
+
+
+def decompress_block(codec: int, data: bytes) -> bytes:
+    if codec == CODECS['zlib']:
+        return zlib.decompress(data)
+    if codec == CODECS['lzma']:
+        return lzma.decompress(data)
+    raise BinaryExportError(f'未知的压缩算法: {codec}')
+
+
+def key_kind(key_format: str) -> int:
+    if key_format == REF_FORMAT:
+        return KEY_STRING
+    if key_format in ('f', 'd'):
+        return KEY_FLOAT
+    return KEY_INT
+
+
+def stored_key(key_format: str, value):
+    """主键按行中的存储格式转换后的值，float主键按单精度比较"""
+    if key_format in ('f', 'd'):
+        return struct.unpack(f'<{key_format}', struct.pack(f'<{key_format}', value))[0]
+    return value
+
+
+class BlockStats:
+    """一张表的压缩统计"""
+
+    def __init__(self, table: str, rows: int, blocks: int, raw_size: int, compressed_size: int):
+        self.table = table
+        self.rows = rows
+        self.blocks = blocks
+        self.raw_size = raw_size
+        self.compressed_size = compressed_size
+
+    @property
+    def ratio(self) -> float:
+        return self.compressed_size / self.raw_size if self.raw_size else 1.0
+
+
+class BlockCompressor:
+    """
+    分块压缩的二进制导出，行按主键(没有时按配置顺序)每 rows_per_block 行分为一块
+    每块都是独立的二进制配置文件(有自己的数据块和主键索引)，解压后可与未压缩的文件相同方式读取
+    块索引记录每块的首尾主键，按主键查找时只需解压一块
+    文件头 | 块索引 | 每块的首尾主键 | 主键数据块(字符串主键) | 压缩后的块
+    """
+
+    def __init__(self, encoder: PodEncoder, codec: str = 'zlib', rows_per_block: int = 256, workers: int = None):
+        if codec not in CODECS:
+            raise BinaryExportError(f'未知的压缩算法: {codec}')
+        self.encoder = encoder
+        self.codec = CODECS[codec]
+        self.rows_per_block = max(1, rows_per_block)
+        # zlib和lzma压缩时释放GIL，线程即可并行
+        self.workers = workers or (os.cpu_count() or 1)
+        self.stats: List[BlockStats] = []
+
+    def build(self, layout: PodLayout, sheet_config: SheetConfig, key_meta: Optional[FieldMeta]) -> bytes:
+        table = sheet_config.export_name
+        rows_values = sheet_config.rows_values
+        key_slot = None
+        if key_meta is not None:
+            key_slot = next(slot for slot in layout.fields if slot.name == key_meta.name)
+            key_format = self.encoder.builder.element_info(key_slot.descriptor)[0]
+            sort_values = [stored_key(key_format, value) for value in self.encoder.key_sort_values(
+                key_meta, [row_value.get(key_meta.name) for row_value in rows_values])]
+            order = sorted(range(len(rows_values)), key=sort_values.__getitem__)
+        else:
+            sort_values = None
+            order = list(range(len(rows_values)))
+
+        raw_blocks = []
+        key_ranges = []
+        for start in range(0, len(order), self.rows_per_block):
+            chunk = order[start:start + self.rows_per_block]
+            blob = PodBlob()
+            rows = b''.join(self.encoder.encode_row(layout, rows_values[row_idx], blob, f'[{table}] 第{row_idx + 1}行')
+                            for row_idx in chunk)
+            # 块内的行已按主键排序，索引即为行序号
+            index = list(range(len(chunk))) if key_meta is not None else None
+            raw_blocks.append(build_data_file(layout.layout_hash, layout.size, rows, index, bytes(blob.data)))
+            if sort_values is not None:
+                key_ranges.append((sort_values[chunk[0]], sort_values[chunk[-1]]))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(raw_blocks)))) as executor:
+            blocks = list(executor.map(lambda data: compress_block(self.codec, data), raw_blocks))
+
+        content = self.__assemble(layout, len(rows_values), key_slot, raw_blocks, blocks, key_ranges)
+        self.stats.append(BlockStats(table, len(rows_values), len(blocks), sum(len(data) for data in raw_blocks),
+                                     len(content)))
+        return content
+
+    def report(self) -> str:
+        lines = ['分块压缩(按压缩后字节数排序):',
+                 f'{"行数":>10} {"块数":>6} {"原始(MB)":>10} {"压缩后(MB)":>10} {"压缩率":>8}  表']
+        raw_total = compressed_total = 0
+        for stats in sorted(self.stats, key=lambda s: s.compressed_size, reverse=True):
+            raw_total += stats.raw_size
+            compressed_total += stats.compressed_size
+            lines.append(f'{stats.rows:>12} {stats.blocks:>8} {stats.raw_size / MB:>12.3f} '
+                         f'{stats.compressed_size / MB:>13.3f} {stats.ratio * 100:>10.1f}%  {stats.table}')
+        ratio = compressed_total * 100 / raw_total if raw_total else 100
+        lines.append(f'总计 {raw_total / MB:.3f} MB -> {compressed_total / MB:.3f} MB ({ratio:.1f}%)')
+        self.stats = []
+        return '\n'.join(lines)
+
+    def __assemble(self, layout: PodLayout, row_count: int, key_slot, raw_blocks: List[bytes], blocks: List[bytes],
+                   key_ranges: list) -> bytes:
+        kind, key_offset, key_format = KEY_NONE, 0, b''
+        if key_slot is not None:
+            key_format = self.encoder.builder.element_info(key_slot.descriptor)[0]
+            kind, key_offset = key_kind(key_format), key_slot.offset
+            key_format = key_format.encode('ascii')
+        key_table = bytearray()
+        key_blob = bytearray()
+        for first, last in key_ranges:
+            for value in (first, last):
+                if kind == KEY_STRING:
+                    key_table += struct.pack('<II', len(key_blob), len(value))
+                    key_blob += value
+                elif kind == KEY_FLOAT:
+                    key_table += struct.pack('<d', value)
+                else:
+                    key_table += struct.pack('<q', value)
+        offset = BLOCK_HEADER.size + BLOCK_ENTRY.size * len(blocks) + len(key_table) + len(key_blob)
+        entries = bytearray()
+        for block_idx, (raw, block) in enumerate(zip(raw_blocks, blocks)):
+            entries += BLOCK_ENTRY.pack(offset, len(block), len(raw), block_idx * self.rows_per_block)
+            offset += len(block)
+        header = BLOCK_HEADER.pack(BLOCK_MAGIC, BLOCK_VERSION, self.codec, layout.layout_hash, row_count, layout.size,
+                                   self.rows_per_block, len(blocks), kind, key_offset, len(key_blob),
+                                   key_format.ljust(4, b'\0'))
+        return b''.join([header, entries, key_table, key_blob, *blocks])
+
+
+class BlockReader:
+    """
+    读取分块压缩的二进制配置，按主键查找时只解压所在的块，解压后的块用LRU缓存
+    每块解压后是独立的二进制配置文件，可通过 parse_data_file 解析
+    """
+
+    def __init__(self, path, cache_blocks: int = 8):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            head = f.read(BLOCK_HEADER.size)
+            if len(head) < BLOCK_HEADER.size:
+                raise BinaryExportError(f'{self.path} 不是分块压缩的二进制配置文件')
+            (magic, version, self.codec, self.layout_hash, self.row_count, self.row_size, self.rows_per_block,
+             self.block_count, self.key_kind, self.key_offset, key_blob_size, key_format) = BLOCK_HEADER.unpack(head)
+            if magic != BLOCK_MAGIC or version != BLOCK_VERSION:
+                raise BinaryExportError(f'{self.path} 不是当前版本的分块压缩文件')
+            self.key_format = key_format.rstrip(b'\0').decode('ascii')
+            self.entries = [BLOCK_ENTRY.unpack(f.read(BLOCK_ENTRY.size)) for _ in range(self.block_count)]
+            key_entry_size = 8 if self.key_kind != KEY_NONE else 0
+            key_table = f.read(key_entry_size * 2 * self.block_count)
+            key_blob = f.read(key_blob_size)
+        # 每块的首尾主键，按主键二分查找所在的块
+        self.first_keys = []
+        self.last_keys = []
+        for block_idx in range(self.block_count if self.key_kind != KEY_NONE else 0):
+            first, last = (self.__unpack_key(key_table, key_blob, (block_idx * 2 + i) * 8) for i in range(2))
+            self.first_keys.append(first)
+            self.last_keys.append(last)
+        self.__blocks = LruCache(cache_blocks)
+
+    def read_block(self, block_idx: int) -> bytes:
+        """解压后的块，为独立的二进制配置文件"""
+        return self.__blocks.get_or_create(block_idx, lambda: self.__read_block(block_idx))
+
+    def find_row(self, key) -> Optional[bytes]:
+        """按主键查找一行的数据，字符串及列表的偏移相对于所在块的数据块"""
+        if self.key_kind == KEY_NONE:
+            raise BinaryExportError(f'{self.path} 没有主键')
+        if self.key_kind == KEY_STRING:
+            key = key.encode('utf-8')
+        else:
+            key = stored_key(self.key_format, key)
+        block_idx = bisect.bisect_right(self.first_keys, key) - 1
+        if block_idx < 0 or key > self.last_keys[block_idx]:
+            return None
+        _, _, rows, _, blob = parse_data_file(self.read_block(block_idx))
+        row_keys = [self.__row_key(row, blob) for row in rows]
+        row_idx = bisect.bisect_left(row_keys, key)
+        if row_idx < len(rows) and row_keys[row_idx] == key:
+            return rows[row_idx]
+        return None
+
+    def row(self, row_idx: int) -> bytes:
+        """按序号读取一行，有主键时按主键排序"""
+        block_idx = row_idx // self.rows_per_block
+        _, _, rows, _, _ = parse_data_file(self.read_block(block_idx))
+        return rows[row_idx - self.entries[block_idx][3]]
+
+    def __read_block(self, block_idx: int) -> bytes:
+        offset, size, raw_size, _ = self.entries[block_idx]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = decompress_block(self.codec, f.read(size))
+        if len(data) != raw_size:
+            raise BinaryExportError(f'{self.path} 第{block_idx}块解压后大小不一致')
+        return data
+
+    def __unpack_key(self, key_table: bytes, key_blob: bytes, offset: int):
+        if self.key_kind == KEY_STRING:
+            blob_offset, length = struct.unpack_from('<II', key_table, offset)
+            return key_blob[blob_offset:blob_offset + length]
+        return struct.unpack_from('<d' if self.key_kind == KEY_FLOAT else '<q', key_table, offset)[0]
+
+    def __row_key(self, row: bytes, blob: bytes):
+        if self.key_kind == KEY_STRING:
+            blob_offset, length = struct.unpack_from('<II', row, self.key_offset)
+            return blob[blob_offset:blob_offset + length]
+        return struct.unpack_from(f'<{self.key_format}', row, self.key_offset)[0]
@@ -0,0 +1,139 @@
+﻿import hashlib
+from pathlib import Path
+
+import core.utils.utils
+from core.exporters.pod import PodLayoutBuilder, PodLayout, find_key_field
+from core.models import SheetConfig
+from core.utils.type_system import TypeSystem, TypeDescriptor, TypeKind
+
+# 公共的加载器和自定义类型头文件
+LOADER_HEADER = 'ConfigLoader.h'
+CUSTOM_TYPES_HEADER = 'CustomTypes.h'
+
+
+class CppCodeGenerator:
+    """
+    生成C++代码，表和自定义的结构体、类都生成平坦的POD结构体
+    表的字段按对齐从大到小排列，自定义类型按声明顺序排列
+    显式写出填充字节并用static_assert校验偏移，保证与二进制数据的布局一致
+    """
+
+    def __init__(self, type_system: TypeSystem):
+        self.type_system = type_system
+        self.layout_builder = PodLayoutBuilder(type_system)
+
+    def generate_table(self, sheet_config: SheetConfig, source_tables: str) -> str:
+        """生成表的结构体及加载类"""
+        with open('./custom/TableCppScriptTemplate.txt', 'r', encoding='utf-8') as f:
+            code_template = f.read()
+        layout = self.layout_builder.table_layout(sheet_config)
+        uses_custom = any(self.__uses_custom_type(slot.descriptor) for slot in layout.fields)
+        includes = f'#include "{CUSTOM_TYPES_HEADER}"\n' if uses_custom else ''
+        return code_template \
+            .replace('$LastModifyDate$', core.utils.utils.get_current_date()) \
+            .replace('$SourceTable$', source_tables) \
+            .replace('$Includes$', includes) \
+            .replace('$TableName$', sheet_config.export_name) \
+            .replace('$Fields$', self.__generate_fields(layout)) \
+            .replace('$Asserts$', self.__generate_asserts(layout)) \
+            .replace('$LayoutHash$', f'0x{layout.layout_hash:08X}u') \
+            .replace('$UniqueGet$', self.__generate_unique_get(sheet_config))
+
+    def export_custom_types(self, last_stamp: str = None) -> str:
+        """
+        导出加载器及所有自定义类型的C++头文件
+        C++中没有Unity提供的Vector等类型，忽略标签只对C#生效
+        :param last_stamp: 上次导出时的标记，类型定义、模板均未变化且文件都在时跳过导出
+        :return: 本次导出的标记
+        """
+        with open('./custom/TableCppCustomTypeTemplate.txt', 'r', encoding='utf-8') as f:
+            code_template = f.read()
+        with open('./custom/TableCppLoaderTemplate.txt', 'r', encoding='utf-8') as f:
+            loader_code = f.read()
+        stamp = hashlib.md5(f'{self.type_system.custom_types_hash}|{code_template}|{loader_code}'
+                            .encode('utf-8')).hexdigest()
+        if stamp == last_stamp and all(Path(file).exists() for file in self.get_custom_type_files()):
+            return stamp
+        Path(f'{self.type_system.output_dir}/scripts').mkdir(parents=True, exist_ok=True)
+        type_codes = [self.__generate_custom_type(descriptor) for descriptor in self.__sorted_custom_types()]
+        final_code = code_template.replace('$Types$', '\n\n    '.join(type_codes))
+        with open(f'{self.type_system.output_dir}/scripts/{CUSTOM_TYPES_HEADER}', 'w', encoding='utf-8') as f:
+            f.write(final_code)
+        with open(f'{self.type_system.output_dir}/scripts/{LOADER_HEADER}', 'w', encoding='utf-8') as f:
+            f.write(loader_code)
+        return stamp
+
+    def get_custom_type_files(self) -> list:
+        return [f'{self.type_system.output_dir}/scripts/{name}' for name in (LOADER_HEADER, CUSTOM_TYPES_HEADER)]
+
+    def __sorted_custom_types(self) -> list:
+        """被引用的自定义类型排在前面"""
+        ordered = {}
+
+        def visit(descriptor: TypeDescriptor):
+            if descriptor.is_custom and descriptor.name in ordered:
+                return
+            for child in descriptor.children:
+                visit(child)
+            if descriptor.is_custom:
+                ordered[descriptor.name] = descriptor
+
+        # 枚举没有依赖，统一放在最前面
+        descriptors = [self.type_system.describe(name) for name in self.type_system.custom_types]
+        for descriptor in sorted(descriptors, key=lambda d: d.kind != TypeKind.ENUM):
+            visit(descriptor)
+        return list(ordered.values())
+
+    def __generate_custom_type(self, descriptor: TypeDescriptor) -> str:
+        if descriptor.kind == TypeKind.ENUM:
+            items = ',\n        '.join(f'{value} = {idx}' for idx, value in enumerate(descriptor.definition['fields']))
+            return f'enum class {descriptor.name} : int32_t\n    {{\n        {items}\n    }};'
+        layout = self.layout_builder.type_layout(descriptor)
+        return f'struct {descriptor.name}\n    {{\n        {self.__generate_fields(layout)}\n    }};' \
+               f'\n    {self.__generate_asserts(layout)}'
+
+    @staticmethod
+    def __generate_fields(layout: PodLayout) -> str:
+        lines = []
+        for slot in layout.slots:
+            if slot.is_padding:
+                lines.append(f'uint8_t {slot.name}[{slot.size}];')
+                continue
+            line = f'{slot.cpp_type} {slot.name};'
+            # 8字节类型在部分32位平台上只按4字节对齐，显式指定
+            if slot.align == 8:
+                line = f'alignas(8) {line}'
+            if slot.comment:
+                comment = slot.comment.strip().replace('\n', ' ')
+                line = f'\n        /// {comment}\n        {line}'
+            lines.append(line)
+        return '\n        '.join(lines)
+
+    @staticmethod
+    def __generate_asserts(layout: PodLayout) -> str:
+        message = f'"{layout.name} layout mismatch"'
+        asserts = [f'static_assert(sizeof({layout.name}) == {layout.size}, {message});']
+        asserts.extend(f'static_assert(offsetof({layout.name}, {slot.name}) == {slot.offset}, {message});'
+                       for slot in layout.fields)
+        return '\n    '.join(asserts)
+
+    def __generate_unique_get(self, sheet_config: SheetConfig) -> str:
+        """按主键查找，与C#相同取第一个CheckRepeat字段"""
+        key_meta = find_key_field(sheet_config, self.type_system)
+        if key_meta is None:
+            return ''
+        table_name = sheet_config.export_name
+        descriptor = self.type_system.describe(key_meta.type)
+        if descriptor.name == 'string':
+            key_type = 'std::string_view'
+            key_of = f'[this](const {table_name}& row) {{ return Str(row.{key_meta.name}); }}'
+        else:
+            key_type = self.layout_builder.element_info(descriptor)[3]
+            key_of = f'[](const {table_name}& row) {{ return row.{key_meta.name}; }}'
+        return (f'\n\n        const {table_name}* Get({key_type} {key_meta.name}) const\n'
+                f'        {{\n'
+                f'            return FindBy({key_of}, {key_meta.name});\n'
+                f'        }}')
+
+    def __uses_custom_type(self, descriptor: TypeDescriptor) -> bool:
+        return descriptor.is_custom or any(self.__uses_custom_type(child) for child in descriptor.children)
@@ -1,201 +1,300 @@
-﻿from core.exporters.base import ExporterBase
-from core.models import SheetConfig, FieldMeta
-from core.utils.type_system import TypeSystem
-from pathlib import Path
-from dataclasses import replace
-from core.i18n.i18n_manager import I18NManager
-import core
-
-
-class CSharpExporter(ExporterBase):
-    def __init__(self, type_system: TypeSystem):
-        super().__init__(type_system)
-        self.current_config = None
-        self.i18n = I18NManager()
-
-        self._type_handlers = {
-            "list": self.__handle_list_type,
-            "dict": self.__handle_dict_type,
-            "builtin": self.__handle_builtin_type,
-            "custom": self.__handle_custom_type
-        }
-
-    def export_data(self, sheet_config: SheetConfig):
-        """导出C#硬编码数据"""
-        with open('./custom/TableScriptDataTemplate.txt', 'r', encoding='utf-8') as f:
-            code_template = f.read()
-        data_lines = []
-        self.current_config = sheet_config
-        for row_value in sheet_config.rows_values:
-            data_lines.append(self.__parse_row_2_code_line(sheet_config.fields, row_value))
-
-        (unique_map, unique_get, unique_type, unique_field_name, unique_method) = self.__get_unique_code(
-            sheet_config.export_name,
-            sheet_config.fields)
-        all_using = self.__generate_using_statements(sheet_config.fields)
-        if not unique_map == '':
-            all_using.add('using System.Collections.Generic;')
-        using_code = '\n    '.join(sorted(all_using)) + '\n' if all_using else ''
-        final_code = code_template \
-            .replace('$LastModifyDate$', core.utils.utils.get_current_date()) \
-            .replace('$SourceTable$', Path(sheet_config.source_file).name) \
-            .replace('$Usings$', using_code) \
-            .replace('$TableName$', sheet_config.export_name) \
-            .replace('$ConstructData$', ",\n".join(data_lines)) \
-            .replace('$UniqueMap$', unique_map) \
-            .replace('$UniqueGet$', unique_get) \
-            .replace('$UniqueType$', unique_type) \
-            .replace('$UniqueFieldName$', unique_field_name) \
-            .replace('$UniqueMethod$', unique_method)
-
-        with open(self.export_data_dir / f'{sheet_config.export_name}DB.cs', 'w', encoding='utf-8') as f:
-            f.write(final_code)
-
-        # 生成用户自定义服务代码
-        service_file = self.export_data_dir / f'{sheet_config.export_name}Service.cs'
-        if not service_file.exists():
-            with open('./custom/TableServiceScriptTemplate.txt', 'r', encoding='utf-8') as f:
-                service_code = f.read()
-            service_final_code = service_code \
-                .replace('$TableName$', f'{sheet_config.export_name}')
-            with open(self.export_data_dir / f'{sheet_config.export_name}Service.cs', 'w', encoding='utf-8') as f:
-                f.write(service_final_code)
-
-    def before_export(self):
-        pass
-
-    def after_export(self):
-        self.i18n.write_master_file()
-
-    def __get_unique_code(self, export_name, fields: dict[str, FieldMeta]):
-        for field_meta in fields.values():
-            if 'CheckRepeat' in field_meta.checks:
-                return self.__make_unique_code(export_name, field_meta)
-        return self.__make_idx_code(export_name)
-
-    def __make_unique_code(self, export_name, field_meta: FieldMeta):
-        """生成通过唯一值获取数据的代码"""
-        cs_type = self.type_system.map_to_csharp_type(field_meta.type)
-        unique_map = f'private Dictionary<{cs_type}, int> _idToIdx;'
-        unique_get = (f'var ok = _idToIdx.TryGetValue({field_meta.name}, out int idx);\n'
-                      f'                if (!ok)\n'
-                      f'                    UnityEngine.Debug.LogError($"[{export_name}] {field_meta.name}: {{{field_meta.name}}} not found");')
-        unique_type = f'{cs_type}'
-        unique_field_name = f'{field_meta.name}'
-        unique_method = (f'_idToIdx = new Dictionary<{cs_type},int>(_data.Length);\n'
-                         f'            for (int i = 0; i < _data.Length; i++)\n'
-                         f'            {{\n'
-                         f'                _idToIdx[_data[i].{unique_field_name}] = i;\n'
-                         f'            }}')
-        return (unique_map, unique_get, unique_type, unique_field_name, unique_method)
-
-    def __make_idx_code(self, export_name):
-        unique_map = ''
-        unique_get = f'if(idx < 0 || idx >= _data.Length)\n                    UnityEngine.Debug.LogError($"[{export_name}] {{idx}} out of bounds");'
-        unique_type = 'int'
-        unique_field_name = 'idx'
-        unique_method = ''
-        return (unique_map, unique_get, unique_type, unique_field_name, unique_method)
-
-    def __parse_row_2_code_line(self, fields: dict[str, FieldMeta], row_value: dict) -> str:
-        """将单行数据转换为C#对象初始化代码"""
-        init_values = []
-        for field_name, value in row_value.items():
-            field_meta = fields[field_name]
-            handler = self.__get_type_handler(field_meta.type)
-            code = handler(field_meta, value)
-            init_values.append(f'{field_name}: {code}')
-        return f'                new({", ".join(init_values)})'
-
-    def __get_type_handler(self, type_name: str) -> callable:
-        """获取类型处理器"""
-        if self.type_system.is_custom_support_type(type_name):
-            return self._type_handlers['custom']
-        if type_name.lower().startswith('list'):
-            return self._type_handlers['list']
-        if type_name.lower().startswith('map'):
-            return self._type_handlers['dict']
-        return self._type_handlers['builtin']
-
-    def __handle_builtin_type(self, field_meta: FieldMeta, value):
-        type_name = field_meta.type.lower()
-        if type_name == 'string':
-            key = self.i18n.update_raw_master(self.current_config.export_name, field_meta.name, value)
-            if key is None:
-                return f'"{value}"'
-            else:
-                return f'LocalizationPool.Get("{key}")'
-        if type_name == 'bool':
-            return 'true' if value else 'false'
-        if type_name == 'float':
-            return f'{value}f'
-        return f'{value}'
-
-    def __handle_custom_type(self, field_meta: FieldMeta, value: dict):
-        """处理自定义类型"""
-        type_def = self.type_system.get_type_definition(field_meta.type)
-        if type_def['type'] == 'enum':
-            return f'{field_meta.type}.{value}'
-        if type_def['type'] == 'struct':
-            return self.__generate_struck_code(field_meta, type_def, value)
-        if type_def['type'] == 'class':
-            return self.__generate_class_code(field_meta, type_def, value)
-        # 前面全都安全校验过了，不会走到这里
-        return ''
-
-    def __handle_list_type(self, field_meta: FieldMeta, value: list):
-        """处理列表类型"""
-        if value is None:
-            return 'null'
-        if len(value) <= 0:
-            return 'null'
-        element_type = field_meta.type[5:-1]
-        elements = [self.__parse_element(field_meta, element_type, v) for v in value]
-        return f'new List<{element_type}>() {{ {", ".join(elements)} }}'
-
-    def __handle_dict_type(self, field_meta: FieldMeta, value: dict):
-        """处理字典类型"""
-        if value is None:
-            return 'null'
-        if len(value) <= 0:
-            return 'null'
-        key_type, value_type = field_meta.type[4:-1].split(',', 1)
-        entries = [
-            f'[{self.__parse_element(field_meta, key_type, k)}] = {self.__parse_element(field_meta, value_type, v)}'
-            for k, v in value.items()
-        ]
-        return f'new Dictionary<{key_type}, {value_type}>() {{ {", ".join(entries)} }}'
-
-    def __parse_element(self, field_meta: FieldMeta, element_type: str, value):
-        """解析列表中的单个元素"""
-        dummy_field = replace(field_meta, type=element_type)
-        handler = self.__get_type_handler(element_type)
-        return handler(dummy_field, value)
-
-    def __generate_struck_code(self, field_meta: FieldMeta, type_def: dict, value: dict):
-        """生成结构体初始化代码"""
-        fields = [
-            f"{field_name}: {self.__parse_element(field_meta, field_type, value.get(field_name))}"
-            for field_name, field_type in type_def["fields"].items()
-        ]
-        return f"new {field_meta.type}({', '.join(fields)})"
-
-    def __generate_class_code(self, field_meta: FieldMeta, type_def: dict, value: dict) -> str:
-        """生成类初始化代码"""
-        fields = [
-            f"{field_name}: {self.__parse_element(field_meta, field_type, value.get(field_name))}"
-            for field_name, field_type in type_def["fields"].items()
-        ]
-        return f"new {field_meta.type}({', '.join(fields)})"
-
-    def __generate_using_statements(self, fields: dict[str, FieldMeta]):
-        """生成需要的using语句"""
-        using_statements = set()
-        for config_type in fields.values():
-            csharp_type = self.type_system.map_to_csharp_type(config_type.type)
-            if 'List<' in csharp_type or 'Dictionary<' in csharp_type:
-                using_statements.add('using System.Collections.Generic;')
-            if csharp_type in ['Vector2', 'Vector3', 'Vector4', 'Color']:
-                using_statements.add('using UnityEngine;')
-
-        return using_statements
+﻿from core.exporters.base import ExporterBase
+from core.models import SheetConfig, FieldMeta
+from core.utils.type_system import TypeSystem, TypeDescriptor, TypeKind
+from core.i18n.i18n_manager import I18NManager
+import core
+from core.utils.footprint import FootprintEstimator, FootprintManifest
+from core.utils.trace import tracer
+
+
+class CSharpExporter(ExporterBase):
+    # 按列存储时基础类型每行写入的数组元素个数，其它类型每行一个
+    COLUMN_VALUES_PER_LINE = 16
+
+    def __init__(self, type_system: TypeSystem, i18n: I18NManager = None, soa_tables=None,
+                 footprints: FootprintManifest = None):
+        """
+        :param soa_tables: 按列存储的表的导出名称
+        :param footprints: 记录每张表估算的内存占用，分片导出时传入只记录不写入的清单
+        """
+        super().__init__(type_system, i18n)
+        self.current_config = None
+        self.soa_tables = set(soa_tables or ())
+        self.footprint_estimator = FootprintEstimator(type_system)
+        self.footprints = footprints if footprints is not None else FootprintManifest()
+
+        self._type_handlers = {
+            "list": self.__handle_list_type,
+            "dict": self.__handle_dict_type,
+            "builtin": self.__handle_builtin_type,
+            "custom": self.__handle_custom_type
+        }
+
+    def export_data(self, sheet_config: SheetConfig):
+        """导出C#硬编码数据"""
+        columnar = sheet_config.export_name in self.soa_tables
+        footprint = self.footprint_estimator.estimate(sheet_config, columnar)
+        self.footprints.record(sheet_config.export_name, footprint)
+        if columnar:
+            code = self.__generate_column_data(sheet_config)
+        else:
+            code = self.__generate_row_data(sheet_config)
+        self.__write_data_file(sheet_config, code.replace('$FootprintBytes$', str(footprint['bytes'])))
+
+    def __generate_row_data(self, sheet_config: SheetConfig) -> str:
+        """按行存储，每行一个结构体"""
+        with open('./custom/TableScriptDataTemplate.txt', 'r', encoding='utf-8') as f:
+            code_template = f.read()
+        data_lines = []
+        self.current_config = sheet_config
+        # 每个字段只查询一次类型描述
+        descriptors = {name: self.type_system.describe(meta.type) for name, meta in sheet_config.fields.items()}
+        for row_value in sheet_config.rows_values:
+            data_lines.append(self.__parse_row_2_code_line(sheet_config.fields, descriptors, row_value))
+
+        (unique_map, unique_get, unique_type, unique_field_name, unique_method) = self.__get_unique_code(
+            sheet_config.export_name,
+            sheet_config.fields)
+        all_using = self.__generate_using_statements(sheet_config.fields)
+        if not unique_map == '':
+            all_using.add('using System.Collections.Generic;')
+        using_code = '\n    '.join(sorted(all_using)) + '\n' if all_using else ''
+        return code_template \
+            .replace('$LastModifyDate$', core.utils.utils.get_current_date()) \
+            .replace('$SourceTable$', self.get_source_table_names(sheet_config)) \
+            .replace('$Usings$', using_code) \
+            .replace('$TableName$', sheet_config.export_name) \
+            .replace('$ConstructData$', ",\n".join(data_lines)) \
+            .replace('$UniqueMap$', unique_map) \
+            .replace('$UniqueGet$', unique_get) \
+            .replace('$UniqueType$', unique_type) \
+            .replace('$UniqueFieldName$', unique_field_name) \
+            .replace('$UniqueMethod$', unique_method)
+
+    def __generate_column_data(self, sheet_config: SheetConfig) -> str:
+        """
+        按列存储，每个字段一个数组，基础类型为连续的值数组
+        this[key]按行号组装结构体返回，保持与按行存储相同的访问方式
+        """
+        with open('./custom/TableScriptColumnDataTemplate.txt', 'r', encoding='utf-8') as f:
+            code_template = f.read()
+        self.current_config = sheet_config
+        fields = [meta for meta in sheet_config.fields.values() if not meta.is_ignored]
+        columns = []
+        construct_lines = []
+        accessors = []
+        for meta in fields:
+            descriptor = self.type_system.describe(meta.type)
+            cs_type = descriptor.csharp_name
+            column = f'_{meta.name}Column'
+            columns.append(f'private {cs_type}[] {column};')
+            values = [self.__parse_element(meta, descriptor, row_value.get(meta.name))
+                      for row_value in sheet_config.rows_values]
+            is_scalar = descriptor.kind == TypeKind.ENUM or (
+                descriptor.kind == TypeKind.BUILTIN and descriptor.name != 'string')
+            per_line = self.COLUMN_VALUES_PER_LINE if is_scalar else 1
+            value_lines = [', '.join(values[i:i + per_line]) for i in range(0, len(values), per_line)]
+            value_code = ''.join(f'\n                {line},' for line in value_lines).rstrip(',')
+            construct_lines.append(f'            {column} = new {cs_type}[]\n            {{{value_code}\n            }};')
+            accessors.append(f'\n        public ReadOnlySpan<{cs_type}> {meta.name}Column\n'
+                             f'        {{\n'
+                             f'            get\n'
+                             f'            {{\n'
+                             f'                TackUsage();\n'
+                             f'                return {column};\n'
+                             f'            }}\n'
+                             f'        }}')
+
+        (unique_map, unique_get, unique_type, unique_field_name, unique_method) = self.__get_unique_code(
+            sheet_config.export_name,
+            sheet_config.fields,
+            True)
+        all_using = self.__generate_using_statements(sheet_config.fields)
+        all_using.add('using System;')
+        if not unique_map == '':
+            all_using.add('using System.Collections.Generic;')
+        using_code = '\n    '.join(sorted(all_using)) + '\n'
+        return code_template \
+            .replace('$LastModifyDate$', core.utils.utils.get_current_date()) \
+            .replace('$SourceTable$', self.get_source_table_names(sheet_config)) \
+            .replace('$Usings$', using_code) \
+            .replace('$TableName$', sheet_config.export_name) \
+            .replace('$RowCount$', str(len(sheet_config.rows_values))) \
+            .replace('$Columns$', '\n        '.join(columns)) \
+            .replace('$ConstructColumns$', '\n'.join(construct_lines)) \
+            .replace('$RowArgs$', ', '.join(f'{meta.name}: _{meta.name}Column[idx]' for meta in fields)) \
+            .replace('$ColumnAccessors$', '\n'.join(accessors)) \
+            .replace('$DisposeColumns$', '\n            '.join(f'_{meta.name}Column = null;' for meta in fields)) \
+            .replace('$UniqueMap$', unique_map) \
+            .replace('$UniqueGet$', unique_get) \
+            .replace('$UniqueType$', unique_type) \
+            .replace('$UniqueFieldName$', unique_field_name) \
+            .replace('$UniqueMethod$', unique_method)
+
+    def __write_data_file(self, sheet_config: SheetConfig, final_code: str):
+        """写入数据代码，用户自定义服务代码只在不存在时生成"""
+        data_file = self.export_data_dir / f'{sheet_config.export_name}DB.cs'
+        with tracer.span('write', 'io', file=str(data_file)) as span, open(data_file, 'w', encoding='utf-8') as f:
+            f.write(final_code)
+            span.set(bytes=f.tell())
+        self.artifacts.append(str(data_file))
+
+        # 生成用户自定义服务代码
+        service_file = self.export_data_dir / f'{sheet_config.export_name}Service.cs'
+        if not service_file.exists():
+            with open('./custom/TableServiceScriptTemplate.txt', 'r', encoding='utf-8') as f:
+                service_code = f.read()
+            service_final_code = service_code \
+                .replace('$TableName$', f'{sheet_config.export_name}')
+            with open(self.export_data_dir / f'{sheet_config.export_name}Service.cs', 'w', encoding='utf-8') as f:
+                f.write(service_final_code)
+            self.artifacts.append(str(service_file))
+
+    def check_options(self, export_names) -> list[str]:
+        missing = sorted(self.soa_tables - set(export_names))
+        if missing:
+            return [f'--soa 找不到导出名称 {", ".join(missing)}']
+        return []
+
+    def before_export(self):
+        pass
+
+    def after_export(self):
+        self.footprints.write(self.type_system.output_dir)
+        self.i18n.write_master_file()
+
+    def __get_unique_code(self, export_name, fields: dict[str, FieldMeta], columnar: bool = False):
+        for field_meta in fields.values():
+            if 'CheckRepeat' in field_meta.checks:
+                return self.__make_unique_code(export_name, field_meta, columnar)
+        return self.__make_idx_code(export_name, columnar)
+
+    def __make_unique_code(self, export_name, field_meta: FieldMeta, columnar: bool = False):
+        """生成通过唯一值获取数据的代码"""
+        if columnar:
+            count, key_of = 'RowCount', f'_{field_meta.name}Column[i]'
+        else:
+            count, key_of = '_data.Length', f'_data[i].{field_meta.name}'
+        cs_type = self.type_system.map_to_csharp_type(field_meta.type)
+        unique_map = f'private Dictionary<{cs_type}, int> _idToIdx;'
+        unique_get = (f'var ok = _idToIdx.TryGetValue({field_meta.name}, out int idx);\n'
+                      f'                if (!ok)\n'
+                      f'                    UnityEngine.Debug.LogError($"[{export_name}] {field_meta.name}: {{{field_meta.name}}} not found");')
+        unique_type = f'{cs_type}'
+        unique_field_name = f'{field_meta.name}'
+        unique_method = (f'_idToIdx = new Dictionary<{cs_type},int>({count});\n'
+                         f'            for (int i = 0; i < {count}; i++)\n'
+                         f'            {{\n'
+                         f'                _idToIdx[{key_of}] = i;\n'
+                         f'            }}')
+        return (unique_map, unique_get, unique_type, unique_field_name, unique_method)
+
+    def __make_idx_code(self, export_name, columnar: bool = False):
+        count = 'RowCount' if columnar else '_data.Length'
+        unique_map = ''
+        unique_get = f'if(idx < 0 || idx >= {count})\n                    UnityEngine.Debug.LogError($"[{export_name}] {{idx}} out of bounds");'
+        unique_type = 'int'
+        unique_field_name = 'idx'
+        unique_method = ''
+        return (unique_map, unique_get, unique_type, unique_field_name, unique_method)
+
+    def __parse_row_2_code_line(self, fields: dict[str, FieldMeta], descriptors: dict[str, TypeDescriptor],
+                                row_value: dict) -> str:
+        """将单行数据转换为C#对象初始化代码"""
+        init_values = []
+        for field_name, value in row_value.items():
+            code = self.__parse_element(fields[field_name], descriptors[field_name], value)
+            init_values.append(f'{field_name}: {code}')
+        return f'                new({", ".join(init_values)})'
+
+    def __get_type_handler(self, descriptor: TypeDescriptor) -> callable:
+        """获取类型处理器"""
+        if descriptor.is_custom:
+            return self._type_handlers['custom']
+        if descriptor.kind == TypeKind.LIST:
+            return self._type_handlers['list']
+        if descriptor.kind == TypeKind.MAP:
+            return self._type_handlers['dict']
+        return self._type_handlers['builtin']
+
+    def __handle_builtin_type(self, field_meta: FieldMeta, descriptor: TypeDescriptor, value):
+        type_name = descriptor.name
+        if type_name == 'string':
+            # 多语言键已在提取阶段分配
+            key = self.current_config.i18n_keys.get(value)
+            if key is None:
+                return f'"{value}"'
+            else:
+                return f'LocalizationPool.Get("{key}")'
+        if type_name == 'bool':
+            return 'true' if value else 'false'
+        if type_name == 'float':
+            return f'{value}f'
+        return f'{value}'
+
+    def __handle_custom_type(self, field_meta: FieldMeta, descriptor: TypeDescriptor, value: dict):
+        """处理自定义类型"""
+        if descriptor.kind == TypeKind.ENUM:
+            return f'{descriptor.name}.{value}'
+        if descriptor.kind == TypeKind.STRUCT:
+            return self.__generate_struck_code(field_meta, descriptor, value)
+        if descriptor.kind == TypeKind.CLASS:
+            return self.__generate_class_code(field_meta, descriptor, value)
+        # 前面全都安全校验过了，不会走到这里
+        return ''
+
+    def __handle_list_type(self, field_meta: FieldMeta, descriptor: TypeDescriptor, value: list):
+        """处理列表类型"""
+        if value is None:
+            return 'null'
+        if len(value) <= 0:
+            return 'null'
+        element_type = descriptor.children[0]
+        elements = [self.__parse_element(field_meta, element_type, v) for v in value]
+        return f'new List<{element_type.csharp_name}>() {{ {", ".join(elements)} }}'
+
+    def __handle_dict_type(self, field_meta: FieldMeta, descriptor: TypeDescriptor, value: dict):
+        """处理字典类型"""
+        if value is None:
+            return 'null'
+        if len(value) <= 0:
+            return 'null'
+        key_type, value_type = descriptor.children
+        entries = [
+            f'[{self.__parse_element(field_meta, key_type, k)}] = {self.__parse_element(field_meta, value_type, v)}'
+            for k, v in value.items()
+        ]
+        return f'new Dictionary<{key_type.csharp_name}, {value_type.csharp_name}>() {{ {", ".join(entries)} }}'
+
+    def __parse_element(self, field_meta: FieldMeta, descriptor: TypeDescriptor, value):
+        """解析单个元素"""
+        handler = self.__get_type_handler(descriptor)
+        return handler(field_meta, descriptor, value)
+
+    def __generate_struck_code(self, field_meta: FieldMeta, descriptor: TypeDescriptor, value: dict):
+        """生成结构体初始化代码"""
+        fields = [
+            f"{field_name}: {self.__parse_element(field_meta, field_type, value.get(field_name))}"
+            for field_name, field_type in zip(descriptor.field_names, descriptor.children)
+        ]
+        return f"new {descriptor.name}({', '.join(fields)})"
+
+    def __generate_class_code(self, field_meta: FieldMeta, descriptor: TypeDescriptor, value: dict) -> str:
+        """生成类初始化代码"""
+        fields = [
+            f"{field_name}: {self.__parse_element(field_meta, field_type, value.get(field_name))}"
+            for field_name, field_type in zip(descriptor.field_names, descriptor.children)
+        ]
+        return f"new {descriptor.name}({', '.join(fields)})"
+
+    def __generate_using_statements(self, fields: dict[str, FieldMeta]):
+        """生成需要的using语句"""
+        using_statements = set()
+        for config_type in fields.values():
+            csharp_type = self.type_system.map_to_csharp_type(config_type.type)
+            if 'List<' in csharp_type or 'Dictionary<' in csharp_type:
+                using_statements.add('using System.Collections.Generic;')
+            if csharp_type in ['Vector2', 'Vector3', 'Vector4', 'Color']:
+                using_statements.add('using UnityEngine;')
+
+        return using_statements
@@ -0,0 +1,28 @@
+﻿from core.exporters.base import ExporterBase
+from core.utils.type_system import TypeSystem
+
+
+def create_exporter(type_system: TypeSystem, i18n=None, row_snapshots=None, compress: str = None,
+                    block_rows: int = 256, soa_tables=None, footprints=None, link_check: bool = False) -> ExporterBase:
+    """
+    根据导出类型创建导出器，未支持的类型返回None
+    :param i18n: 多语言管理器，分片导出时传入只记录不写入的管理器
+    :param row_snapshots: 保存行快照的缓存系统，二进制导出时用于生成增量补丁
+    :param compress: 二进制导出时的分块压缩算法，None为不压缩
+    :param soa_tables: C#导出时按列存储的表
+    :param footprints: C#导出时记录内存占用估算的清单，分片导出时传入只记录不写入的清单
+    :param link_check: SQLite导出时在提交前以SQL反连接校验CheckLink
+    """
+    if type_system.export_type == 'json':
+        from core.exporters.json import JsonExporter
+        return JsonExporter(type_system, i18n)
+    if type_system.export_type == 'csharp':
+        from core.exporters.csharp import CSharpExporter
+        return CSharpExporter(type_system, i18n, soa_tables, footprints)
+    if type_system.export_type == 'bin':
+        from core.exporters.bin import BinaryExporter
+        return BinaryExporter(type_system, i18n, row_snapshots, compress, block_rows)
+    if type_system.export_type == 'sqlite':
+        from core.exporters.sqlite import SqliteExporter
+        return SqliteExporter(type_system, i18n, link_check)
+    return None
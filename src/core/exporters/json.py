@@ -1,13 +1,13 @@
-﻿from core.exporters.base import ExporterBase
-from core.models import SheetConfig
-
-
-class JsonExporter(ExporterBase):
-    def before_export(self):
-        pass
-
-    def after_export(self):
-        pass
-
-    def export_data(self, sheet_config: SheetConfig):
-        pass
+﻿from core.exporters.base import ExporterBase
+from core.models import SheetConfig
+
+
+class JsonExporter(ExporterBase):
+    def before_export(self):
+        pass
+
+    def after_export(self):
+        pass
+
+    def export_data(self, sheet_config: SheetConfig):
+        pass
@@ -0,0 +1,281 @@
+﻿import hashlib
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+from core.exporters.pod import PodEncoder, PodBlob, PodLayout, build_data_file, parse_data_file
+from core.models import SheetConfig, FieldMeta
+from core.utils.cache import CacheSystem
+from core.utils.exceptions import BinaryExportError
+
+PATCH_MAGIC = b'E2CP'
+PATCH_VERSION = 1
+# 魔数, 版本, 布局哈希, 旧文件crc32, 新文件crc32, 行字节数, 删除行数, 写入行数, 主键索引行数, 追加数据块字节数, 保留
+PATCH_HEADER = struct.Struct('<4sIIIIIIIIII')
+# 主键索引行数为该值时沿用旧文件的索引
+KEEP_INDEX = 0xFFFFFFFF
+# 变化日志中值的最大显示长度
+VALUE_PREVIEW = 40
+
+
+def hash_row(values: tuple) -> bytes:
+    return hashlib.blake2b(repr(values).encode('utf-8'), digest_size=8).digest()
+
+
+def assemble_patched(base: tuple, removed: List[int], writes: List[tuple], index: Optional[List[int]],
+                     blob: bytes) -> bytes:
+    """
+    按补丁内容生成新文件，先删除行，再按序号覆盖或在末尾追加行，数据块只在末尾追加
+    :param base: parse_data_file 的结果
+    :param writes: [(新文件中的行序号, 行数据)]
+    :param index: 新的主键索引，None时沿用旧文件的索引
+    """
+    layout_hash, row_size, rows, base_index, base_blob = base
+    removed_set = set(removed)
+    rows = [row for idx, row in enumerate(rows) if idx not in removed_set]
+    for target, row in writes:
+        if target < len(rows):
+            rows[target] = row
+        elif target == len(rows):
+            rows.append(row)
+        else:
+            raise BinaryExportError(f'补丁中的行序号 {target} 超出范围')
+    if index is None:
+        index = base_index
+    if index is not None and len(index) != len(rows):
+        raise BinaryExportError('补丁后的主键索引与行数不一致')
+    return build_data_file(layout_hash, row_size, b''.join(rows), index, base_blob + blob)
+
+
+def apply_patch(base_content: bytes, patch: bytes) -> bytes:
+    """对旧文件应用补丁，旧文件或结果与补丁记录的crc32不一致时抛出异常"""
+    if len(patch) < PATCH_HEADER.size:
+        raise BinaryExportError('补丁文件不完整')
+    (magic, version, layout_hash, base_crc, target_crc, row_size, removed_count, write_count, index_count,
+     blob_size, _) = PATCH_HEADER.unpack_from(patch)
+    if magic != PATCH_MAGIC or version != PATCH_VERSION:
+        raise BinaryExportError('不是当前版本的补丁文件')
+    if zlib.crc32(base_content) != base_crc:
+        raise BinaryExportError('补丁与旧文件不匹配')
+    base = parse_data_file(base_content)
+    if base[0] != layout_hash or base[1] != row_size:
+        raise BinaryExportError('补丁与旧文件的布局不一致')
+    offset = PATCH_HEADER.size
+    removed = list(struct.unpack_from(f'<{removed_count}I', patch, offset))
+    offset += removed_count * 4
+    writes = []
+    for _ in range(write_count):
+        target, = struct.unpack_from('<I', patch, offset)
+        writes.append((target, patch[offset + 4:offset + 4 + row_size]))
+        offset += 4 + row_size
+    index = None
+    if index_count != KEEP_INDEX:
+        index = list(struct.unpack_from(f'<{index_count}I', patch, offset))
+        offset += index_count * 4
+    content = assemble_patched(base, removed, writes, index, patch[offset:offset + blob_size])
+    if zlib.crc32(content) != target_crc:
+        raise BinaryExportError('应用补丁后的文件校验失败')
+    return content
+
+
+class RowDiff:
+    """一张表两次导出之间的行级差异"""
+
+    def __init__(self, table: str, key_name: str):
+        self.table = table
+        # 主键字段名，没有主键时按行号对比
+        self.key_name = key_name
+        self.added = []
+        self.removed = []
+        # [(主键, [(字段名, 旧值, 新值)])]
+        self.changed = []
+        self.patch_file = None
+        self.patch_size = 0
+        # 没有可用的快照或需要整理数据块时重新完整导出
+        self.full_reason = None
+
+    def is_empty(self) -> bool:
+        return not self.added and not self.removed and not self.changed
+
+    def describe(self) -> List[str]:
+        summary = f'[{self.table}] 新增{len(self.added)} 删除{len(self.removed)} 修改{len(self.changed)}'
+        if self.patch_file is not None:
+            summary += f' 补丁 {self.patch_file.name} ({self.patch_size} 字节)'
+        if self.full_reason:
+            summary += f' 完整导出({self.full_reason})'
+        lines = [summary]
+        lines.extend(f'  + {self.__key(key)}' for key in self.added)
+        lines.extend(f'  - {self.__key(key)}' for key in self.removed)
+        for key, fields in self.changed:
+            changes = '  '.join(f'{name}: {self.__preview(old)} -> {self.__preview(new)}' for name, old, new in fields)
+            lines.append(f'  * {self.__key(key)}  {changes}')
+        return lines
+
+    def __key(self, key) -> str:
+        return f'{self.key_name}={key!r}' if self.key_name else f'第{key + 1}行'
+
+    @staticmethod
+    def __preview(value) -> str:
+        text = repr(value)
+        return text if len(text) <= VALUE_PREVIEW else f'{text[:VALUE_PREVIEW - 3]}...'
+
+
+class RowPatcher:
+    """
+    为二进制导出生成行级增量补丁
+    记录每张表上次导出的每行哈希，按主键(没有时按行号)对比，只有哈希变化的行才逐字段比较
+    未变化的行沿用上次文件中的字节，修改及新增的行重新编码，字符串和列表追加在数据块末尾，补丁只包含变化的行
+    导出的完整文件就是上次的文件应用补丁后的结果，与客户端应用补丁得到的文件逐字节一致
+    """
+    # 数据块超过完整导出时大小的该倍数(加上固定余量)时重新完整导出，清理修改行留下的废弃数据
+    COMPACT_RATIO = 2
+    COMPACT_SLACK = 64 * 1024
+
+    def __init__(self, encoder: PodEncoder, cache_system: CacheSystem, patch_dir: Path):
+        self.encoder = encoder
+        self.cache_system = cache_system
+        self.patch_dir = Path(patch_dir)
+        self.diffs: List[RowDiff] = []
+
+    def export(self, layout: PodLayout, sheet_config: SheetConfig, key_meta: Optional[FieldMeta],
+               data_file: Path) -> tuple:
+        """
+        :return: (完整文件内容, 补丁文件或None)
+        """
+        table = sheet_config.export_name
+        field_names = [slot.name for slot in layout.fields]
+        rows_values = sheet_config.rows_values
+        values = [tuple(row_value.get(name) for name in field_names) for row_value in rows_values]
+        hashes = [hash_row(value) for value in values]
+        key_name = key_meta.name if key_meta is not None else None
+        if key_meta is not None:
+            keys = [row_value.get(key_name) for row_value in rows_values]
+        else:
+            keys = list(range(len(rows_values)))
+
+        snapshot = self.cache_system.load_row_snapshot(table)
+        base_content = data_file.read_bytes() if data_file.exists() else None
+        full_reason = self.__check_snapshot(snapshot, base_content, layout, key_name, field_names)
+        if full_reason is not None:
+            if snapshot is not None:
+                diff = RowDiff(table, key_name)
+                diff.full_reason = full_reason
+                self.diffs.append(diff)
+            return self.__export_full(layout, sheet_config, key_meta, field_names, keys, hashes, values), None
+
+        diff = RowDiff(table, key_name)
+        old_keys = snapshot['keys']
+        old_positions = {key: idx for idx, key in enumerate(old_keys)}
+        new_positions = {key: idx for idx, key in enumerate(keys)}
+        removed = [idx for idx, key in enumerate(old_keys) if key not in new_positions]
+        diff.removed = [old_keys[idx] for idx in removed]
+        # 保留的行沿用原有顺序，新增的行追加在末尾
+        result_keys = [key for key in old_keys if key in new_positions]
+        result_keys.extend(key for key in keys if key not in old_positions)
+
+        base = parse_data_file(base_content)
+        blob = PodBlob(start=len(base[4]))
+        writes = []
+        for target, key in enumerate(result_keys):
+            row_idx = new_positions[key]
+            old_idx = old_positions.get(key)
+            if old_idx is None:
+                diff.added.append(key)
+            elif snapshot['hashes'][old_idx] == hashes[row_idx]:
+                continue
+            else:
+                old_values = snapshot['values'][old_idx]
+                diff.changed.append((key, [(name, old, new) for name, old, new
+                                           in zip(field_names, old_values, values[row_idx]) if old != new]))
+            location = f'[{table}] 第{row_idx + 1}行'
+            writes.append((target, self.encoder.encode_row(layout, rows_values[row_idx], blob, location)))
+        if diff.is_empty():
+            return base_content, None
+
+        index = None
+        if key_meta is not None and (diff.added or diff.removed):
+            index = self.encoder.build_index(key_meta, result_keys)
+        if len(base[4]) + len(blob.data) > self.COMPACT_RATIO * snapshot['compact_blob_size'] + self.COMPACT_SLACK:
+            diff.full_reason = '整理数据块'
+            self.diffs.append(diff)
+            return self.__export_full(layout, sheet_config, key_meta, field_names, keys, hashes, values), None
+
+        content = assemble_patched(base, removed, writes, index, bytes(blob.data))
+        patch = self.__build_patch(layout, base_content, content, removed, writes, index, bytes(blob.data))
+        self.patch_dir.mkdir(parents=True, exist_ok=True)
+        patch_file = self.patch_dir / f'{table}_{zlib.crc32(base_content):08x}_{zlib.crc32(content):08x}.patch'
+        with open(patch_file, 'wb') as f:
+            f.write(patch)
+        diff.patch_file = patch_file
+        diff.patch_size = len(patch)
+        self.diffs.append(diff)
+
+        result_rows = [new_positions[key] for key in result_keys]
+        self.__save_snapshot(table, layout, content, key_name, field_names, result_keys,
+                             [hashes[idx] for idx in result_rows], [values[idx] for idx in result_rows],
+                             snapshot['compact_blob_size'])
+        return content, patch_file
+
+    def write_changelog(self):
+        """变化记录追加到补丁目录的 changelog.txt"""
+        diffs = [diff for diff in self.diffs if not diff.is_empty() or diff.full_reason]
+        self.diffs = []
+        if not diffs:
+            return
+        self.patch_dir.mkdir(parents=True, exist_ok=True)
+        lines = [f'==== {time.strftime("%Y-%m-%d %H:%M:%S")} ====']
+        for diff in diffs:
+            lines.extend(diff.describe())
+        with open(self.patch_dir / 'changelog.txt', 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n\n')
+
+    @staticmethod
+    def __check_snapshot(snapshot: Optional[dict], base_content: Optional[bytes], layout: PodLayout,
+                         key_name: Optional[str], field_names: List[str]) -> Optional[str]:
+        """快照可用于生成补丁时返回None，否则返回需要完整导出的原因"""
+        if snapshot is None or base_content is None:
+            return '没有上次导出的记录'
+        if snapshot['layout_hash'] != layout.layout_hash or snapshot['fields'] != field_names:
+            return '布局变化'
+        if snapshot['key'] != key_name:
+            return '主键变化'
+        if zlib.crc32(base_content) != snapshot['crc']:
+            return '旧文件已被修改'
+        return None
+
+    def __export_full(self, layout: PodLayout, sheet_config: SheetConfig, key_meta: Optional[FieldMeta],
+                      field_names: List[str], keys: list, hashes: list, values: list) -> bytes:
+        content = self.encoder.build_file(layout, sheet_config, key_meta)
+        self.__save_snapshot(sheet_config.export_name, layout, content, key_meta.name if key_meta else None,
+                             field_names, keys, hashes, values, len(parse_data_file(content)[4]))
+        return content
+
+    def __save_snapshot(self, table: str, layout: PodLayout, content: bytes, key_name: Optional[str],
+                        field_names: List[str], keys: list, hashes: list, values: list, compact_blob_size: int):
+        self.cache_system.save_row_snapshot(table, {
+            'layout_hash': layout.layout_hash,
+            'fields': field_names,
+            'key': key_name,
+            'crc': zlib.crc32(content),
+            'keys': keys,
+            'hashes': hashes,
+            'values': values,
+            'compact_blob_size': compact_blob_size,
+        })
+
+    @staticmethod
+    def __build_patch(layout: PodLayout, base_content: bytes, content: bytes, removed: List[int],
+                      writes: List[tuple], index: Optional[List[int]], blob: bytes) -> bytes:
+        header = PATCH_HEADER.pack(PATCH_MAGIC, PATCH_VERSION, layout.layout_hash, zlib.crc32(base_content),
+                                   zlib.crc32(content), layout.size, len(removed), len(writes),
+                                   KEEP_INDEX if index is None else len(index), len(blob), 0)
+        parts = [header, struct.pack(f'<{len(removed)}I', *removed)]
+        for target, row in writes:
+            parts.append(struct.pack('<I', target))
+            parts.append(row)
+        if index is not None:
+            parts.append(struct.pack(f'<{len(index)}I', *index))
+        parts.append(blob)
+        return b''.join(parts)
@@ -0,0 +1,355 @@
+﻿import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from core.models import SheetConfig, FieldMeta
+from core.utils.exceptions import BinaryExportError
+from core.utils.layout import optimize_order
+from core.utils.type_system import TypeSystem, TypeDescriptor, TypeKind
+
+# 二进制配置文件头，与ConfigLoader.h中的FileHeader一致
+FILE_MAGIC = b'E2CB'
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct('<4sIIIIIIIII')
+
+# 内置类型 -> (struct格式, 字节数, C++类型)，对齐等于字节数
+SCALAR_TYPES = {
+    'bool': ('?', 1, 'bool'),
+    'byte': ('B', 1, 'uint8_t'),
+    'sbyte': ('b', 1, 'int8_t'),
+    'short': ('h', 2, 'int16_t'),
+    'ushort': ('H', 2, 'uint16_t'),
+    'char': ('H', 2, 'char16_t'),
+    'int': ('i', 4, 'int32_t'),
+    'uint': ('I', 4, 'uint32_t'),
+    'long': ('q', 8, 'int64_t'),
+    'ulong': ('Q', 8, 'uint64_t'),
+    'float': ('f', 4, 'float'),
+    'double': ('d', 8, 'double'),
+    'decimal': ('d', 8, 'double'),
+    # 日期转换成时间戳
+    'datetime': ('q', 8, 'int64_t'),
+}
+
+# 字符串和列表都是数据块中的(偏移, 长度)
+REF_FORMAT = 'II'
+REF_SIZE = 8
+REF_ALIGN = 4
+
+
+@dataclass
+class PodSlot:
+    """结构体中的一个字段或填充"""
+    name: str
+    # 填充字节为None
+    descriptor: Optional[TypeDescriptor]
+    offset: int
+    size: int
+    align: int
+    cpp_type: str
+    comment: str = ''
+
+    @property
+    def is_padding(self) -> bool:
+        return self.descriptor is None
+
+
+@dataclass
+class PodLayout:
+    """
+    平坦的POD结构体布局，字段以自然对齐排列，填充字节显式列出
+    C++代码和二进制数据共用同一个布局，布局哈希不一致时拒绝加载
+    """
+    name: str
+    slots: List[PodSlot] = field(default_factory=list)
+    size: int = 0
+    align: int = 1
+    format: str = ''
+    signature: str = ''
+
+    @property
+    def fields(self) -> List[PodSlot]:
+        return [slot for slot in self.slots if not slot.is_padding]
+
+    @property
+    def padding(self) -> int:
+        return sum(slot.size for slot in self.slots if slot.is_padding)
+
+    @property
+    def layout_hash(self) -> int:
+        return zlib.crc32(self.signature.encode('utf-8'))
+
+
+class PodLayoutBuilder:
+    """根据类型系统计算表和自定义类型的POD布局"""
+
+    def __init__(self, type_system: TypeSystem):
+        self.type_system = type_system
+        # 类型名 -> 布局
+        self.__layouts = {}
+
+    def table_layout(self, sheet_config: SheetConfig, optimized: bool = True) -> PodLayout:
+        """
+        表的行布局，忽略的字段不导出
+        :param optimized: 字段按对齐从大到小排列使填充最少，否则按声明顺序
+        """
+        members = [(meta.name, self.type_system.describe(meta.type), meta.comment)
+                   for meta in sheet_config.fields.values() if not meta.is_ignored]
+        if optimized:
+            members = optimize_order(members, lambda member: self.element_info(member[1])[2])
+        return self.__build(sheet_config.export_name, members)
+
+    def type_layout(self, descriptor: TypeDescriptor) -> PodLayout:
+        """自定义结构体、类，以及字典条目的布局"""
+        layout = self.__layouts.get(descriptor.name)
+        if layout is None:
+            if descriptor.kind == TypeKind.MAP:
+                key_type, value_type = descriptor.children
+                members = [('key', key_type, ''), ('value', value_type, '')]
+            else:
+                members = [(name, child, '') for name, child in zip(descriptor.field_names, descriptor.children)]
+            layout = self.__layouts[descriptor.name] = self.__build(descriptor.name, members)
+        return layout
+
+    def element_info(self, descriptor: TypeDescriptor) -> tuple:
+        """
+        类型在结构体或数组中的存储方式
+        :return: (struct格式, 字节数, 对齐, C++类型, 签名)
+        """
+        if descriptor.kind == TypeKind.BUILTIN:
+            if descriptor.name == 'string':
+                return REF_FORMAT, REF_SIZE, REF_ALIGN, 'StrRef', 'str'
+            fmt, size, cpp_type = SCALAR_TYPES[descriptor.name]
+            return fmt, size, size, cpp_type, cpp_type
+        if descriptor.kind == TypeKind.ENUM:
+            return 'i', 4, 4, descriptor.name, f'enum {descriptor.name}'
+        if descriptor.kind == TypeKind.LIST:
+            element = self.element_info(descriptor.children[0])
+            return REF_FORMAT, REF_SIZE, REF_ALIGN, f'ArrayRef<{element[3]}>', f'list<{element[4]}>'
+        if descriptor.kind == TypeKind.MAP:
+            key, value = (self.element_info(child) for child in descriptor.children)
+            return REF_FORMAT, REF_SIZE, REF_ALIGN, f'MapRef<{key[3]}, {value[3]}>', f'map<{key[4]},{value[4]}>'
+        layout = self.type_layout(descriptor)
+        return layout.format, layout.size, layout.align, descriptor.name, f'{descriptor.name}{{{layout.signature}}}'
+
+    def __build(self, name: str, members: list) -> PodLayout:
+        layout = PodLayout(name)
+        offset = 0
+        formats = []
+        signatures = []
+        for member_name, descriptor, comment in members:
+            fmt, size, align, cpp_type, signature = self.element_info(descriptor)
+            offset = self.__pad(layout, formats, offset, align)
+            layout.slots.append(PodSlot(member_name, descriptor, offset, size, align, cpp_type, comment))
+            formats.append(fmt)
+            signatures.append(f'{member_name}:{signature}@{offset}')
+            offset += size
+            layout.align = max(layout.align, align)
+        layout.size = self.__pad(layout, formats, offset, layout.align)
+        layout.format = ''.join(formats)
+        layout.signature = f'{";".join(signatures)}#{layout.size}'
+        return layout
+
+    @staticmethod
+    def __pad(layout: PodLayout, formats: list, offset: int, align: int) -> int:
+        padding = -offset % align
+        if padding:
+            layout.slots.append(PodSlot(f'_pad{len(layout.slots) - len(layout.fields)}', None, offset, padding, 1,
+                                        'uint8_t'))
+            formats.append(f'{padding}x')
+        return offset + padding
+
+
+class PodBlob:
+    """
+    字符串和列表元素所在的数据块，相同的字符串只存一份
+    :param start: 追加在已有数据块之后时已有数据块的大小，返回的偏移从数据块起点算起
+    """
+
+    def __init__(self, start: int = 0):
+        self.start = start
+        self.data = bytearray()
+        self.__strings = {}
+
+    def add_string(self, text: str) -> tuple:
+        ref = self.__strings.get(text)
+        if ref is None:
+            raw = text.encode('utf-8')
+            ref = self.__strings[text] = (self.start + len(self.data), len(raw))
+            # 以'\0'结尾，C++中可直接作为C字符串使用
+            self.data += raw + b'\0'
+        return ref
+
+    def add_array(self, payload: bytes, align: int, count: int) -> tuple:
+        if count == 0:
+            return 0, 0
+        self.align(align)
+        offset = self.start + len(self.data)
+        self.data += payload
+        return offset, count
+
+    def align(self, align: int):
+        self.data += bytes(-(self.start + len(self.data)) % align)
+
+
+class PodEncoder:
+    """按布局把行数据编码为二进制，字符串和列表写入数据块"""
+
+    def __init__(self, builder: PodLayoutBuilder):
+        self.builder = builder
+        # 布局 -> 预编译的struct
+        self.__structs = {}
+        # 枚举名 -> {枚举值: 序号}
+        self.__enum_values = {}
+
+    def build_file(self, layout: PodLayout, sheet_config: SheetConfig, key_meta: Optional[FieldMeta]) -> bytes:
+        """完整的二进制配置文件"""
+        blob = PodBlob()
+        rows = self.encode_rows(layout, sheet_config, blob)
+        index = None
+        if key_meta is not None:
+            index = self.build_index(key_meta, [row_value.get(key_meta.name) for row_value in sheet_config.rows_values])
+        return build_data_file(layout.layout_hash, layout.size, rows, index, bytes(blob.data))
+
+    def encode_rows(self, layout: PodLayout, sheet_config: SheetConfig, blob: PodBlob) -> bytes:
+        rows = bytearray()
+        for row_idx, row_value in enumerate(sheet_config.rows_values):
+            rows += self.encode_row(layout, row_value, blob, f'[{sheet_config.export_name}] 第{row_idx + 1}行')
+        return bytes(rows)
+
+    def encode_row(self, layout: PodLayout, row_value, blob: PodBlob, location: str = '') -> bytes:
+        values = []
+        for slot in layout.fields:
+            try:
+                self.__flatten(slot.descriptor, row_value.get(slot.name), blob, values)
+            except (struct.error, TypeError, ValueError) as e:
+                raise BinaryExportError(f'{location} 字段 {slot.name}: {e}')
+        try:
+            return self.__get_struct(layout.format).pack(*values)
+        except struct.error as e:
+            raise BinaryExportError(f'{location}: {e}')
+
+    def build_index(self, key_meta: FieldMeta, keys: list) -> List[int]:
+        """
+        按主键排序的行序号，C++中二分查找
+        :param keys: 每行的主键值
+        """
+        keys = self.key_sort_values(key_meta, keys)
+        return sorted(range(len(keys)), key=keys.__getitem__)
+
+    def key_sort_values(self, key_meta: FieldMeta, keys: list) -> list:
+        """主键在二进制数据中的比较值，枚举为序号，字符串为UTF-8字节"""
+        descriptor = self.builder.type_system.describe(key_meta.type)
+        if descriptor.kind == TypeKind.ENUM:
+            enum_values = self.__get_enum_values(descriptor)
+            return [enum_values[value] for value in keys]
+        if descriptor.name == 'string':
+            return [value.encode('utf-8') for value in keys]
+        if descriptor.name == 'char':
+            return [ord(value[0]) if value else 0 for value in keys]
+        return list(keys)
+
+    def __flatten(self, descriptor: TypeDescriptor, value, blob: PodBlob, out: list):
+        if value is None:
+            value = descriptor.default
+        kind = descriptor.kind
+        if kind == TypeKind.BUILTIN:
+            if descriptor.name == 'string':
+                out.extend(blob.add_string(value or ''))
+            elif descriptor.name == 'char':
+                out.append(ord(value[0]) if isinstance(value, str) and value else 0)
+            else:
+                out.append(value if value is not None else 0)
+        elif kind == TypeKind.ENUM:
+            out.append(self.__get_enum_values(descriptor)[value])
+        elif kind == TypeKind.LIST:
+            out.extend(self.__encode_array(descriptor.children[0], value or (), blob))
+        elif kind == TypeKind.MAP:
+            entries = [{'key': k, 'value': v} for k, v in (value or {}).items()]
+            out.extend(self.__encode_array(descriptor, entries, blob, self.builder.type_layout(descriptor)))
+        else:
+            for name, child in zip(descriptor.field_names, descriptor.children):
+                self.__flatten(child, (value or {}).get(name), blob, out)
+
+    def __encode_array(self, descriptor: TypeDescriptor, elements, blob: PodBlob, layout: PodLayout = None) -> tuple:
+        if layout is not None:
+            fmt, align, members = layout.format, layout.align, layout.fields
+        else:
+            fmt, _, align, _, _ = self.builder.element_info(descriptor)
+            members = None
+        packer = self.__get_struct(fmt)
+        # 元素中的字符串和嵌套列表先写入数据块，再写入元素本身
+        payload = bytearray()
+        for element in elements:
+            values = []
+            if members is None:
+                self.__flatten(descriptor, element, blob, values)
+            else:
+                for slot in members:
+                    self.__flatten(slot.descriptor, element[slot.name], blob, values)
+            payload += packer.pack(*values)
+        return blob.add_array(bytes(payload), align, len(elements))
+
+    def __get_struct(self, fmt: str) -> struct.Struct:
+        packer = self.__structs.get(fmt)
+        if packer is None:
+            packer = self.__structs[fmt] = struct.Struct(f'<{fmt}')
+        return packer
+
+    def __get_enum_values(self, descriptor: TypeDescriptor) -> Dict[str, int]:
+        values = self.__enum_values.get(descriptor.name)
+        if values is None:
+            values = self.__enum_values[descriptor.name] = {
+                value: idx for idx, value in enumerate(descriptor.definition['fields'])
+            }
+        return values
+
+
+def build_data_file(layout_hash: int, row_size: int, rows: bytes, index: Optional[List[int]], blob: bytes) -> bytes:
+    """
+    组装二进制配置文件
+    文件头 | 行数据 | 主键索引(按主键排序的行序号) | 数据块(字符串及列表元素)
+    """
+    row_count = len(rows) // row_size if row_size else 0
+    rows_offset = FILE_HEADER.size
+    index_offset = rows_offset + len(rows) + (-len(rows) % 4)
+    blob_offset = index_offset + len(index or ()) * 4
+    blob_offset += -blob_offset % 8
+    header = FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, layout_hash, row_count, row_size, rows_offset,
+                              index_offset if index is not None else 0, blob_offset, len(blob), 0)
+    return b''.join([
+        header,
+        rows,
+        bytes(index_offset - rows_offset - len(rows)),
+        struct.pack(f'<{len(index or ())}I', *(index or ())),
+        bytes(blob_offset - index_offset - len(index or ()) * 4),
+        blob,
+    ])
+
+
+def parse_data_file(content: bytes) -> tuple:
+    """
+    解析二进制配置文件
+    :return: (布局哈希, 行字节数, [每行数据], 主键索引或None, 数据块)
+    """
+    if len(content) < FILE_HEADER.size:
+        raise BinaryExportError('二进制配置文件不完整')
+    (magic, version, layout_hash, row_count, row_size, rows_offset, index_offset, blob_offset, blob_size,
+     _) = FILE_HEADER.unpack_from(content)
+    if magic != FILE_MAGIC or version != FILE_VERSION:
+        raise BinaryExportError('不是当前版本的二进制配置文件')
+    rows = [content[rows_offset + i * row_size:rows_offset + (i + 1) * row_size] for i in range(row_count)]
+    index = list(struct.unpack_from(f'<{row_count}I', content, index_offset)) if index_offset else None
+    return layout_hash, row_size, rows, index, content[blob_offset:blob_offset + blob_size]
+
+
+def find_key_field(sheet_config: SheetConfig, type_system: TypeSystem) -> Optional[FieldMeta]:
+    """用于查找的主键，与C#相同取第一个CheckRepeat字段，只支持标量、字符串和枚举"""
+    for meta in sheet_config.fields.values():
+        if 'CheckRepeat' in meta.checks and not meta.is_ignored:
+            descriptor = type_system.describe(meta.type)
+            if descriptor.kind in (TypeKind.BUILTIN, TypeKind.ENUM):
+                return meta
+            return None
+    return None
@@ -0,0 +1,253 @@
+﻿import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from core.exporters.base import ExporterBase
+from core.i18n.i18n_manager import I18NManager
+from core.models import SheetConfig, FieldMeta
+from core.processors.validators import LinkValidator
+from core.utils.exceptions import SqlLinkCheckError
+from core.utils.trace import tracer
+from core.utils.type_system import TypeSystem, TypeDescriptor, TypeKind
+
+SQLITE_FILE = 'configs.db'
+# 按表记录来源Excel和行数
+TABLES_TABLE = '_tables'
+# 按字段记录CheckLink，供SQL校验及工具查询表之间的引用
+LINKS_TABLE = '_links'
+INTEGER_TYPES = ('int', 'long', 'byte', 'sbyte', 'short', 'uint', 'ulong', 'ushort', 'bool', 'datetime')
+REAL_TYPES = ('float', 'double', 'decimal')
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def column_type(descriptor: TypeDescriptor) -> str:
+    """字段在SQLite中的列类型，列表、字典、结构体及类为JSON文本"""
+    if descriptor.kind == TypeKind.BUILTIN:
+        if descriptor.name in INTEGER_TYPES:
+            return 'INTEGER'
+        if descriptor.name in REAL_TYPES:
+            return 'REAL'
+    return 'TEXT'
+
+
+def to_json(value):
+    return None if value is None else json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=float)
+
+
+def to_real(value):
+    """SQLite没有定点小数，decimal按双精度存储"""
+    return None if value is None else float(value)
+
+
+def is_database_synced(database_file: Path, file_md5s: set) -> bool:
+    """
+    数据库记录的来源Excel哈希是否与输入目录一致，不一致时即使没有修改也需要导出
+    其它导出类型会更新同一份文件缓存，不能只根据缓存判断数据库是否包含所有表
+    """
+    if not database_file.exists():
+        return False
+    try:
+        with closing(sqlite3.connect(database_file)) as connection:
+            sources = [json.loads(row[0]) for row in connection.execute(f'SELECT source_files FROM {TABLES_TABLE}')]
+    except sqlite3.Error:
+        return False
+    # 旧版本按列表记录来源文件，没有哈希
+    if not all(isinstance(files, dict) for files in sources):
+        return False
+    return {md5 for files in sources for md5 in files.values()} == file_md5s
+
+
+class SqliteStore:
+    """
+    将合并后的表写入SQLite，每张表一个同名的数据表，每个字段一列
+    CheckRepeat字段建唯一索引，CheckLink字段及被链接的字段建索引，被链接的字段按文本建表达式索引用于链接校验
+    """
+
+    def __init__(self, type_system: TypeSystem, connection: sqlite3.Connection):
+        self.type_system = type_system
+        self.connection = connection
+        connection.execute(f'CREATE TABLE IF NOT EXISTS {TABLES_TABLE} '
+                           f'(name TEXT PRIMARY KEY, source_file TEXT, source_files TEXT, rows INTEGER)')
+        connection.execute(f'CREATE TABLE IF NOT EXISTS {LINKS_TABLE} '
+                           f'(source_table TEXT, field TEXT, is_list INTEGER, target_table TEXT, target_field TEXT, '
+                           f'ignores TEXT)')
+
+    def write_table(self, sheet_config: SheetConfig):
+        """替换一张表的数据、索引及链接记录"""
+        table = sheet_config.export_name
+        fields = [meta for meta in sheet_config.fields.values() if not meta.is_ignored]
+        descriptors = [self.type_system.describe(meta.type) for meta in fields]
+        self.connection.execute(f'DROP TABLE IF EXISTS {quote(table)}')
+        columns = ', '.join(f'{quote(meta.name)} {column_type(descriptor)}'
+                            for meta, descriptor in zip(fields, descriptors))
+        self.connection.execute(f'CREATE TABLE {quote(table)} ({columns})')
+
+        converters = [self.__get_converter(descriptor) for descriptor in descriptors]
+        names = [meta.name for meta in fields]
+        placeholders = ', '.join('?' * len(fields))
+        with tracer.span('insert', 'table', table=table, rows=len(sheet_config.rows_values)):
+            self.connection.executemany(
+                f'INSERT INTO {quote(table)} VALUES ({placeholders})',
+                ([convert(row_value.get(name)) if convert else row_value.get(name)
+                  for name, convert in zip(names, converters)] for row_value in sheet_config.rows_values))
+
+        # 数据插入后再建索引，避免逐行维护索引
+        for meta, descriptor in zip(fields, descriptors):
+            if 'CheckRepeat' in meta.checks:
+                self.__create_index(table, meta.name, unique=True)
+            elif descriptor.kind in (TypeKind.BUILTIN, TypeKind.ENUM) and self.__has_link_check(meta):
+                self.__create_index(table, meta.name)
+        self.__record_table(sheet_config, fields, descriptors)
+
+    def index_link_targets(self):
+        """为被链接的字段建文本表达式索引，被链接的表可能在之前的导出中写入"""
+        for target_table, target_field in self.connection.execute(
+                f'SELECT DISTINCT target_table, target_field FROM {LINKS_TABLE}').fetchall():
+            if target_field in self.get_columns(target_table):
+                self.connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS {quote(f"link_{target_table}_{target_field}")} '
+                    f'ON {quote(target_table)} (CAST({quote(target_field)} AS TEXT))')
+
+    def find_broken_links(self) -> List[tuple]:
+        """
+        以反连接查找不在被链接表中的值，与LinkValidator相同按文本比较
+        :return: [(来源Excel, 字段名, 值, 目标表, 目标字段)]
+        """
+        broken = []
+        links = self.connection.execute(
+            f'SELECT l.source_table, l.field, l.is_list, l.target_table, l.target_field, l.ignores, t.source_file '
+            f'FROM {LINKS_TABLE} l JOIN {TABLES_TABLE} t ON t.name = l.source_table '
+            f'ORDER BY l.source_table, l.rowid').fetchall()
+        for source_table, field_name, is_list, target_table, target_field, ignores, source_file in links:
+            ignores = json.loads(ignores)
+            if is_list:
+                source = f'{quote(source_table)} s, json_each(s.{quote(field_name)}) v'
+                value = 'v.value'
+                order = 's.rowid, v.id'
+            else:
+                source = f'{quote(source_table)} s'
+                value = f's.{quote(field_name)}'
+                order = 's.rowid'
+            conditions = [f'{value} IS NOT NULL']
+            if ignores:
+                conditions.append(f'CAST({value} AS TEXT) NOT IN ({", ".join("?" * len(ignores))})')
+            # 被链接的表或字段不存在时所有值都不合法
+            if target_field in self.get_columns(target_table):
+                conditions.append(f'NOT EXISTS (SELECT 1 FROM {quote(target_table)} t '
+                                  f'WHERE CAST(t.{quote(target_field)} AS TEXT) = CAST({value} AS TEXT))')
+            with tracer.span('CheckLink', 'sql', table=source_table, field=field_name):
+                rows = self.connection.execute(
+                    f'SELECT CAST({value} AS TEXT) FROM {source} WHERE {" AND ".join(conditions)} ORDER BY {order}',
+                    ignores).fetchall()
+            broken.extend((source_file, field_name, row[0], target_table, target_field) for row in rows)
+        return broken
+
+    def get_tables(self) -> Dict[str, dict]:
+        """数据库中的表 {导出名称: {文件路径: 文件哈希}}"""
+        return {name: json.loads(source_files)
+                for name, source_files in self.connection.execute(f'SELECT name, source_files FROM {TABLES_TABLE}')}
+
+    def drop_table(self, table: str):
+        """删除表的数据及记录"""
+        self.connection.execute(f'DROP TABLE IF EXISTS {quote(table)}')
+        self.connection.execute(f'DELETE FROM {TABLES_TABLE} WHERE name = ?', (table,))
+        self.connection.execute(f'DELETE FROM {LINKS_TABLE} WHERE source_table = ?', (table,))
+
+    def get_columns(self, table: str) -> List[str]:
+        return [row[1] for row in self.connection.execute(f'PRAGMA table_info({quote(table)})')]
+
+    @staticmethod
+    def __has_link_check(meta: FieldMeta) -> bool:
+        return any(check.startswith('CheckLink') for check in meta.checks)
+
+    def __create_index(self, table: str, field_name: str, unique: bool = False):
+        self.connection.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX {quote(f"idx_{table}_{field_name}")} '
+                                f'ON {quote(table)} ({quote(field_name)})')
+
+    def __record_table(self, sheet_config: SheetConfig, fields: List[FieldMeta], descriptors: List[TypeDescriptor]):
+        table = sheet_config.export_name
+        source_files = sheet_config.source_files or {sheet_config.source_file: sheet_config.source_file_md5}
+        self.connection.execute(f'INSERT OR REPLACE INTO {TABLES_TABLE} VALUES (?, ?, ?, ?)',
+                                (table, sheet_config.source_file, to_json(dict(sorted(source_files.items()))),
+                                 len(sheet_config.rows_values)))
+        self.connection.execute(f'DELETE FROM {LINKS_TABLE} WHERE source_table = ?', (table,))
+        for meta, descriptor in zip(fields, descriptors):
+            # 字典不校验，无法确定校验键还是值
+            if descriptor.kind == TypeKind.MAP:
+                continue
+            for check in meta.checks:
+                if not check.startswith('CheckLink'):
+                    continue
+                target_table, target_field, ignores = LinkValidator.parse_check_tag(check)
+                self.connection.execute(f'INSERT INTO {LINKS_TABLE} VALUES (?, ?, ?, ?, ?, ?)',
+                                        (table, meta.name, int(descriptor.kind == TypeKind.LIST), target_table,
+                                         target_field, to_json(ignores)))
+
+    @staticmethod
+    def __get_converter(descriptor: TypeDescriptor) -> Optional[Callable]:
+        if descriptor.kind == TypeKind.BUILTIN and descriptor.name == 'decimal':
+            return to_real
+        if descriptor.kind in (TypeKind.BUILTIN, TypeKind.ENUM):
+            return None
+        return to_json
+
+
+class SqliteExporter(ExporterBase):
+    """
+    将所有表导出到一个SQLite数据库，供工具及QA脚本查询
+    每次导出在一个事务中替换修改过的表以及数据库中缺少或来源不一致的表，未修改的表保留上次导出的数据
+    已不存在的表从数据库中删除，数据库始终包含所有表
+    """
+
+    def __init__(self, type_system: TypeSystem, i18n: I18NManager = None, link_check: bool = False):
+        """:param link_check: 提交前以SQL反连接校验所有表的CheckLink，校验失败时回滚"""
+        super().__init__(type_system, i18n)
+        self.link_check = link_check
+        self.database_file = self.export_data_dir / SQLITE_FILE
+        self.connection = None
+        self.store = None
+
+    def before_export(self):
+        self.__close()
+        # 手动控制事务，所有表在一个事务中写入
+        self.connection = sqlite3.connect(self.database_file, isolation_level=None)
+        self.connection.execute('BEGIN')
+        self.store = SqliteStore(self.type_system, self.connection)
+
+    def sync_tables(self, sources: dict) -> set:
+        tables = self.store.get_tables()
+        for table in sorted(set(tables) - set(sources)):
+            print(f'表[ {table} ]已不存在，从数据库中删除')
+            self.store.drop_table(table)
+        return {name for name, files in sources.items() if tables.get(name) != files}
+
+    def after_export(self):
+        try:
+            with tracer.span('index_links'):
+                self.store.index_link_targets()
+            if self.link_check:
+                with tracer.span('validate:SqlLinkCheck'):
+                    broken = self.store.find_broken_links()
+                if broken:
+                    raise SqlLinkCheckError([LinkValidator.format_error(*record) for record in broken])
+            self.connection.execute('COMMIT')
+        finally:
+            self.__close()
+        self.artifacts.append(str(self.database_file))
+        self.i18n.write_master_file()
+
+    def export_data(self, sheet_config: SheetConfig):
+        self.store.write_table(sheet_config)
+
+    def __close(self):
+        if self.connection is not None:
+            if self.connection.in_transaction:
+                self.connection.execute('ROLLBACK')
+            self.connection.close()
+            self.connection = None
+            self.store = None
@@ -0,0 +1,58 @@
+﻿from core.i18n.i18n_manager import I18NManager
+from core.models import SheetConfig
+from core.utils.type_system import TypeSystem, TypeDescriptor, TypeKind
+
+
+class I18NExtractor:
+    """
+    多语言提取阶段，每张表在校验之后、导出之前执行一次
+    同一张表中相同的文本只检测、分配一次键，结果记录在 SheetConfig.i18n_keys 中供各导出器查询
+    按行、按列的顺序遍历，与逐个单元格提取时生成的键及master文件内容一致
+    """
+
+    def __init__(self, type_system: TypeSystem, i18n: I18NManager):
+        self.type_system = type_system
+        self.i18n = i18n
+
+    def extract(self, config: SheetConfig):
+        self.i18n.begin_table(config.export_name)
+        # 只遍历包含字符串的字段
+        descriptors = {}
+        for name, meta in config.fields.items():
+            descriptor = self.type_system.describe(meta.type)
+            if self.__has_string(descriptor):
+                descriptors[name] = descriptor
+        # 文本 -> 键，不需要多语言的文本为None
+        memo = {}
+        if descriptors:
+            for row_value in config.rows_values:
+                for field_name, value in row_value.items():
+                    descriptor = descriptors.get(field_name)
+                    if descriptor is not None:
+                        self.__collect(config.export_name, field_name, descriptor, value, memo)
+        config.i18n_keys = {value: key for value, key in memo.items() if key is not None}
+
+    def __collect(self, table_name: str, field_name: str, descriptor: TypeDescriptor, value, memo: dict):
+        if value is None:
+            return
+        if descriptor.kind == TypeKind.BUILTIN:
+            if descriptor.name != 'string' or value in memo:
+                return
+            # 纯ASCII文本不可能包含中文，跳过正则检测
+            memo[value] = None if value.isascii() else self.i18n.update_raw_master(table_name, field_name, value)
+        elif descriptor.kind == TypeKind.LIST:
+            for element in value:
+                self.__collect(table_name, field_name, descriptor.children[0], element, memo)
+        elif descriptor.kind == TypeKind.MAP:
+            key_type, value_type = descriptor.children
+            for k, v in value.items():
+                self.__collect(table_name, field_name, key_type, k, memo)
+                self.__collect(table_name, field_name, value_type, v, memo)
+        elif descriptor.kind in (TypeKind.STRUCT, TypeKind.CLASS):
+            for name, child in zip(descriptor.field_names, descriptor.children):
+                self.__collect(table_name, field_name, child, value.get(name), memo)
+
+    def __has_string(self, descriptor: TypeDescriptor) -> bool:
+        if descriptor.kind == TypeKind.BUILTIN:
+            return descriptor.name == 'string'
+        return any(self.__has_string(child) for child in descriptor.children)
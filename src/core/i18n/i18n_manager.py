@@ -1,61 +1,208 @@
-﻿import hashlib
-import core.utils.utils
-from core.utils.utils import is_contains_chinese
-from pathlib import Path
-
-
-class I18NManager:
-    def __init__(self):
-        self.root_dir = Path('localization')
-        # 首包包含的所有多语言
-        self.master_file = self.root_dir / f'master{core.utils.utils.LANG_SUFFIX}'
-        self.__ensure_dir()
-        self.master_i18 = self.parse_file(self.master_file)
-
-    def __ensure_dir(self):
-        self.root_dir.mkdir(parents=True, exist_ok=True)
-        (self.root_dir / 'patch').mkdir(exist_ok=True)
-
-    def __generate_key(self, table_name, col_name, value):
-        """生成多语言唯一的哈希值"""
-        unique_str = f'{table_name}_{col_name}_{value}'
-        key = hashlib.sha256(unique_str.encode()).hexdigest()[:4]
-        return f'{table_name}/{key}'
-
-    def update_raw_master(self, table_name, col_name, value):
-        """更新配置多语言信息"""
-        if not is_contains_chinese(value):
-            return None
-        key = self.__generate_key(table_name, col_name, value)
-        if self.master_i18.get('Raw') is None:
-            self.master_i18['Raw'] = {}
-        self.master_i18['Raw'][key] = value
-        return key
-
-    def parse_file(self, file_path: Path) -> dict:
-        """解析多语言文件"""
-        sections = {}
-        current_section = None
-        if file_path.exists():
-            for line in file_path.read_text(encoding='utf-8').splitlines():
-                line = line.strip()
-                if line.startswith('['):
-                    current_section = line[1:-1]
-                    sections[current_section] = {}
-                elif '=' in line and current_section:
-                    key, value = line.split('=', 1)
-                    sections[current_section][key.strip()] = value.strip()
-        return sections
-
-    def write_file(self, file_path: Path, data: dict):
-        """写入多语言文件"""
-        contents = []
-        for section, items in data.items():
-            contents.append(f'[{section}]')
-            for key, value in items.items():
-                contents.append(f'{key}={value}')
-        file_path.write_text('\n'.join(contents), encoding='utf-8')
-
-    def write_master_file(self):
-        """写入配置多语言"""
-        self.write_file(self.master_file, self.master_i18)
+﻿import hashlib
+import core.utils.utils
+from core.utils.utils import is_contains_chinese
+from core.i18n.string_pool import StringPoolWriter
+from pathlib import Path
+
+# 旧版本所有表共用的段
+LEGACY_SECTION = 'Raw'
+
+
+class I18NManager:
+    """
+    配置多语言，master文件中每张表一个段
+    相同表中相同的文本共用一个键，导出时只重写有变化的段，并清理已删除行的键
+    """
+
+    def __init__(self):
+        self.root_dir = Path('localization')
+        # 首包包含的所有多语言
+        self.master_file = self.root_dir / f'master{core.utils.utils.LANG_SUFFIX}'
+        # 运行时使用的二进制分片，每种语言一个目录，文本文件保留给翻译使用
+        self.binary_dir = self.root_dir / 'bin'
+        self.__ensure_dir()
+        # 表名 -> {键: 文本}
+        self.master_i18 = {}
+        # 段名 -> 读取时的原始文本，未变化的段原样写回
+        self.__section_texts = {}
+        # 有变化的段
+        self.__dirty = set()
+        # 本次导出的表 -> 用到的键，未用到的键在写入时清理
+        self.__used = {}
+        # 表名 -> {文本: 键}
+        self.__value_keys = {}
+        self.__load_master()
+
+    def __ensure_dir(self):
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        (self.root_dir / 'patch').mkdir(exist_ok=True)
+
+    def __generate_key(self, table_name, col_name, value, section: dict):
+        """
+        生成多语言唯一的哈希值
+        默认取4位，与表中已有的键冲突时逐位加长，结果只取决于已有的键
+        """
+        unique_str = f'{table_name}_{col_name}_{value}'
+        digest = hashlib.sha256(unique_str.encode()).hexdigest()
+        for length in range(4, len(digest) + 1):
+            key = f'{table_name}/{digest[:length]}'
+            if key not in section:
+                return key
+        raise ValueError(f'多语言键冲突无法解决: {table_name} {value}')
+
+    def begin_table(self, table_name):
+        """开始导出一张表，导出结束后该表没有用到的键视为已删除"""
+        self.__used[table_name] = set()
+
+    def update_raw_master(self, table_name, col_name, value):
+        """更新配置多语言信息"""
+        if not is_contains_chinese(value):
+            return None
+        section = self.master_i18.setdefault(table_name, {})
+        value_keys = self.__value_keys.get(table_name)
+        if value_keys is None:
+            # 已有重复文本时取第一个键，其余的键会被清理
+            value_keys = self.__value_keys[table_name] = {}
+            for key, text in section.items():
+                value_keys.setdefault(text, key)
+        key = value_keys.get(value)
+        if key is None:
+            key = self.__generate_key(table_name, col_name, value, section)
+            section[key] = value
+            value_keys[value] = key
+            self.__dirty.add(table_name)
+        used = self.__used.get(table_name)
+        if used is not None:
+            used.add(key)
+        return key
+
+    def collect_garbage(self):
+        """清理本次导出的表中已不再使用的键"""
+        for table_name, used in self.__used.items():
+            section = self.master_i18.get(table_name)
+            if section is None:
+                continue
+            stale = [key for key in section if key not in used]
+            for key in stale:
+                del section[key]
+            if stale:
+                self.__value_keys.pop(table_name, None)
+                self.__dirty.add(table_name)
+            if not section:
+                del self.master_i18[table_name]
+                self.__dirty.add(table_name)
+        self.__used = {}
+
+    def parse_file(self, file_path: Path) -> dict:
+        """解析多语言文件"""
+        sections = {}
+        current_section = None
+        if file_path.exists():
+            for line in file_path.read_text(encoding='utf-8').splitlines():
+                line = line.strip()
+                if line.startswith('['):
+                    current_section = line[1:-1]
+                    sections[current_section] = {}
+                elif '=' in line and current_section:
+                    key, value = line.split('=', 1)
+                    sections[current_section][key.strip()] = value.strip()
+        return sections
+
+    def write_file(self, file_path: Path, data: dict):
+        """写入多语言文件"""
+        contents = [self.__render_section(section, items) for section, items in data.items()]
+        file_path.write_text('\n'.join(contents), encoding='utf-8')
+
+    def write_master_file(self):
+        """写入配置多语言，只重写有变化的段，没有变化时不写文件，同时生成二进制分片"""
+        self.collect_garbage()
+        if self.__dirty or not self.master_file.exists():
+            contents = []
+            for section, items in self.master_i18.items():
+                if section in self.__dirty or section not in self.__section_texts:
+                    self.__section_texts[section] = self.__render_section(section, items)
+                contents.append(self.__section_texts[section])
+            self.master_file.write_text('\n'.join(contents), encoding='utf-8')
+            self.__dirty.clear()
+        self.write_binary(self.master_file.stem, self.master_i18)
+
+    def apply_fragment(self, fragment: dict):
+        """
+        合入分片导出的多语言 {表名: [(键, 文本)]}，None表示该表已没有多语言
+        按单机导出时的表顺序调用，结果与单机导出一致
+        """
+        for table_name, items in fragment.items():
+            items = dict(items) if items is not None else None
+            if items == self.master_i18.get(table_name):
+                continue
+            if items is None:
+                del self.master_i18[table_name]
+            else:
+                self.master_i18[table_name] = items
+            self.__value_keys.pop(table_name, None)
+            self.__dirty.add(table_name)
+
+    def write_binary(self, name: str, data: dict) -> int:
+        """所有段合并后按表写入二进制分片，后面的段覆盖前面的段"""
+        items = {}
+        for section_items in data.values():
+            items.update(section_items)
+        return StringPoolWriter().write_shards(items, self.binary_dir / name)
+
+    def compile_binary(self, file_path: Path) -> int:
+        """编译翻译后的文本文件，如 master_en.i18n"""
+        return self.write_binary(file_path.stem, self.parse_file(file_path))
+
+    def __load_master(self):
+        """读取master文件并记录每段的原始文本，旧版本的单段格式按键的表名前缀拆分"""
+        if not self.master_file.exists():
+            return
+        section = None
+        lines = []
+        for line in self.master_file.read_text(encoding='utf-8').split('\n'):
+            if line.strip().startswith('['):
+                if section is not None:
+                    self.__section_texts[section] = '\n'.join(lines)
+                section = line.strip()[1:-1]
+                lines = []
+            lines.append(line)
+        if section is not None:
+            self.__section_texts[section] = '\n'.join(lines)
+        for section, items in self.parse_file(self.master_file).items():
+            if section != LEGACY_SECTION:
+                self.master_i18.setdefault(section, {}).update(items)
+                continue
+            # 迁移后整个文件需要重写
+            self.__section_texts.pop(section)
+            self.__dirty.add(LEGACY_SECTION)
+            for key, value in items.items():
+                table_name = key.split('/', 1)[0]
+                self.master_i18.setdefault(table_name, {})[key] = value
+                self.__dirty.add(table_name)
+
+    @staticmethod
+    def __render_section(section, items: dict) -> str:
+        return '\n'.join([f'[{section}]'] + [f'{key}={value}' for key, value in items.items()])
+
+
+class I18NFragment(I18NManager):
+    """分片导出时基于本机的master生成多语言，只记录本分片导出的表，由合并步骤统一写入master"""
+
+    def __init__(self):
+        super().__init__()
+        self.__tables = []
+
+    def begin_table(self, table_name):
+        super().begin_table(table_name)
+        self.__tables.append(table_name)
+
+    def get_fragment(self) -> dict:
+        """本分片导出的表的最终多语言 {表名: [(键, 文本)]}"""
+        self.collect_garbage()
+        return {
+            table_name: list(self.master_i18[table_name].items()) if table_name in self.master_i18 else None
+            for table_name in self.__tables
+        }
+
+    def write_master_file(self):
+        pass
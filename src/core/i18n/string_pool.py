@@ -0,0 +1,118 @@
+﻿import argparse
+import struct
+from pathlib import Path
+from typing import Dict
+
+# 文件头: 魔数, 版本, 条目数
+HEADER = struct.Struct('<4sII')
+# 索引条目: 键哈希, 值在数据区的偏移, 值的字节数
+ENTRY = struct.Struct('<QII')
+MAGIC = b'E2SP'
+VERSION = 1
+SHARD_SUFFIX = '.i18nb'
+
+FNV_OFFSET = 0xcbf29ce484222325
+FNV_PRIME = 0x100000001b3
+
+
+def fnv1a_64(data: bytes) -> int:
+    """FNV-1a 64位哈希，运行时使用相同算法查找"""
+    value = FNV_OFFSET
+    for byte in data:
+        value = ((value ^ byte) * FNV_PRIME) & 0xFFFFFFFFFFFFFFFF
+    return value
+
+
+class StringPoolWriter:
+    """
+    二进制多语言字符串池
+    按表拆分为多个分片，每个分片为按键哈希排序的索引加UTF-8数据区
+    运行时只加载用到的表，二分查找索引后按偏移解码单个字符串，无需解析整个语言
+    """
+
+    @staticmethod
+    def build(items: Dict[str, str]) -> bytes:
+        entries = {}
+        for key, value in items.items():
+            key_hash = fnv1a_64(key.encode('utf-8'))
+            if key_hash in entries and entries[key_hash][0] != key:
+                raise ValueError(f'多语言键哈希冲突: {entries[key_hash][0]} {key}')
+            entries[key_hash] = (key, value.encode('utf-8'))
+        index = bytearray()
+        blob = bytearray()
+        for key_hash in sorted(entries):
+            data = entries[key_hash][1]
+            index += ENTRY.pack(key_hash, len(blob), len(data))
+            blob += data
+        return HEADER.pack(MAGIC, VERSION, len(entries)) + bytes(index) + bytes(blob)
+
+    def write_shards(self, items: Dict[str, str], output_dir) -> int:
+        """
+        按键的表名前缀拆分写入分片，内容未变化的分片不重写，已不存在的表的分片会被删除
+        :return: 写入的分片数量
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        tables = {}
+        for key, value in items.items():
+            tables.setdefault(self.get_shard_name(key), {})[key] = value
+        written = 0
+        for table, table_items in tables.items():
+            shard_file = output_dir / f'{table}{SHARD_SUFFIX}'
+            content = self.build(table_items)
+            if shard_file.exists() and shard_file.read_bytes() == content:
+                continue
+            shard_file.write_bytes(content)
+            written += 1
+        for shard_file in output_dir.glob(f'*{SHARD_SUFFIX}'):
+            if shard_file.name[:-len(SHARD_SUFFIX)] not in tables:
+                shard_file.unlink()
+        return written
+
+    @staticmethod
+    def get_shard_name(key: str) -> str:
+        """键的格式为 表名/哈希，没有表名的键放在 _ 分片"""
+        table, sep, _ = key.partition('/')
+        return table if sep and table else '_'
+
+
+class StringPoolReader:
+    """读取单个分片，用于校验和工具"""
+
+    def __init__(self, data: bytes):
+        magic, version, self.count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('不是有效的多语言分片')
+        self.data = data
+        self.blob_offset = HEADER.size + ENTRY.size * self.count
+
+    def get(self, key: str):
+        key_hash = fnv1a_64(key.encode('utf-8'))
+        low, high = 0, self.count - 1
+        while low <= high:
+            mid = (low + high) // 2
+            mid_hash, offset, length = ENTRY.unpack_from(self.data, HEADER.size + ENTRY.size * mid)
+            if mid_hash == key_hash:
+                start = self.blob_offset + offset
+                return self.data[start:start + length].decode('utf-8')
+            if mid_hash < key_hash:
+                low = mid + 1
+            else:
+                high = mid - 1
+        return None
+
+
+def main():
+    """把翻译后的文本多语言文件编译为二进制分片，输出到 localization/bin/<文件名>/"""
+    from core.i18n.i18n_manager import I18NManager
+    parser = argparse.ArgumentParser(description='编译多语言文本文件为二进制分片')
+    parser.add_argument('files', type=str, nargs='+')
+    args = parser.parse_args()
+    manager = I18NManager()
+    for file_path in args.files:
+        written = manager.compile_binary(Path(file_path))
+        print(f'{file_path}: 更新了 {written} 个分片')
+
+
+if __name__ == '__main__':
+    main()
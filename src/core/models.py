@@ -1,22 +1,29 @@
-﻿from dataclasses import dataclass
-from typing import Dict, Any, List
-
-
-@dataclass
-class FieldMeta:
-    name: str
-    type: str
-    checks: List[str]
-    comment: str
-    is_ignored: bool = False
-    col_index: int = -1
-
-
-@dataclass
-class SheetConfig:
-    export_name: str
-    fields: Dict[str, FieldMeta]
-    rows_values: List[Dict[str, Any]]
-    sheets: List[str]
-    source_file: str
-    source_file_md5: int
+﻿from dataclasses import dataclass, field
+from typing import Dict, Any, List, Mapping, Sequence
+
+
+@dataclass
+class FieldMeta:
+    name: str
+    type: str
+    checks: List[str]
+    comment: str
+    is_ignored: bool = False
+    col_index: int = -1
+    # 预先解析的默认值，不可变对象在所有空单元格间共享
+    default_value: Any = None
+
+
+@dataclass
+class SheetConfig:
+    export_name: str
+    fields: Dict[str, FieldMeta]
+    # 单Sheet为行字典列表，多Sheet合并后为链式视图
+    rows_values: Sequence[Mapping[str, Any]]
+    sheets: List[str]
+    source_file: str
+    source_file_md5: str
+    # 参与合并的所有Excel 文件路径 -> 文件哈希，跨Excel合并时有多个
+    source_files: Dict[str, str] = field(default_factory=dict)
+    # 多语言提取阶段的结果 文本 -> 多语言键，只包含需要多语言的文本
+    i18n_keys: Dict[str, str] = field(default_factory=dict)
@@ -0,0 +1,316 @@
+﻿import queue
+import threading
+import traceback
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+from core.exporters.factory import create_exporter
+from core.i18n.extractor import I18NExtractor
+from core.models import SheetConfig
+from core.processors.merger import SheetMergerProcessor
+from core.processors.validators import RepeatValidator, LinkValidator, ExportNameValidator
+from core.selection import ExportSelection
+from core.utils.cache import CacheSystem, LruCache
+from core.utils.exceptions import SelectionError
+from core.utils.trace import tracer
+from core.utils.type_system import TypeSystem
+
+
+@dataclass
+class TableGroup:
+    """同一导出名称的所有Sheet，可能分布在多个Excel中"""
+    export_name: str
+    # [(Excel路径, Sheet名称)]
+    parts: List[tuple] = field(default_factory=list)
+    # 链接到的(表名, 字段名)
+    link_keys: set = field(default_factory=set)
+    # 任一来源Excel有修改
+    modified: bool = False
+
+    @property
+    def sources(self) -> Dict[str, None]:
+        """来源Excel路径，保持顺序"""
+        return dict.fromkeys(file_path for file_path, _ in self.parts)
+
+
+class StreamingPipeline:
+    """
+    流水线模式，每组表读取、校验、导出后立即释放
+    常驻内存的只有被链接字段的键索引，峰值内存只取决于同时处理的表数量
+
+    1. 预读所有Excel的表头，确定表的分组和链接关系
+    2. 只处理有修改的表、链接到有修改的表的表以及它们链接的目标表
+    3. 按链接关系排序，被链接的表先处理，互相链接的表作为一组同时处理
+    4. 读取线程与校验导出线程之间使用有界队列，读取过快时阻塞等待
+    5. 被链接的表只需键索引，来源未变化时直接使用持久化的索引
+
+    指定导出范围时只导出、校验选中的表，不再校验链接到它们的表
+    """
+
+    def __init__(self, type_system: TypeSystem, cache_system: CacheSystem, struct_cache: LruCache = None,
+                 max_in_flight: int = 2, sort_by_key: bool = False, selection: ExportSelection = None,
+                 exporter_options: dict = None):
+        self.type_system = type_system
+        self.cache_system = cache_system
+        self.struct_cache = struct_cache if struct_cache is not None else LruCache()
+        self.max_in_flight = max(1, max_in_flight)
+        self.sort_by_key = sort_by_key
+        self.selection = selection
+        # 创建导出器的参数，如增量补丁、分块压缩
+        self.exporter_options = exporter_options or {}
+        self.link_validator = LinkValidator()
+        # 所有表都已导出的Excel，限定范围时只记录这些文件的缓存
+        self.exported_files = set()
+        self.__exported_names = set()
+        # Excel路径 -> 包含的导出名称
+        self.__file_tables = {}
+        self.__stop = threading.Event()
+
+    def run(self) -> list[str]:
+        """执行流水线，返回错误信息"""
+        try:
+            groups = self.__scan_groups()
+        except Exception as e:
+            return [f'读取表头失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}']
+        try:
+            export_names = self.__select(groups)
+        except SelectionError as e:
+            return [str(e)]
+
+        exporter = create_exporter(self.type_system, **self.exporter_options)
+        if exporter is None:
+            return [f'暂未支持的导出类型: {self.type_system.export_type}']
+        errors = exporter.check_options(groups)
+        if errors:
+            return errors
+        Path(self.type_system.output_dir).mkdir(parents=True, exist_ok=True)
+        exporter.before_export()
+        # 输出中缺少或来源不一致的表即使未修改也需要导出
+        export_names |= exporter.sync_tables({
+            name: {file_path: self.cache_system.get_file_md5(file_path) for file_path in group.sources}
+            for name, group in groups.items()
+        })
+
+        # 表名 -> 被其它表链接的字段
+        target_fields = {}
+        for group in groups.values():
+            for table, field_name in group.link_keys:
+                target_fields.setdefault(table, set()).add(field_name)
+        units, validate_names = self.__plan(groups, export_names, target_fields)
+        extractor = I18NExtractor(self.type_system, exporter.i18n)
+
+        tables = queue.Queue(maxsize=self.max_in_flight)
+        reader = threading.Thread(target=self.__read_units, args=(units, tables), daemon=True)
+        reader.start()
+        errors = []
+        while True:
+            item = tables.get()
+            if item is None:
+                break
+            if isinstance(item, str):
+                errors.append(item)
+                break
+            unit, configs = item
+            errors.extend(self.__process_unit(exporter, extractor, unit, configs, validate_names, export_names, target_fields))
+            # 释放本组数据，只保留键索引
+            del item, configs
+            if errors:
+                break
+        self.__stop.set()
+        reader.join()
+        if errors:
+            return errors
+        exporter.after_export()
+        self.exported_files = {
+            file_path for file_path, names in self.__file_tables.items() if names <= self.__exported_names
+        }
+        return errors
+
+    def __scan_groups(self) -> Dict[str, TableGroup]:
+        groups = {}
+        types_hash = self.type_system.custom_types_hash
+        for file_path in sorted(Path(self.type_system.input_dir).glob('**/*.xlsx')):
+            if file_path.name.startswith('~$'):
+                continue
+            file_path = str(file_path)
+            file_md5 = self.cache_system.get_file_md5(file_path)
+            modified = self.cache_system.is_modify_file(file_md5)
+            headers = self.cache_system.load_headers(file_md5, types_hash)
+            if headers is None:
+                from core.excel_reader import ExcelProcessor
+                headers = ExcelProcessor(self.type_system, self.struct_cache).scan_headers(file_path)
+                self.cache_system.save_headers(file_md5, types_hash, headers)
+            self.__file_tables[file_path] = set()
+            for sheet_name, export_name, fields in headers:
+                self.__file_tables[file_path].add(export_name)
+                group = groups.setdefault(export_name, TableGroup(export_name))
+                group.parts.append((file_path, sheet_name))
+                group.link_keys |= LinkValidator.get_link_keys(fields)
+                group.modified = group.modified or modified
+        return groups
+
+    def __select(self, groups: Dict[str, TableGroup]) -> set:
+        """需要导出的表，未限定范围时为有修改的表"""
+        if self.selection is None:
+            return {name for name, group in groups.items() if group.modified}
+        all_files = list(dict.fromkeys(file_path for group in groups.values() for file_path in group.sources))
+        selected_files = self.selection.resolve_files(self.type_system.input_dir, all_files)
+        selected_names = {
+            name for name, group in groups.items() if any(file_path in selected_files for file_path in group.sources)
+        }
+        return self.selection.resolve_names(groups, selected_names)
+
+    def __plan(self, groups: Dict[str, TableGroup], export_names: set, target_fields: dict):
+        """
+        确定需要处理的表及顺序
+        :return: (按链接关系排序的处理单元, 需要校验的表名)
+        """
+        validate_names = set(export_names)
+        if self.selection is None:
+            validate_names |= {
+                name for name, group in groups.items() if any(table in export_names for table, _ in group.link_keys)
+            }
+        read_names = set(validate_names)
+        for name in validate_names:
+            for table, _ in groups[name].link_keys:
+                if table in groups and table not in read_names and not self.__restore_index(groups[table],
+                                                                                            target_fields[table]):
+                    read_names.add(table)
+
+        edges = {
+            name: sorted({table for table, _ in groups[name].link_keys if table in read_names})
+            for name in sorted(read_names)
+        }
+        units = [[groups[name] for name in sorted(component)] for component in self.__strongly_connected(edges)]
+        return units, validate_names
+
+    @staticmethod
+    def __strongly_connected(edges: Dict[str, List[str]]) -> List[List[str]]:
+        """Tarjan算法，被链接的表所在的分量先输出"""
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        components = []
+        counter = 0
+        for root in edges:
+            if root in index:
+                continue
+            # 迭代实现，避免表很多时递归过深
+            work = [(root, 0)]
+            while work:
+                node, child_idx = work.pop()
+                if child_idx == 0:
+                    index[node] = low[node] = counter
+                    counter += 1
+                    stack.append(node)
+                    on_stack.add(node)
+                children = edges[node]
+                if child_idx < len(children):
+                    work.append((node, child_idx + 1))
+                    child = children[child_idx]
+                    if child not in index:
+                        work.append((child, 0))
+                    elif child in on_stack:
+                        low[node] = min(low[node], index[child])
+                    continue
+                for child in children:
+                    if child in on_stack:
+                        low[node] = min(low[node], low[child])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+        return components
+
+    def __restore_index(self, group: TableGroup, field_names: set) -> bool:
+        """使用持久化的键索引代替读取被链接的表"""
+        field_values = self.cache_system.load_link_index(group.export_name, self.__get_sources(group),
+                                                         self.type_system.custom_types_hash)
+        if field_values is None or not field_names <= field_values.keys():
+            return False
+        self.link_validator.set_index(group.export_name, field_values)
+        return True
+
+    def __get_sources(self, group: TableGroup) -> dict:
+        return {file_path: self.cache_system.get_file_md5(file_path) for file_path in group.sources}
+
+    def __read_units(self, units: List[List[TableGroup]], tables: queue.Queue):
+        """读取线程，队列满时阻塞，实现背压"""
+        try:
+            for unit in units:
+                if self.__stop.is_set():
+                    return
+                configs = [self.__read_group(group) for group in unit]
+                self.__put(tables, (unit, configs))
+        except Exception as e:
+            self.__put(tables, f'读取Excel失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}')
+            return
+        self.__put(tables, None)
+
+    def __put(self, tables: queue.Queue, item):
+        while not self.__stop.is_set():
+            try:
+                tables.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def __read_group(self, group: TableGroup) -> SheetConfig:
+        """流式读取一组表的所有Sheet并合并"""
+        sheets_by_file = {}
+        for file_path, sheet_name in group.parts:
+            sheets_by_file.setdefault(file_path, set()).add(sheet_name)
+        configs = []
+        for file_path, sheet_names in sheets_by_file.items():
+            file_md5 = self.cache_system.get_file_md5(file_path)
+            # 已有解析缓存时无需重新读取Excel
+            parts = self.cache_system.load_parts(file_md5, self.type_system.custom_types_hash)
+            if parts is not None:
+                for config in parts:
+                    if config.sheets[0] in sheet_names:
+                        config.source_file = file_path
+                        config.source_files = {file_path: file_md5}
+                        configs.append(config)
+                continue
+            from core.excel_reader import ExcelProcessor
+            processor = ExcelProcessor(self.type_system, self.struct_cache)
+            configs.extend(processor.process_workbook(file_path, file_md5, low_memory=True, sheet_names=sheet_names))
+        return SheetMergerProcessor(self.type_system, self.sort_by_key).merge(configs)[0]
+
+    def __process_unit(self, exporter, extractor: I18NExtractor, unit: List[TableGroup], configs: List[SheetConfig],
+                       validate_names: set, export_names: set, target_fields: dict) -> list[str]:
+        errors = []
+        for group, config in zip(unit, configs):
+            field_names = target_fields.get(config.export_name)
+            if field_names:
+                self.link_validator.index_config(config, field_names)
+                self.cache_system.save_link_index(config.export_name, self.__get_sources(group),
+                                                  self.type_system.custom_types_hash,
+                                                  self.link_validator.get_index(config.export_name))
+        for config in configs:
+            if config.export_name not in validate_names:
+                continue
+            with tracer.span('validate', 'table', table=config.export_name, rows=len(config.rows_values)):
+                errors.extend(ExportNameValidator().validate([config]))
+                errors.extend(RepeatValidator().validate([config]))
+                errors.extend(self.link_validator.validate_config(config))
+        if errors:
+            return errors
+        for group, config in zip(unit, configs):
+            if group.export_name not in export_names:
+                continue
+            self.__exported_names.add(group.export_name)
+            print(f'文件[ {", ".join(config.source_files)} ]有更新，开始导出数据')
+            with tracer.span('i18n', 'table', table=config.export_name, rows=len(config.rows_values)):
+                extractor.extract(config)
+            with tracer.span('export', 'table', table=config.export_name, rows=len(config.rows_values)):
+                exporter.export_base_language_class(config)
+                exporter.export_data(config)
+        return errors
@@ -1,92 +1,226 @@
-﻿from core.models import SheetConfig, FieldMeta
-from typing import Dict, Any, List
-from core.utils.exceptions import FieldTypeConflictError
-from core.utils.type_system import TypeSystem
-import core
-from dataclasses import replace
-from collections import defaultdict
-
-
-class SheetMergerProcessor:
-    def __init__(self, type_system: TypeSystem):
-        self.type_system = type_system
-
-    def merge(self, sheet_configs: List[SheetConfig]) -> List[SheetConfig]:
-        # 对不同的导出名称进行分组，支持同个Excel配置中不同sheet的配置进行合并
-        groups = defaultdict(list)
-        for cfg in sheet_configs:
-            groups[cfg.export_name].append(cfg)
-
-        results = []
-        for export_name, config_group in groups.items():
-            # 跳过空配置组,理论上不会出现
-            if not config_group:
-                continue
-
-            # 合并单个分组
-            merged = self.__merge_single_sheet_group(config_group)
-            results.append(merged)
-        return results
-
-    def __merge_single_sheet_group(self, sheet_configs: List[SheetConfig]) -> SheetConfig:
-        """合并同导出名称的配置组"""
-        base_config = sheet_configs[0]
-
-        # 初始化合并容器
-        merged_fields = dict(base_config.fields)  # 浅拷贝字段
-        merged_rows = [row.copy() for row in base_config.rows_values]  # 浅拷贝行数据
-        merged_sheets = [base_config.sheets[0]]
-
-        # 遍历后续配置进行合并
-        for cfg in sheet_configs[1:]:
-            merged_fields = self.__merge_field_meta(merged_fields, cfg.fields, cfg.sheets[0])
-            merged_rows.extend(row.copy() for row in cfg.rows_values)
-            merged_sheets.append(cfg.sheets[0])
-
-        # 填充所有行的缺失字段
-        self.__populate_missing_fields(merged_rows, merged_fields)
-        return SheetConfig(
-            export_name=base_config.export_name,
-            fields=merged_fields,
-            rows_values=merged_rows,
-            sheets=merged_sheets,
-            source_file=base_config.source_file,
-            source_file_md5=core.utils.utils.get_file_mash(base_config.source_file)
-        )
-
-    def __merge_field_meta(self, existing: Dict[str, FieldMeta], new: Dict[str, FieldMeta], sheet_name: str):
-        """合并字段定义"""
-        merged = dict(existing)
-        for name, new_field in new.items():
-            if name in merged:
-                # 验证类型冲突
-                existing_field = merged[name]
-                self.__validate_merge_filed(existing_field, new_field, sheet_name)
-
-                # 创建新的合并后字段元数据，避免修改原对象
-                merged[name] = replace(existing_field,
-                                       checks=list(set(existing_field.checks + new_field.checks)),
-                                       comment=new_field.comment or existing_field.comment)
-            else:
-                # 直接添加新字段
-                merged[name] = new_field
-
-        return merged
-
-    def __validate_merge_filed(self, existing: FieldMeta, new: FieldMeta, sheet_name: str):
-        """验证字段兼容性"""
-        if existing.type != new.type:
-            raise FieldTypeConflictError(
-                field=new.name,
-                type1=existing.type,
-                type2=new.type,
-                location=f"{sheet_name}.{new.name}"
-            )
-
-    def __populate_missing_fields(self, rows: List[Dict], fields: Dict[str, FieldMeta]):
-        """填充缺失字段的默认值"""
-        required_fields = {name: meta for name, meta in fields.items() if not meta.is_ignored}
-        for row in rows:
-            for field_name, field_meta in required_fields.items():
-                if field_name not in row:
-                    row[field_name] = self.type_system.get_default_value(field_meta.type)
+﻿from core.models import SheetConfig, FieldMeta
+from typing import Dict, Any, List, Mapping, Sequence
+from core.utils.exceptions import FieldTypeConflictError
+from core.utils.type_system import TypeSystem
+from core.utils.utils import FrozenDict
+from dataclasses import replace
+from collections import defaultdict
+from bisect import bisect_right
+from itertools import chain
+import heapq
+
+
+class RowView(Mapping):
+    """行数据视图，本Sheet缺失的字段访问时返回默认值，不复制原始行"""
+    __slots__ = ('row', 'defaults')
+
+    def __init__(self, row: Dict[str, Any], defaults: Mapping[str, Any]):
+        self.row = row
+        self.defaults = defaults
+
+    def __getitem__(self, key):
+        if key in self.row:
+            return self.row[key]
+        return self.defaults[key]
+
+    def __contains__(self, key):
+        return key in self.row or key in self.defaults
+
+    def __iter__(self):
+        return chain(self.row, self.defaults)
+
+    def __len__(self):
+        return len(self.row) + len(self.defaults)
+
+    def __repr__(self):
+        return f'RowView({dict(self)})'
+
+
+class MergedRows(Sequence):
+    """
+    多个Sheet行数据的链式视图，不生成合并后的副本
+    每个Sheet记录自身缺失的字段及其默认值，字段齐全的Sheet直接返回原始行
+    指定sort_key时各部分按该字段流式多路归并，遍历结果按键有序
+    """
+
+    def __init__(self, sort_key: str = None):
+        self.sort_key = sort_key
+        # (行数据, 缺失字段默认值, 按键排序后的下标 本身有序时为None)
+        self.parts = []
+        self.__offsets = []
+        self.__length = 0
+        self.__sorted_rows = None
+
+    def append_part(self, rows: Sequence[Mapping[str, Any]], missing_defaults: Mapping[str, Any]):
+        if not rows:
+            return
+        order = None
+        if self.sort_key is not None:
+            order = self.__get_part_order(rows, missing_defaults)
+        self.parts.append((rows, missing_defaults, order))
+        self.__offsets.append(self.__length)
+        self.__length += len(rows)
+        self.__sorted_rows = None
+
+    def find_duplicate_keys(self) -> set:
+        """归并过程中比较相邻行的键找出重复值，无需额外建立全量集合"""
+        duplicates = set()
+        previous = None
+        for index, row in enumerate(self):
+            key = self.__row_key(row)
+            if index > 0 and key == previous:
+                duplicates.add(key[1])
+            previous = key
+        return duplicates
+
+    def __len__(self):
+        return self.__length
+
+    def __iter__(self):
+        if self.sort_key is None:
+            for part in self.parts:
+                yield from self.__iter_part(part)
+        elif len(self.parts) == 1:
+            yield from self.__iter_part(self.parts[0])
+        else:
+            yield from heapq.merge(*(self.__iter_part(part) for part in self.parts), key=self.__row_key)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.__length))]
+        if index < 0:
+            index += self.__length
+        if not 0 <= index < self.__length:
+            raise IndexError(index)
+        if self.sort_key is not None:
+            # 有序视图的随机访问需要归并结果，只保存行的引用
+            if self.__sorted_rows is None:
+                self.__sorted_rows = list(self)
+            return self.__sorted_rows[index]
+        part_idx = bisect_right(self.__offsets, index) - 1
+        rows, defaults, _ = self.parts[part_idx]
+        row = rows[index - self.__offsets[part_idx]]
+        return RowView(row, defaults) if defaults else row
+
+    @staticmethod
+    def __iter_part(part):
+        rows, defaults, order = part
+        ordered_rows = rows if order is None else map(rows.__getitem__, order)
+        if not defaults:
+            yield from ordered_rows
+        else:
+            for row in ordered_rows:
+                yield RowView(row, defaults)
+
+    def __row_key(self, row):
+        value = row[self.sort_key]
+        # None排在最后，且不与其它值比较大小
+        return value is None, value
+
+    def __get_part_order(self, rows, defaults):
+        if self.sort_key in defaults:
+            return None
+        keys = [self.__row_key(row) for row in rows]
+        if all(keys[i] <= keys[i + 1] for i in range(len(keys) - 1)):
+            return None
+        return sorted(range(len(keys)), key=keys.__getitem__)
+
+
+class SheetMergerProcessor:
+    def __init__(self, type_system: TypeSystem, sort_by_key: bool = False):
+        self.type_system = type_system
+        # 合并后的行是否按CheckRepeat字段排序
+        self.sort_by_key = sort_by_key
+
+    def merge(self, sheet_configs: List[SheetConfig]) -> List[SheetConfig]:
+        # 对不同的导出名称进行分组，支持同个Excel或不同Excel中的sheet配置进行合并
+        groups = defaultdict(list)
+        for cfg in sheet_configs:
+            groups[cfg.export_name].append(cfg)
+
+        results = []
+        for export_name, config_group in groups.items():
+            # 跳过空配置组,理论上不会出现
+            if not config_group:
+                continue
+
+            # 合并单个分组
+            merged = self.__merge_single_sheet_group(config_group)
+            results.append(merged)
+        return results
+
+    def __merge_single_sheet_group(self, sheet_configs: List[SheetConfig]) -> SheetConfig:
+        """合并同导出名称的配置组"""
+        base_config = sheet_configs[0]
+        sort_key = self.__get_sort_key(base_config.fields) if self.sort_by_key else None
+        if len(sheet_configs) == 1 and sort_key is None:
+            return base_config
+
+        # 只合并字段定义，行数据不复制
+        merged_fields = dict(base_config.fields)  # 浅拷贝字段
+        merged_sheets = [base_config.sheets[0]]
+        source_files = dict(base_config.source_files)
+        for cfg in sheet_configs[1:]:
+            merged_fields = self.__merge_field_meta(merged_fields, cfg.fields, cfg.sheets[0])
+            merged_sheets.append(cfg.sheets[0])
+            source_files.update(cfg.source_files)
+
+        # 行数据按Sheet链接，缺失字段访问时填充默认值
+        if self.sort_by_key:
+            sort_key = self.__get_sort_key(merged_fields)
+        merged_rows = MergedRows(sort_key)
+        defaults = self.__get_field_defaults(merged_fields)
+        for cfg in sheet_configs:
+            missing_defaults = FrozenDict((name, value) for name, value in defaults.items() if name not in cfg.fields)
+            merged_rows.append_part(cfg.rows_values, missing_defaults)
+
+        return SheetConfig(
+            export_name=base_config.export_name,
+            fields=merged_fields,
+            rows_values=merged_rows,
+            sheets=merged_sheets,
+            source_file=base_config.source_file,
+            source_file_md5=base_config.source_file_md5,
+            source_files=source_files
+        )
+
+    def __get_sort_key(self, fields: Dict[str, FieldMeta]):
+        """排序使用第一个CheckRepeat字段"""
+        for name, meta in fields.items():
+            if 'CheckRepeat' in meta.checks and not meta.is_ignored:
+                return name
+        return None
+
+    def __merge_field_meta(self, existing: Dict[str, FieldMeta], new: Dict[str, FieldMeta], sheet_name: str):
+        """合并字段定义"""
+        merged = dict(existing)
+        for name, new_field in new.items():
+            if name in merged:
+                # 验证类型冲突
+                existing_field = merged[name]
+                self.__validate_merge_filed(existing_field, new_field, sheet_name)
+
+                # 创建新的合并后字段元数据，避免修改原对象
+                merged[name] = replace(existing_field,
+                                       checks=list(set(existing_field.checks + new_field.checks)),
+                                       comment=new_field.comment or existing_field.comment)
+            else:
+                # 直接添加新字段
+                merged[name] = new_field
+
+        return merged
+
+    def __validate_merge_filed(self, existing: FieldMeta, new: FieldMeta, sheet_name: str):
+        """验证字段兼容性"""
+        if existing.type != new.type:
+            raise FieldTypeConflictError(
+                field=new.name,
+                type1=existing.type,
+                type2=new.type,
+                location=f"{sheet_name}.{new.name}"
+            )
+
+    def __get_field_defaults(self, fields: Dict[str, FieldMeta]) -> Dict[str, Any]:
+        """每个字段的默认值，不可变对象可在所有行间共享"""
+        return {name: self.type_system.get_default_value(meta.type)
+                for name, meta in fields.items() if not meta.is_ignored}
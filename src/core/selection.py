@@ -0,0 +1,77 @@
+﻿import fnmatch
+import subprocess
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from core.utils.exceptions import SelectionError
+
+
+class ExportSelection:
+    """
+    限定本次导出的范围
+    按导出名称、Excel路径通配符或git修订版本以来修改的Excel选择表，三者取并集
+    """
+
+    def __init__(self, only: Iterable[str] = None, files: Iterable[str] = None, changed_since: str = None):
+        self.only = set(only or [])
+        self.files = list(files or [])
+        self.changed_since = changed_since
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.only and not self.files and not self.changed_since
+
+    def resolve_files(self, input_dir: str, all_files: List[str]) -> Set[str]:
+        """返回被选中的Excel路径"""
+        selected = set()
+        for pattern in self.files:
+            matched = [file_path for file_path in all_files if self.__match(file_path, input_dir, pattern)]
+            if not matched:
+                raise SelectionError(f'没有Excel匹配 {pattern}')
+            selected.update(matched)
+        if self.changed_since:
+            existing = set(all_files)
+            selected.update(file_path for file_path in self.git_changed_files(input_dir, self.changed_since)
+                            if file_path in existing)
+        return selected
+
+    def resolve_names(self, all_names: Iterable[str], selected_names: Iterable[str]) -> Set[str]:
+        """合并按名称选中的表，名称不存在时报错"""
+        missing = sorted(self.only - set(all_names))
+        if missing:
+            raise SelectionError(f'找不到导出名称 {", ".join(missing)}')
+        return self.only | set(selected_names)
+
+    @staticmethod
+    def git_changed_files(input_dir: str, revision: str) -> List[str]:
+        """从git获取指定版本以来修改过及未跟踪的Excel，路径与输入目录拼接"""
+        commands = [
+            ['git', '-C', input_dir, 'diff', '--name-only', '--relative', revision, '--'],
+            ['git', '-C', input_dir, 'ls-files', '--others', '--exclude-standard'],
+        ]
+        changed = []
+        for command in commands:
+            try:
+                result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', check=True)
+            except FileNotFoundError:
+                raise SelectionError('找不到git命令')
+            except subprocess.CalledProcessError as e:
+                raise SelectionError(f'git执行失败 {" ".join(command)}: {e.stderr.strip()}')
+            for line in result.stdout.splitlines():
+                if line.endswith('.xlsx') and not Path(line).name.startswith('~$'):
+                    changed.append(str(Path(input_dir) / line))
+        return changed
+
+    @staticmethod
+    def __match(file_path: str, input_dir: str, pattern: str) -> bool:
+        # 通配符可以是相对输入目录的路径，也可以只是文件名
+        relative = Path(file_path).relative_to(input_dir).as_posix()
+        return (fnmatch.fnmatch(relative, pattern) or fnmatch.fnmatch(Path(file_path).name, pattern)
+                or fnmatch.fnmatch(file_path, pattern))
+
+
+def create_selection(args) -> Optional[ExportSelection]:
+    """根据命令行参数创建导出范围，未限定时返回None"""
+    selection = ExportSelection(getattr(args, 'only', None), getattr(args, 'files', None),
+                                getattr(args, 'changed_since', None))
+    return None if selection.is_empty else selection
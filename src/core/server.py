@@ -0,0 +1,171 @@
+﻿import io
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import traceback
+from contextlib import redirect_stdout
+from typing import Callable
+
+
+class ExportJob:
+    """一次导出任务，相同参数的排队请求共用同一个任务"""
+
+    def __init__(self, key: str, request: dict):
+        self.key = key
+        self.request = request
+        self.__clients = []
+        self.__lock = threading.Lock()
+
+    def attach(self) -> queue.Queue:
+        """加入一个等待结果的客户端，返回其消息队列"""
+        client_queue = queue.Queue()
+        with self.__lock:
+            self.__clients.append(client_queue)
+        return client_queue
+
+    @property
+    def client_count(self):
+        with self.__lock:
+            return len(self.__clients)
+
+    def emit(self, message: dict):
+        with self.__lock:
+            clients = list(self.__clients)
+        for client_queue in clients:
+            client_queue.put(message)
+
+    def log(self, text: str):
+        self.emit({'type': 'log', 'message': text})
+
+    def finish(self, ok: bool):
+        self.emit({'type': 'done', 'ok': ok})
+
+
+class _JobOutput(io.TextIOBase):
+    """把任务执行期间的print输出按行转发给客户端"""
+
+    def __init__(self, job: ExportJob):
+        self.job = job
+        self.__buffer = ''
+
+    def write(self, s):
+        self.__buffer += s
+        *lines, self.__buffer = self.__buffer.split('\n')
+        for line in lines:
+            self.job.log(line)
+        return len(s)
+
+    def flush(self):
+        if self.__buffer:
+            self.job.log(self.__buffer)
+            self.__buffer = ''
+
+
+class ExportServer:
+    """
+    本地常驻导出服务，通过Unix socket接收请求
+    请求在单个工作线程中排队执行，缓存文件的读写因此不会互相覆盖
+    与排队中任务参数相同的请求直接合并，共享同一次导出的输出和结果
+    """
+
+    def __init__(self, socket_path: str, job_runner: Callable[[dict], bool]):
+        self.socket_path = socket_path
+        self.job_runner = job_runner
+        self.__jobs = queue.Queue()
+        # 请求键 -> 排队中尚未开始的任务
+        self.__pending = {}
+        self.__lock = threading.Lock()
+
+    def submit(self, request: dict) -> queue.Queue:
+        """提交导出请求，返回该客户端的消息队列"""
+        key = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        with self.__lock:
+            job = self.__pending.get(key)
+            if job is None:
+                job = ExportJob(key, request)
+                self.__pending[key] = job
+                client_queue = job.attach()
+                client_queue.put({'type': 'log', 'message': f'已加入队列，前面还有{self.__jobs.qsize()}个任务'})
+                self.__jobs.put(job)
+            else:
+                client_queue = job.attach()
+                client_queue.put({'type': 'log', 'message': '已有相同的导出请求在排队，合并为同一任务'})
+        return client_queue
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        threading.Thread(target=self.__work, daemon=True).start()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.handle_client(self.rfile, self.wfile)
+
+        with socketserver.ThreadingUnixStreamServer(self.socket_path, Handler) as unix_server:
+            print(f'导出服务已启动: {self.socket_path}')
+            try:
+                unix_server.serve_forever()
+            except KeyboardInterrupt:
+                print('导出服务已停止')
+            finally:
+                os.unlink(self.socket_path)
+
+    def handle_client(self, rfile, wfile):
+        """读取一行JSON请求，逐行返回JSON消息直到任务结束"""
+        try:
+            request = json.loads(rfile.readline().decode('utf-8'))
+        except (ValueError, UnicodeDecodeError) as e:
+            self.__send(wfile, {'type': 'done', 'ok': False, 'message': f'无效的请求: {e}'})
+            return
+        client_queue = self.submit(request)
+        while True:
+            message = client_queue.get()
+            if not self.__send(wfile, message):
+                # 客户端已断开，任务继续执行
+                return
+            if message['type'] == 'done':
+                return
+
+    def __work(self):
+        while True:
+            job = self.__jobs.get()
+            with self.__lock:
+                self.__pending.pop(job.key, None)
+            job.log(f'开始导出，共{job.client_count}个请求')
+            output = _JobOutput(job)
+            try:
+                with redirect_stdout(output):
+                    ok = self.job_runner(job.request)
+            except Exception as e:
+                ok = False
+                output.write(f'导出失败，异常信息: {e} \n异常堆栈: {traceback.format_exc()}')
+            output.flush()
+            job.finish(ok)
+
+    @staticmethod
+    def __send(wfile, message: dict) -> bool:
+        try:
+            wfile.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+            wfile.flush()
+            return True
+        except OSError:
+            return False
+
+
+def request_export(socket_path: str, request: dict) -> bool:
+    """客户端，发送导出请求并实时打印服务端输出，返回导出是否成功"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+        for line in sock.makefile('r', encoding='utf-8'):
+            message = json.loads(line)
+            if 'message' in message:
+                print(message['message'])
+            if message['type'] == 'done':
+                return message['ok']
+    print('与导出服务的连接已断开')
+    return False
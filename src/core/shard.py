@@ -0,0 +1,255 @@
+﻿import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+from core.exporters.base import ExporterBase
+from core.i18n.i18n_manager import I18NManager
+from core.models import SheetConfig
+from core.processors.validators import LinkValidator, ExportNameValidator
+from core.utils.cache import CacheSystem, LruCache
+from core.utils.exceptions import ShardError
+from core.utils.footprint import FootprintManifest
+from core.utils.type_system import TypeSystem
+
+MANIFEST_VERSION = 1
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """第index个分片，共count个"""
+    index: int
+    count: int
+
+    @staticmethod
+    def parse(text: str) -> 'ShardSpec':
+        try:
+            index, count = (int(part) for part in text.split('/'))
+        except ValueError:
+            raise ShardError(f'分片格式应为 i/N: {text}')
+        if count < 1 or not 0 <= index < count:
+            raise ShardError(f'分片序号应在 0 到 N-1 之间: {text}')
+        return ShardSpec(index, count)
+
+    @property
+    def name(self) -> str:
+        return f'shard_{self.index}_of_{self.count}'
+
+
+class ShardPlanner:
+    """
+    按Excel路径哈希把Excel分配到各分片，所有分片得到的分配结果一致
+    含有相同导出名称的Excel需要合并，总是分在同一个分片
+    """
+
+    def __init__(self, type_system: TypeSystem, cache_system: CacheSystem, struct_cache: LruCache = None):
+        self.type_system = type_system
+        self.cache_system = cache_system
+        self.struct_cache = struct_cache
+        # Excel路径 -> 包含的导出名称
+        self.file_tables: Dict[str, List[str]] = {}
+        # 所有表按单机导出时的顺序排列
+        self.table_order: List[str] = []
+        # 表名 -> 被其它表链接的字段
+        self.link_targets: Dict[str, set] = {}
+        # Excel路径 -> 分片序号
+        self.owners: Dict[str, int] = {}
+
+    def plan(self, count: int):
+        self.__scan_headers()
+        for component in self.__group_files():
+            # 以组内最小的相对路径计算哈希，与机器和输入目录的位置无关
+            key = min(self.__relative(file_path) for file_path in component)
+            owner = int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16) % count
+            for file_path in component:
+                self.owners[file_path] = owner
+
+    def get_files(self, spec: ShardSpec) -> List[str]:
+        return [file_path for file_path, owner in self.owners.items() if owner == spec.index]
+
+    def get_tables(self, spec: ShardSpec) -> set:
+        return {name for file_path in self.get_files(spec) for name in self.file_tables[file_path]}
+
+    def build_manifest(self, spec: ShardSpec, configs: List[SheetConfig], link_validator: LinkValidator,
+                       exporter: ExporterBase) -> dict:
+        """分片清单：被链接字段的键索引、延后校验的链接值、多语言片段及产物列表"""
+        indexer = LinkValidator()
+        key_indexes = {}
+        for config in configs:
+            field_names = self.link_targets.get(config.export_name)
+            if field_names:
+                indexer.index_config(config, field_names)
+                key_indexes[config.export_name] = {
+                    field_name: sorted(values) for field_name, values in indexer.get_index(config.export_name).items()
+                }
+        artifacts = list(exporter.artifacts)
+        if spec.index == 0:
+            # 自定义类型代码只由第一个分片生成
+            artifacts.extend(self.type_system.get_custom_type_files())
+        output_dir = Path(self.type_system.output_dir)
+        i18n = getattr(exporter, 'i18n', None)
+        footprints = getattr(exporter, 'footprints', None)
+        return {
+            'version': MANIFEST_VERSION,
+            'shard': spec.index,
+            'count': spec.count,
+            'custom_types_hash': self.type_system.custom_types_hash,
+            'table_order': self.table_order,
+            'files': {self.__relative(file_path): self.cache_system.get_file_md5(file_path)
+                      for file_path in self.get_files(spec)},
+            'tables': sorted(self.get_tables(spec)),
+            'key_indexes': key_indexes,
+            'deferred_links': sorted(set(link_validator.deferred)),
+            'i18n': i18n.get_fragment() if hasattr(i18n, 'get_fragment') else {},
+            'footprints': footprints.get_fragment() if footprints is not None else {},
+            'artifacts': {
+                Path(artifact).relative_to(output_dir).as_posix(): _get_file_sha256(artifact)
+                for artifact in sorted(set(artifacts)) if Path(artifact).exists()
+            },
+        }
+
+    def __scan_headers(self):
+        types_hash = self.type_system.custom_types_hash
+        for file_path in sorted(Path(self.type_system.input_dir).glob('**/*.xlsx')):
+            if file_path.name.startswith('~$'):
+                continue
+            file_path = str(file_path)
+            file_md5 = self.cache_system.get_file_md5(file_path)
+            headers = self.cache_system.load_headers(file_md5, types_hash)
+            if headers is None:
+                from core.excel_reader import ExcelProcessor
+                headers = ExcelProcessor(self.type_system, self.struct_cache).scan_headers(file_path)
+                self.cache_system.save_headers(file_md5, types_hash, headers)
+            self.file_tables[file_path] = []
+            for _, export_name, fields in headers:
+                self.file_tables[file_path].append(export_name)
+                if export_name not in self.table_order:
+                    self.table_order.append(export_name)
+                for table, field_name in LinkValidator.get_link_keys(fields):
+                    self.link_targets.setdefault(table, set()).add(field_name)
+
+    def __group_files(self) -> List[List[str]]:
+        """并查集，包含相同导出名称的Excel归为一组"""
+        parent = {file_path: file_path for file_path in self.file_tables}
+
+        def find(file_path):
+            while parent[file_path] != file_path:
+                parent[file_path] = parent[parent[file_path]]
+                file_path = parent[file_path]
+            return file_path
+
+        first_file = {}
+        for file_path, names in self.file_tables.items():
+            for name in names:
+                if name in first_file:
+                    parent[find(file_path)] = find(first_file[name])
+                else:
+                    first_file[name] = file_path
+        components = {}
+        for file_path in self.file_tables:
+            components.setdefault(find(file_path), []).append(file_path)
+        return list(components.values())
+
+    def __relative(self, file_path: str) -> str:
+        return Path(file_path).relative_to(self.type_system.input_dir).as_posix()
+
+
+class ShardMerger:
+    """合并所有分片的清单：跨分片的链接校验、导出名称校验，并按单机导出的顺序合入多语言"""
+
+    def __init__(self, type_system: TypeSystem, manifest_dir: str, count: int):
+        self.type_system = type_system
+        self.manifest_dir = Path(manifest_dir)
+        self.count = count
+
+    def run(self) -> list[str]:
+        try:
+            manifests = [load_manifest(self.manifest_dir, ShardSpec(index, self.count))
+                         for index in range(self.count)]
+        except ShardError as e:
+            return [str(e)]
+        errors = self.__check_consistency(manifests)
+        if errors:
+            return errors
+
+        owners = {}
+        for manifest in manifests:
+            for name in manifest['tables']:
+                if name in owners:
+                    errors.append(f'导出名称 {name} 同时出现在分片 {owners[name]} 和 {manifest["shard"]}')
+                owners[name] = manifest['shard']
+        errors.extend(ExportNameValidator.validate_names(manifests[0]['table_order']))
+
+        link_validator = LinkValidator()
+        for manifest in manifests:
+            for table, field_values in manifest['key_indexes'].items():
+                link_validator.set_index(table, {field_name: set(values) for field_name, values in field_values.items()})
+        errors.extend(link_validator.validate_deferred(
+            tuple(record) for manifest in manifests for record in manifest['deferred_links']))
+
+        output_dir = Path(self.type_system.output_dir)
+        for manifest in manifests:
+            for artifact, sha256 in manifest['artifacts'].items():
+                artifact_file = output_dir / artifact
+                if not artifact_file.exists():
+                    errors.append(f'分片 {manifest["shard"]} 的产物缺失: {artifact_file}')
+                elif _get_file_sha256(artifact_file) != sha256:
+                    errors.append(f'分片 {manifest["shard"]} 的产物内容不一致: {artifact_file}')
+        if errors:
+            return errors
+
+        # 各表的多语言按单机导出时的表顺序合入，结果与单机导出一致
+        fragment = {}
+        for manifest in manifests:
+            fragment.update(manifest['i18n'])
+        order = {table: index for index, table in enumerate(manifests[0]['table_order'])}
+        i18n = I18NManager()
+        i18n.apply_fragment({table: fragment[table]
+                             for table in sorted(fragment, key=lambda name: order.get(name.strip(), len(order)))})
+        i18n.write_master_file()
+
+        footprints = FootprintManifest()
+        for manifest in manifests:
+            footprints.apply_fragment(manifest.get('footprints', {}))
+        footprints.write(output_dir)
+        return errors
+
+    def __check_consistency(self, manifests: List[dict]) -> list[str]:
+        errors = []
+        for manifest in manifests:
+            if manifest.get('version') != MANIFEST_VERSION:
+                errors.append(f'分片 {manifest.get("shard")} 的清单版本不一致')
+            elif manifest['custom_types_hash'] != self.type_system.custom_types_hash:
+                errors.append(f'分片 {manifest["shard"]} 使用的自定义类型与本机不一致')
+            elif manifest['table_order'] != manifests[0]['table_order']:
+                errors.append(f'分片 {manifest["shard"]} 读取到的Excel与其它分片不一致')
+        return errors
+
+
+def save_manifest(manifest_dir: str, spec: ShardSpec, manifest: dict):
+    manifest_file = Path(manifest_dir) / f'{spec.name}.json'
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = manifest_file.with_name(f'{manifest_file.name}.{os.getpid()}.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    tmp_file.replace(manifest_file)
+
+
+def load_manifest(manifest_dir, spec: ShardSpec) -> dict:
+    manifest_file = Path(manifest_dir) / f'{spec.name}.json'
+    if not manifest_file.exists():
+        raise ShardError(f'缺少分片清单 {manifest_file}')
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def remove_manifest(manifest_dir: str, spec: ShardSpec):
+    """分片开始导出前删除旧清单，导出失败时合并步骤不会用到过期的结果"""
+    (Path(manifest_dir) / f'{spec.name}.json').unlink(missing_ok=True)
+
+
+def _get_file_sha256(file_path) -> str:
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
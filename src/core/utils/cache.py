@@ -1,48 +1,306 @@
-﻿import json
-from pathlib import Path
-
-import core.utils.utils
-
-
-class CacheSystem:
-    def __init__(self, input_dir):
-        self.input_dir = input_dir
-
-        # 创建缓存目录
-        self.cache_dir = "./__cache__"
-        self.cache_file = Path(self.cache_dir) / '__man_what_can_i_say.cache'
-        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
-        self.current_files = {}
-        self.changed_list = []
-        self.__init_cache_file()
-
-    def is_modify_file(self, file_md5) -> bool:
-        return file_md5 in self.changed_list
-
-    def save_cache(self):
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.current_files, f, indent=2)
-
-    def __init_cache_file(self):
-        """遍历所有文件并记录修改时间"""
-        folder = Path(self.input_dir)
-        for file_path in folder.glob('**/*.xlsx'):
-            if file_path.name.startswith('~$'):
-                continue
-            if file_path.is_file():
-                mtime = file_path.stat().st_mtime
-                file_hash = core.utils.utils.get_file_mash(file_path)
-                self.current_files[file_hash] = mtime
-
-        cache_data = {}
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r') as f:
-                    cache_data = json.load(f)
-            except json.JSONDecodeError as e:
-                print(f"Error reading cache file: {e}")
-
-        # 比较差异 文件哈希和时间戳校验
-        for md5, mtime in self.current_files.items():
-            if cache_data.get(md5, -1) != mtime:
-                self.changed_list.append(md5)
+﻿import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import core.utils.utils
+from core.utils.trace import tracer
+
+# 解析结果、表头及键索引缓存的格式版本，解析逻辑或SheetConfig/FieldMeta结构变化时需要递增，旧版本的缓存随之失效
+CACHE_FORMAT_VERSION = 1
+
+
+class CacheSystem:
+    def __init__(self, input_dir, cache_dir: str = "./__cache__"):
+        self.input_dir = input_dir
+
+        # 创建缓存目录，分片导出时每个分片使用独立的目录
+        self.cache_dir = cache_dir
+        self.cache_file = Path(self.cache_dir) / '__man_what_can_i_say.cache'
+        # 每个Excel解析结果的缓存，未修改的Excel无需重新读取
+        self.parts_dir = Path(self.cache_dir) / 'parts'
+        # 文件路径 -> [修改时间(纳秒), 大小, 哈希]，修改时间和大小未变化的文件无需重新计算哈希
+        self.index_file = Path(self.cache_dir) / 'file_index.json'
+        # 各种生成物的标记，如自定义类型C#代码
+        self.stamps_file = Path(self.cache_dir) / 'stamps.json'
+        # 被链接表的键索引，限定范围导出时无需读取被链接的表
+        self.links_dir = Path(self.cache_dir) / 'links'
+        # 每张表上次导出的行快照，用于生成增量补丁
+        self.rows_dir = Path(self.cache_dir) / 'rows'
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        self.links_dir.mkdir(parents=True, exist_ok=True)
+        self.rows_dir.mkdir(parents=True, exist_ok=True)
+        self.current_files = {}
+        # 文件路径 -> 文件哈希
+        self.file_md5 = {}
+        self.changed_list = []
+        self.__file_index = {}
+        self.__cache_data = {}
+        self.__index_dirty = False
+        self.__init_cache_file()
+
+    def is_modify_file(self, file_md5) -> bool:
+        return file_md5 in self.changed_list
+
+    def has_changes(self) -> bool:
+        """是否有新增、修改或删除的Excel"""
+        return len(self.changed_list) > 0 or self.__has_removed
+
+    def get_file_md5(self, file_path):
+        """获取已计算过的文件哈希，未记录的文件返回None"""
+        return self.file_md5.get(str(Path(file_path)))
+
+    def refresh_file(self, file_path) -> str:
+        """重新记录单个文件的哈希与修改时间，常驻模式下文件变化时调用"""
+        file_path = Path(file_path)
+        old_md5 = self.file_md5.get(str(file_path))
+        if old_md5 is not None and list(self.file_md5.values()).count(old_md5) == 1:
+            self.current_files.pop(old_md5, None)
+        file_hash = core.utils.utils.get_file_mash(file_path)
+        stat = file_path.stat()
+        self.current_files[file_hash] = stat.st_mtime
+        self.file_md5[str(file_path)] = file_hash
+        self.__file_index[str(file_path)] = [stat.st_mtime_ns, stat.st_size, file_hash]
+        self.__index_dirty = True
+        return file_hash
+
+    def remove_file(self, file_path):
+        """移除已删除文件的记录"""
+        old_md5 = self.file_md5.pop(str(Path(file_path)), None)
+        if self.__file_index.pop(str(Path(file_path)), None) is not None:
+            self.__index_dirty = True
+        if old_md5 is not None and old_md5 not in self.file_md5.values():
+            self.current_files.pop(old_md5, None)
+
+    def save_cache(self, file_paths=None):
+        """
+        记录已导出的文件
+        :param file_paths: 限定范围导出时只记录这些文件，其它文件的修改留到之后导出
+        """
+        if file_paths is None:
+            cache_data = self.current_files
+        else:
+            cache_data = dict(self.__cache_data)
+            for file_path in file_paths:
+                file_md5 = self.get_file_md5(file_path)
+                if file_md5 is not None:
+                    cache_data[file_md5] = self.current_files[file_md5]
+        # 先写临时文件再替换，多个进程同时导出时不会读到写了一半的缓存
+        self.__write_json(self.cache_file, cache_data)
+        self.__prune_parts()
+        self.__save_index()
+
+    def load_stamp(self, name: str, key: str):
+        """读取生成物标记，不存在返回None"""
+        return self.__load_stamps().get(name, {}).get(key)
+
+    def save_stamp(self, name: str, key: str, stamp: str):
+        stamps = self.__load_stamps()
+        if stamps.get(name, {}).get(key) == stamp:
+            return
+        stamps.setdefault(name, {})[key] = stamp
+        self.__write_json(self.stamps_file, stamps)
+
+    def __load_stamps(self) -> dict:
+        if not self.stamps_file.exists():
+            return {}
+        try:
+            with open(self.stamps_file, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def __save_index(self):
+        if self.__index_dirty:
+            self.__write_json(self.index_file, self.__file_index)
+            self.__index_dirty = False
+
+    @staticmethod
+    def __write_json(file_path: Path, data):
+        tmp_file = file_path.with_name(f'{file_path.name}.{os.getpid()}.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, indent=2)
+        tmp_file.replace(file_path)
+
+    def load_parts(self, file_md5, types_hash, kind: str = None):
+        """读取Excel解析结果缓存，不存在或已损坏返回None"""
+        part_file = self.__get_part_file(file_md5, types_hash, kind)
+        if not part_file.exists():
+            return None
+        try:
+            with open(part_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Error reading part cache {part_file}: {e}")
+            return None
+
+    def save_parts(self, file_md5, types_hash, configs, kind: str = None):
+        """保存Excel解析结果缓存"""
+        part_file = self.__get_part_file(file_md5, types_hash, kind)
+        tmp_file = part_file.with_suffix('.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(configs, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_file.replace(part_file)
+
+    def load_headers(self, file_md5, types_hash):
+        """读取Excel表头缓存，不存在返回None"""
+        return self.load_parts(file_md5, types_hash, 'headers')
+
+    def save_headers(self, file_md5, types_hash, headers):
+        self.save_parts(file_md5, types_hash, headers, 'headers')
+
+    def load_link_index(self, export_name: str, sources: dict, types_hash: str):
+        """
+        读取表的键索引，来源Excel或自定义类型有变化时返回None
+        :return: {字段名: 值集合}
+        """
+        index_file = self.links_dir / f'{export_name}.pickle'
+        if not index_file.exists():
+            return None
+        try:
+            with open(index_file, 'rb') as f:
+                version, index_sources, index_types_hash, field_values = pickle.load(f)
+        except Exception as e:
+            print(f"Error reading link index {index_file}: {e}")
+            return None
+        if version != CACHE_FORMAT_VERSION or index_sources != sources or index_types_hash != types_hash:
+            return None
+        return field_values
+
+    def save_link_index(self, export_name: str, sources: dict, types_hash: str, field_values: dict):
+        index_file = self.links_dir / f'{export_name}.pickle'
+        tmp_file = index_file.with_name(f'{index_file.name}.{os.getpid()}.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump((CACHE_FORMAT_VERSION, sources, types_hash, field_values), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_file.replace(index_file)
+
+    def load_row_snapshot(self, export_name: str):
+        """读取表上次导出的行快照，不存在或已损坏返回None"""
+        snapshot_file = self.rows_dir / f'{export_name}.pickle'
+        if not snapshot_file.exists():
+            return None
+        try:
+            with open(snapshot_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Error reading row snapshot {snapshot_file}: {e}")
+            return None
+
+    def save_row_snapshot(self, export_name: str, snapshot: dict):
+        snapshot_file = self.rows_dir / f'{export_name}.pickle'
+        tmp_file = snapshot_file.with_name(f'{snapshot_file.name}.{os.getpid()}.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_file.replace(snapshot_file)
+
+    def __get_part_file(self, file_md5, types_hash, kind: str = None) -> Path:
+        # 自定义类型及缓存格式变化会影响解析结果，一并作为缓存键
+        suffix = f'_{kind}' if kind else ''
+        return self.parts_dir / f'{file_md5}_{types_hash[:8]}_v{CACHE_FORMAT_VERSION}{suffix}.pickle'
+
+    def __prune_parts(self):
+        """清理已不存在的Excel及旧格式版本的解析缓存"""
+        for part_file in self.parts_dir.glob('*.pickle'):
+            # 文件名为 哈希_类型哈希_v版本[_种类].pickle
+            parts = part_file.stem.split('_')
+            if parts[0] not in self.current_files or parts[2:3] != [f'v{CACHE_FORMAT_VERSION}']:
+                part_file.unlink(missing_ok=True)
+
+    def __init_cache_file(self):
+        """遍历所有文件并记录修改时间"""
+        old_index = {}
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, 'r') as f:
+                    old_index = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error reading file index: {e}")
+        folder = Path(self.input_dir)
+        for file_path in folder.glob('**/*.xlsx'):
+            if file_path.name.startswith('~$'):
+                continue
+            if file_path.is_file():
+                stat = file_path.stat()
+                mtime = stat.st_mtime
+                entry = old_index.get(str(file_path))
+                if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                    file_hash = entry[2]
+                else:
+                    with tracer.span('hash', 'workbook', workbook=str(file_path), bytes=stat.st_size):
+                        file_hash = core.utils.utils.get_file_mash(file_path)
+                    entry = [stat.st_mtime_ns, stat.st_size, file_hash]
+                    self.__index_dirty = True
+                self.current_files[file_hash] = mtime
+                self.file_md5[str(file_path)] = file_hash
+                self.__file_index[str(file_path)] = entry
+
+        cache_data = {}
+        if self.cache_file.exists():
+            try:
+                with open(self.cache_file, 'r') as f:
+                    cache_data = json.load(f)
+            except json.JSONDecodeError as e:
+                print(f"Error reading cache file: {e}")
+        self.__cache_data = cache_data
+
+        # 比较差异 文件哈希和时间戳校验
+        for md5, mtime in self.current_files.items():
+            if cache_data.get(md5, -1) != mtime:
+                self.changed_list.append(md5)
+        self.__has_removed = any(md5 not in self.current_files for md5 in cache_data)
+        # 其它输入目录的记录保留，只移除本目录中已不存在的文件
+        for file_path, entry in old_index.items():
+            if file_path in self.__file_index:
+                continue
+            if Path(file_path).is_relative_to(folder):
+                self.__index_dirty = True
+            else:
+                self.__file_index[file_path] = entry
+
+
+class LruCache:
+    """线程安全的定长LRU缓存，统计命中率"""
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__items = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get_or_create(self, key, factory):
+        """
+        命中则返回缓存值，否则调用factory创建并缓存
+        factory抛出的异常不会被缓存
+        """
+        if self.max_size <= 0:
+            return factory()
+        with self.__lock:
+            if key in self.__items:
+                self.hits += 1
+                self.__items.move_to_end(key)
+                return self.__items[key]
+            self.misses += 1
+        value = factory()
+        with self.__lock:
+            self.__items[key] = value
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.max_size:
+                self.__items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+
+    def __len__(self):
+        return len(self.__items)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f'命中: {self.hits} 未命中: {self.misses} 命中率: {rate:.1f}% 缓存条目: {len(self)}/{self.max_size}'
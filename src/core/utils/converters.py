@@ -0,0 +1,251 @@
+﻿import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable
+from core.utils.exceptions import TypeCastError
+
+INTEGER_TYPES = ('int', 'long', 'byte', 'sbyte', 'short', 'uint', 'ulong', 'ushort')
+FLOAT_TYPES = ('float', 'double', 'decimal')
+
+
+def make_builtin_converter(data_type: str) -> Callable[[Any, tuple], Any]:
+    """
+    生成内置类型转换器 (原始值, 字段标签) -> 值
+    转换失败统一抛出TypeCastError
+    """
+    if data_type in INTEGER_TYPES:
+        cast = lambda value, checks: cast_integer(value, data_type)
+    elif data_type in FLOAT_TYPES:
+        cast = lambda value, checks: cast_float(value, data_type)
+    elif data_type == 'bool':
+        cast = lambda value, checks: cast_boolean(value)
+    elif data_type == 'datetime':
+        cast = cast_datetime
+    elif data_type == 'string':
+        cast = lambda value, checks: str(value) if value is not None else ''
+    else:
+        cast = lambda value, checks: None
+
+    def convert(raw_value: Any, checks=()) -> Any:
+        try:
+            return cast(raw_value, checks)
+        except (ValueError, TypeError) as e:
+            error_detail = f"值 '{raw_value}' ({type(raw_value).__name__}) -> {data_type}"
+            raise TypeCastError(f"基础类型转换失败: {error_detail}") from e
+
+    return convert
+
+
+def make_enum_converter(type_name: str, values) -> Callable[[Any, tuple], Any]:
+    """生成枚举类型转换器，校验枚举值是否合法"""
+    allowed = frozenset(values)
+
+    def convert(raw_value: Any, checks=()) -> str:
+        value = str(raw_value)
+        if value not in allowed:
+            raise TypeCastError(f"枚举值 '{value}' 不在允许范围内 {list(values)}")
+        return value
+
+    return convert
+
+
+def cast_datetime(raw_value: str, checks):
+    """解析日期配置格式
+        - 返回时间戳
+    """
+    if not raw_value:
+        return 0
+    if isinstance(raw_value, datetime):
+        return int(raw_value.timestamp())
+    if not isinstance(raw_value, str):
+        return 0
+    # 获取日期格式，默认 %Y/%m/%d %H:%M:%S
+    date_format = '%Y/%m/%d %H:%M:%S'
+    # 解析自定义日期格式 标签DateFormat:
+    for check in checks:
+        if check.startswith('DateFormat:'):
+            date_format = check.split(':', 1)[1]
+            break
+    # 配置格式校验
+    if not re.match(build_datetime_regex_pattern(date_format), str(raw_value)):
+        raise TypeCastError(f"日期格式错误: {raw_value},要求格式: {date_format}")
+
+    try:
+        dt = datetime.strptime(str(raw_value), date_format)
+        return int(dt.timestamp())
+    except Exception as e:
+        raise TypeCastError(f"无效日期: {raw_value}") from e
+
+
+def build_datetime_regex_pattern(date_format: str) -> str:
+    """转换正则表达式"""
+    format_map = {
+        "%Y": r"\d{4}",  # 年
+        "%m": r"\d{1,2}",  # 月（允许1-2位）
+        "%d": r"\d{1,2}",  # 日（允许1-2位）
+        "%H": r"\d{2}",  # 小时（严格两位）
+        "%M": r"\d{2}",  # 分（严格两位）
+        "%S": r"\d{2}",  # 秒（严格两位）
+    }
+
+    # 拆分格式字符串为动态部分和静态分隔符
+    pattern = []
+    i = 0
+    while i < len(date_format):
+        if date_format[i] == '%' and i + 1 < len(date_format):
+            specifier = date_format[i:i + 2]
+            pattern.append(format_map.get(specifier, specifier))
+            i += 2
+        else:
+            # 转义静态字符并保留原分隔符
+            pattern.append(re.escape(date_format[i]))
+            i += 1
+
+    return f"^{''.join(pattern)}$"
+
+
+def cast_integer(value: Any, type_name: str) -> int:
+    """处理所有整数类型转换(支持科学计数)"""
+    original_value = value
+
+    # 预处理科学计数法
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if 'e' in value:
+            try:
+                # 先转换为浮点数处理科学计数法
+                float_value = float(value)
+                if not float_value.is_integer():
+                    raise ValueError(f'科学计数法数值 {original_value} 不是整数')
+                value = float_value
+            except ValueError:
+                raise ValueError(f'科学计数法数值 {original_value} 无效')
+
+    # 统一转换为整数
+    try:
+        if isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError(f'浮点数 {original_value} 不是整数')
+            int_value = int(value)
+        else:
+            int_value = int(value)
+    except ValueError:
+        raise ValueError(f'值 {original_value} 无效')
+
+    # 范围校验
+    bits_map = {
+        'byte': 8,
+        'sbyte': 8,
+        'short': 16,
+        'ushort': 16,
+        'int': 32,
+        'uint': (32, False),
+        'long': 64,
+        'ulong': (64, False)
+    }
+    if type_name in bits_map:
+        bits = bits_map[type_name]
+        if isinstance(bits, tuple):
+            bits, signed = bits
+        else:
+            signed = not type_name.startswith('u')
+
+        min_val = - (2 ** (bits - 1)) if signed else 0
+        max_val = (2 ** (bits - (1 if signed else 0))) - 1
+
+        if not (min_val <= int_value <= max_val):
+            raise OverflowError(f"值 {int_value} 超出 {type_name} 范围")
+
+    return int_value
+
+
+def cast_float(value: Any, type_name: str) -> float:
+    """处理浮点类型转换（支持科学计数法、逗号分隔符等）"""
+    try:
+        # 统一转为字符串处理
+        original = str(value).strip() if isinstance(value, str) else str(value)
+
+        # 步骤 1：基础清理（保留数字、科学计数符号、分隔符、正负号）
+        cleaned = re.sub(r"[^\d.,eE+-]", "", original)
+        if not cleaned:
+            return 0.0
+
+        # 步骤 2：符号合法性检查
+        sign_chars = sum(1 for c in cleaned if c in '+-')
+        if sign_chars > 2 or (sign_chars > 1 and 'e' not in cleaned.lower()):
+            raise TypeCastError(f"符号错误 [{type_name}]: {original}")
+
+        # 步骤 3：类型分支处理
+        if type_name == 'decimal':
+            return cast_decimal(cleaned)
+
+        # 步骤 4：预处理后转换为浮点数
+        normalized = normalize_separators(cleaned)
+        return float(normalized)
+
+    except (ValueError, TypeError, InvalidOperation) as e:
+        error_msg = f"数值转换失败 [{type_name}]: {original} -> {cleaned}"
+        raise TypeCastError(error_msg) from e
+
+
+def cast_decimal(value_str: str) -> Decimal:
+    """高精度十进制转换（支持配置精度）"""
+    try:
+        # 移除多余的小数点（如 "12.34.56" -> 报错）
+        if value_str.count('.') > 1:
+            raise ValueError(f"多个小数点 : {value_str}")
+
+        # 自动补全不完整小数（如 "123." -> 123.0）
+        if value_str.endswith('.'):
+            value_str += '0'
+
+        return Decimal(value_str).normalize()
+    except InvalidOperation as e:
+        # 处理特殊值（如 NaN, Infinity）
+        if value_str.lower() in {'nan', 'inf', 'infinity'}:
+            return Decimal('NaN')
+        raise TypeCastError(f"Decimal转换失败: {value_str}") from e
+
+
+def normalize_separators(s: str) -> str:
+    """智能处理数字分隔符（支持欧美格式）"""
+    # 分离科学计数法部分
+    if 'e' in s or 'E' in s:
+        base_part, exp_part = re.split(r'[eE]', s, 1)
+        return f"{process_base_part(base_part)}E{exp_part}"
+    return process_base_part(s)
+
+
+def process_base_part(s: str) -> str:
+    """处理基数部分的分隔符"""
+    # 统计所有分隔符
+    separators = [i for i, c in enumerate(s) if c in ',.']
+
+    # 没有分隔符直接返回
+    if not separators:
+        return s
+
+    # 以最后一个分隔符作为小数点
+    last_sep_pos = separators[-1]
+    parts = []
+    for i, c in enumerate(s):
+        if c in ',.':
+            if i == last_sep_pos:
+                parts.append('.')
+            else:  # 移除非小数点分隔符
+                continue
+        else:
+            parts.append(c)
+    return ''.join(parts)
+
+
+def cast_boolean(value: Any) -> bool:
+    """处理布尔类型转换"""
+    if isinstance(value, bool):
+        return value
+    str_value = str(value).lower()
+    if str_value in {'true', '1', 'yes', 'y'}:
+        return True
+    if str_value in {'false', '0', 'no', 'n'}:
+        return False
+    raise ValueError(f"无法解析的布尔值: {value}")
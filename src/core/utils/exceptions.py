@@ -1,49 +1,85 @@
-﻿class ConfigError(Exception):
-    """配置错误基类"""
-
-    def __init__(self, message: str, location=None):
-        super().__init__(f'配置错误:{location}:{message}' if location else message)
-
-
-class FieldTypeConflictError(ConfigError):
-    """字段类型冲突错误"""
-
-    def __init__(self, field: str, type1: str, type2: str, location=None):
-        super().__init__(f'合并时字段类型不一致：{field}，类型1：{type1}，类型2：{type2} 检查合并Sheet是否存在同字段不同数据类型', location)
-
-
-class LinkerCheckError(ConfigError):
-    """链接检查错误"""
-
-    def __init__(self, field: str, check_str: str, value, location=None):
-        super().__init__(f'链接检查错误：{field},检查表达式：{check_str}, 值：{value}', location)
-
-
-class TypeCastError(ValueError):
-    """类型转换专用异常"""
-
-    def __init__(self, message):
-        super().__init__(message)
-
-
-class JsonTypeCastError(TypeCastError):
-    """json类型转换异常"""
-
-    def __init__(self, message, *,
-                 data_type: str = None,
-                 original_value=None,
-                 missing_fields: list = None,
-                 extra_fields: list = None,
-                 error_position: str = None):
-        super().__init__(message)
-        self.metadata = {
-            'data_type': data_type,
-            'original_value': original_value,
-            'missing_fields': missing_fields or [],
-            'extra_fields': extra_fields or [],
-            'error_position': error_position
-        }
-
-    def add_context(self, context: str):
-        """添加上下文信息"""
-        self.args = (f"{context}: {self.args[0]}",) + self.args[1:]
+﻿class ConfigError(Exception):
+    """配置错误基类"""
+
+    def __init__(self, message: str, location=None):
+        super().__init__(f'配置错误:{location}:{message}' if location else message)
+
+
+class FieldTypeConflictError(ConfigError):
+    """字段类型冲突错误"""
+
+    def __init__(self, field: str, type1: str, type2: str, location=None):
+        super().__init__(f'合并时字段类型不一致：{field}，类型1：{type1}，类型2：{type2} 检查合并Sheet是否存在同字段不同数据类型', location)
+
+
+class LinkerCheckError(ConfigError):
+    """链接检查错误"""
+
+    def __init__(self, field: str, check_str: str, value, location=None):
+        super().__init__(f'链接检查错误：{field},检查表达式：{check_str}, 值：{value}', location)
+
+
+class SelectionError(ConfigError):
+    """导出范围选择错误"""
+
+    def __init__(self, message: str):
+        super().__init__(f'导出范围错误：{message}')
+
+
+class ShardError(ConfigError):
+    """分片导出及合并错误"""
+
+    def __init__(self, message: str):
+        super().__init__(f'分片导出错误：{message}')
+
+
+class BinaryExportError(ConfigError):
+    """二进制数据导出错误"""
+
+    def __init__(self, message: str):
+        super().__init__(f'二进制导出错误：{message}')
+
+
+class SqliteExportError(ConfigError):
+    """SQLite导出错误"""
+
+    def __init__(self, message: str):
+        super().__init__(f'SQLite导出错误：{message}')
+
+
+class SqlLinkCheckError(SqliteExportError):
+    """SQLite导出提交前的链接校验失败，errors与内存中的链接校验输出相同"""
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        super().__init__(f'链接校验失败 {len(errors)} 处，已回滚')
+
+
+class TypeCastError(ValueError):
+    """类型转换专用异常"""
+
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class JsonTypeCastError(TypeCastError):
+    """json类型转换异常"""
+
+    def __init__(self, message, *,
+                 data_type: str = None,
+                 original_value=None,
+                 missing_fields: list = None,
+                 extra_fields: list = None,
+                 error_position: str = None):
+        super().__init__(message)
+        self.metadata = {
+            'data_type': data_type,
+            'original_value': original_value,
+            'missing_fields': missing_fields or [],
+            'extra_fields': extra_fields or [],
+            'error_position': error_position
+        }
+
+    def add_context(self, context: str):
+        """添加上下文信息"""
+        self.args = (f"{context}: {self.args[0]}",) + self.args[1:]
@@ -0,0 +1,205 @@
+﻿import json
+import os
+from pathlib import Path
+
+from core.models import SheetConfig
+from core.utils.layout import ManagedLayout, optimize_order, sequential_size
+from core.utils.type_system import TypeSystem, TypeDescriptor, TypeKind
+
+# IL2CPP 64位平台的对象布局
+OBJECT_HEADER = 16
+# 对象头 + 边界 + 长度
+ARRAY_HEADER = 32
+# 对象头 + _items + _size + _version + _syncRoot
+LIST_OBJECT = 40
+# 对象头 + buckets + entries + count + version + freeList + freeCount + comparer + keys + values + _syncRoot
+DICTIONARY_OBJECT = 80
+# Dictionary扩容使用的质数
+DICTIONARY_PRIMES = (3, 7, 11, 17, 23, 29, 37, 47, 59, 71, 89, 107, 131, 163, 197, 239, 293, 353, 431, 521, 631, 761,
+                     919, 1103, 1327, 1597, 1931, 2333, 2801, 3371, 4049, 4861, 5839, 7013, 8419, 10103, 12143, 14591,
+                     17519, 21023, 25229, 30293, 36353, 43627, 52361, 62851, 75431, 90523, 108631, 130363, 156437,
+                     187751, 225307, 270371, 324449, 389357, 467237, 560689, 672827, 807403, 968897, 1162687, 1395263,
+                     1674319, 2009191, 2411033, 2893249, 3471899, 4166287, 4999559, 5999471, 7199369)
+FOOTPRINT_FILE = 'footprint.json'
+
+
+def align8(size: int) -> int:
+    return size + -size % 8
+
+
+def string_size(text: str) -> int:
+    """对象头 + 长度 + UTF-16字符及结尾的'\\0'"""
+    return align8(OBJECT_HEADER + 4 + len(text.encode('utf-16-le')) + 2)
+
+
+def list_capacity(count: int) -> int:
+    """集合初始化器逐个Add时List的容量，从4开始翻倍"""
+    capacity = 4
+    while capacity < count:
+        capacity *= 2
+    return capacity
+
+
+def get_prime(minimum: int) -> int:
+    for prime in DICTIONARY_PRIMES:
+        if prime >= minimum:
+            return prime
+    candidate = minimum | 1
+    while any(candidate % i == 0 for i in range(3, int(candidate ** 0.5) + 1, 2)):
+        candidate += 2
+    return candidate
+
+
+def dictionary_capacity(count: int) -> int:
+    """集合初始化器逐个Add时Dictionary的容量，从3开始按两倍后的质数扩容"""
+    capacity = 3
+    while capacity < count:
+        capacity = get_prime(capacity * 2)
+    return capacity
+
+
+class FootprintEstimator:
+    """
+    按C#导出的代码估算每张表构造后在托管堆上占用的字节数
+    包括行数组(或按列存储的每列数组)、字符串、列表、字典、自定义类对象及主键字典
+    相同的字符串字面量只计一次，多语言文本由LocalizationPool持有不计入
+    """
+
+    def __init__(self, type_system: TypeSystem):
+        self.type_system = type_system
+        self.managed_layout = ManagedLayout(type_system)
+        # 类型名 -> 是否包含引用类型
+        self.__has_references = {}
+
+    def estimate(self, sheet_config: SheetConfig, columnar: bool = False) -> dict:
+        fields = [meta for meta in sheet_config.fields.values() if not meta.is_ignored]
+        descriptors = [self.type_system.describe(meta.type) for meta in fields]
+        row_count = len(sheet_config.rows_values)
+        if columnar:
+            rows_bytes = sum(align8(ARRAY_HEADER + row_count * self.managed_layout.measure(descriptor)[0])
+                             for descriptor in descriptors)
+        else:
+            ordered = optimize_order(descriptors, lambda descriptor: self.managed_layout.measure(descriptor)[1])
+            rows_bytes = align8(ARRAY_HEADER + row_count * self.managed_layout.struct_size(ordered))
+
+        totals = {'strings': 0, 'collections': 0, 'objects': 0}
+        strings = set()
+        walked = [(meta.name, descriptor) for meta, descriptor in zip(fields, descriptors)
+                  if self.__contains_references(descriptor)]
+        for row_value in sheet_config.rows_values:
+            for name, descriptor in walked:
+                self.__walk(descriptor, row_value.get(name), sheet_config.i18n_keys, strings, totals)
+
+        index_bytes = 0
+        key_meta = next((meta for meta in fields if 'CheckRepeat' in meta.checks), None)
+        if key_meta is not None:
+            # new Dictionary<K, int>(行数)
+            capacity = get_prime(row_count)
+            entry_size = sequential_size([(4, 4), (4, 4), self.managed_layout.measure(
+                self.type_system.describe(key_meta.type)), (4, 4)])[0]
+            index_bytes = DICTIONARY_OBJECT + align8(ARRAY_HEADER + capacity * 4) + \
+                align8(ARRAY_HEADER + capacity * entry_size)
+
+        footprint = {'rows': row_count, 'layout': 'columns' if columnar else 'rows', 'row_data': rows_bytes}
+        footprint.update(totals)
+        footprint['index'] = index_bytes
+        footprint['bytes'] = rows_bytes + sum(totals.values()) + index_bytes
+        return footprint
+
+    def __walk(self, descriptor: TypeDescriptor, value, i18n_keys: dict, strings: set, totals: dict):
+        kind = descriptor.kind
+        if kind == TypeKind.BUILTIN:
+            if descriptor.name == 'string' and value is not None and value not in i18n_keys and value not in strings:
+                strings.add(value)
+                totals['strings'] += string_size(value)
+        elif kind == TypeKind.LIST:
+            # 空列表导出为null
+            if not value:
+                return
+            element = descriptor.children[0]
+            capacity = list_capacity(len(value))
+            totals['collections'] += LIST_OBJECT + align8(
+                ARRAY_HEADER + capacity * self.managed_layout.measure(element)[0])
+            if self.__contains_references(element):
+                for item in value:
+                    self.__walk(element, item, i18n_keys, strings, totals)
+        elif kind == TypeKind.MAP:
+            if not value:
+                return
+            key_type, value_type = descriptor.children
+            capacity = dictionary_capacity(len(value))
+            entry_size = sequential_size([(4, 4), (4, 4), self.managed_layout.measure(key_type),
+                                          self.managed_layout.measure(value_type)])[0]
+            totals['collections'] += DICTIONARY_OBJECT + align8(ARRAY_HEADER + capacity * 4) + \
+                align8(ARRAY_HEADER + capacity * entry_size)
+            for key, item in value.items():
+                self.__walk(key_type, key, i18n_keys, strings, totals)
+                self.__walk(value_type, item, i18n_keys, strings, totals)
+        elif kind in (TypeKind.STRUCT, TypeKind.CLASS):
+            if kind == TypeKind.CLASS:
+                members = [self.managed_layout.measure(child) for child in descriptor.children]
+                totals['objects'] += align8(OBJECT_HEADER + sequential_size(members)[0])
+            for name, child in zip(descriptor.field_names, descriptor.children):
+                self.__walk(child, (value or {}).get(name), i18n_keys, strings, totals)
+
+    def __contains_references(self, descriptor: TypeDescriptor) -> bool:
+        result = self.__has_references.get(descriptor.name)
+        if result is None:
+            if descriptor.kind == TypeKind.BUILTIN:
+                result = descriptor.name == 'string'
+            elif descriptor.kind == TypeKind.ENUM:
+                result = False
+            elif descriptor.kind == TypeKind.STRUCT:
+                result = any(self.__contains_references(child) for child in descriptor.children)
+            else:
+                result = True
+            self.__has_references[descriptor.name] = result
+        return result
+
+
+class FootprintManifest:
+    """
+    每张表估算的托管堆占用，写入输出目录的 footprint.json，用于按平台设定 ConfigMemoryPool 的字节预算
+    只更新本次导出的表，其它表保留上次的结果
+    """
+
+    def __init__(self):
+        self.tables = {}
+
+    def record(self, table: str, footprint: dict):
+        self.tables[table] = footprint
+
+    def write(self, output_dir):
+        if not self.tables:
+            return
+        manifest_file = Path(output_dir) / FOOTPRINT_FILE
+        tables = {}
+        if manifest_file.exists():
+            try:
+                with open(manifest_file, 'r', encoding='utf-8') as f:
+                    tables = json.load(f).get('tables', {})
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error reading footprint manifest: {e}")
+        tables.update(self.tables)
+        manifest = {
+            'platform': 'il2cpp-64',
+            'total_bytes': sum(footprint['bytes'] for footprint in tables.values()),
+            'tables': dict(sorted(tables.items())),
+        }
+        tmp_file = manifest_file.with_name(f'{manifest_file.name}.{os.getpid()}.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        tmp_file.replace(manifest_file)
+
+    def get_fragment(self) -> dict:
+        return dict(self.tables)
+
+    def apply_fragment(self, fragment: dict):
+        self.tables.update(fragment)
+
+
+class FootprintFragment(FootprintManifest):
+    """分片导出时只记录本分片导出的表，由合并步骤统一写入"""
+
+    def write(self, output_dir):
+        pass
@@ -0,0 +1,116 @@
+﻿from typing import Callable, List, Tuple
+
+from core.utils.memory import MB
+from core.utils.type_system import TypeSystem, TypeDescriptor, TypeKind
+
+# C#内置类型的字节数，对齐等于字节数，decimal按两个8字节对齐的字段计
+MANAGED_BUILTIN_SIZES = {
+    'bool': 1,
+    'byte': 1,
+    'sbyte': 1,
+    'char': 2,
+    'short': 2,
+    'ushort': 2,
+    'int': 4,
+    'uint': 4,
+    'float': 4,
+    'long': 8,
+    'ulong': 8,
+    'double': 8,
+    'datetime': 8,
+}
+DECIMAL_SIZE = (16, 8)
+# 64位平台的引用大小
+REFERENCE_SIZE = 8
+
+
+def sequential_size(members: List[Tuple[int, int]]) -> Tuple[int, int]:
+    """
+    按顺序排列时结构体的大小和对齐
+    :param members: [(字节数, 对齐)]
+    """
+    offset = 0
+    align = 1
+    for size, member_align in members:
+        offset += -offset % member_align
+        offset += size
+        align = max(align, member_align)
+    return offset + -offset % align, align
+
+
+def optimize_order(members: list, align_of: Callable) -> list:
+    """
+    按对齐从大到小排列，对齐相同时保持原有顺序
+    每个字段的字节数都是其对齐的整数倍，排列后除末尾外没有填充，结构体最小
+    """
+    return sorted(members, key=lambda member: -align_of(member))
+
+
+class ManagedLayout:
+    """
+    C#中字段占用的字节数和对齐，自定义结构体按声明顺序递归计算
+    IL2CPP按字段声明顺序生成C++结构体，字段顺序直接决定每行占用的内存
+    """
+
+    def __init__(self, type_system: TypeSystem):
+        self.type_system = type_system
+        # 类型名 -> (字节数, 对齐)
+        self.__sizes = {}
+
+    def measure(self, descriptor: TypeDescriptor) -> Tuple[int, int]:
+        size = self.__sizes.get(descriptor.name)
+        if size is None:
+            size = self.__sizes[descriptor.name] = self.__measure(descriptor)
+        return size
+
+    def struct_size(self, descriptors: List[TypeDescriptor]) -> int:
+        return sequential_size([self.measure(descriptor) for descriptor in descriptors])[0]
+
+    def __measure(self, descriptor: TypeDescriptor) -> Tuple[int, int]:
+        if descriptor.kind == TypeKind.BUILTIN:
+            if descriptor.name == 'decimal':
+                return DECIMAL_SIZE
+            if descriptor.name in MANAGED_BUILTIN_SIZES:
+                size = MANAGED_BUILTIN_SIZES[descriptor.name]
+                return size, size
+            return REFERENCE_SIZE, REFERENCE_SIZE
+        if descriptor.kind == TypeKind.ENUM:
+            return 4, 4
+        if descriptor.kind == TypeKind.STRUCT:
+            return sequential_size([self.measure(child) for child in descriptor.children])
+        # 类、列表、字典都是引用
+        return REFERENCE_SIZE, REFERENCE_SIZE
+
+
+class LayoutReport:
+    """记录每张表优化字段顺序前后每行的字节数，通过 --layout_report 开启"""
+
+    def __init__(self):
+        self.enabled = False
+        # [(表名, 行数, 优化前字节数, 优化后字节数)]
+        self.records = []
+
+    def enable(self):
+        self.enabled = True
+
+    def record(self, table: str, rows: int, before: int, after: int):
+        if self.enabled:
+            self.records.append((table, rows, before, after))
+
+    def report(self) -> str:
+        lines = ['结构体布局(按数组总字节数排序):',
+                 f'{"行数":>10} {"每行(优化前)":>10} {"每行(优化后)":>10} {"数组(优化前MB)":>12} {"数组(优化后MB)":>12}  表']
+        total_before = total_after = 0
+        for table, rows, before, after in sorted(self.records, key=lambda r: r[1] * r[3], reverse=True):
+            total_before += rows * before
+            total_after += rows * after
+            lines.append(f'{rows:>12} {before:>14} {after:>14} {rows * before / MB:>16.2f} {rows * after / MB:>16.2f}'
+                         f'  {table}')
+        saved = total_before - total_after
+        lines.append(f'数组总计 {total_before / MB:.2f} MB -> {total_after / MB:.2f} MB，节省 {saved / MB:.2f} MB'
+                     f'({saved * 100 / total_before if total_before else 0:.1f}%)')
+        return '\n'.join(lines)
+
+
+# 全局布局统计
+layout_report = LayoutReport()
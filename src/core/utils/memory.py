@@ -0,0 +1,167 @@
+﻿import os
+import threading
+import tracemalloc
+from pathlib import Path
+
+MB = 1024 * 1024
+
+
+def get_current_rss():
+    """当前进程常驻内存字节数，无法获取时返回None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+class _NullUsage:
+    """未开启内存统计时使用的空记录"""
+    peak = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set(self, **labels):
+        pass
+
+
+_NULL_USAGE = _NullUsage()
+
+
+class MemoryUsage:
+    """一段区间的内存统计，后台线程采样RSS峰值"""
+
+    # RSS采样间隔，单位秒
+    SAMPLE_INTERVAL = 0.005
+
+    def __init__(self, monitor, stage: str, labels: dict):
+        self.monitor = monitor
+        self.stage = stage
+        self.labels = labels
+        # Python对象分配峰值(超出区间开始时的部分)
+        self.py_peak = 0
+        # RSS峰值及区间内的增长
+        self.rss_peak = 0
+        self.rss_growth = 0
+        self.__rss_start = 0
+        self.__stop = threading.Event()
+        self.__sampler = None
+
+    @property
+    def peak(self) -> int:
+        """区间内新增的内存峰值，取两种统计中较大的一个"""
+        return max(self.py_peak, self.rss_growth)
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+    def __enter__(self):
+        if self.monitor.trace_allocations:
+            tracemalloc.reset_peak()
+            self.__py_start = tracemalloc.get_traced_memory()[0]
+        self.__rss_start = get_current_rss() or 0
+        self.rss_peak = self.__rss_start
+        self.__sampler = threading.Thread(target=self.__sample, daemon=True)
+        self.__sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.__stop.set()
+        self.__sampler.join()
+        self.rss_peak = max(self.rss_peak, get_current_rss() or 0)
+        self.rss_growth = self.rss_peak - self.__rss_start if self.__rss_start else 0
+        if self.monitor.trace_allocations:
+            self.py_peak = tracemalloc.get_traced_memory()[1] - self.__py_start
+        self.monitor.records.append(self)
+        return False
+
+    def __sample(self):
+        while not self.__stop.wait(self.SAMPLE_INTERVAL):
+            rss = get_current_rss()
+            if rss is not None and rss > self.rss_peak:
+                self.rss_peak = rss
+
+
+class MemoryMonitor:
+    """
+    可选的内存统计，记录每个Excel读取、合并、每张表导出的内存峰值
+    开启分配追踪时额外使用tracemalloc统计Python对象分配及最大的分配位置
+    统计区间不可嵌套，tracemalloc的峰值是全局的
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_allocations = False
+        self.records = []
+
+    def enable(self, trace_allocations: bool = True):
+        self.enabled = True
+        # 无法读取RSS时只能依赖tracemalloc
+        self.trace_allocations = trace_allocations or get_current_rss() is None
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def measure(self, stage: str, **labels):
+        if not self.enabled:
+            return _NULL_USAGE
+        return MemoryUsage(self, stage, labels)
+
+    def report(self, top: int = 10) -> str:
+        """按峰值排序的统计结果及最大的分配位置"""
+        lines = [f'内存峰值(前{top}):', f'{"Python(MB)":>12} {"RSS增长(MB)":>12} {"RSS峰值(MB)":>12}  阶段']
+        for usage in sorted(self.records, key=lambda u: u.peak, reverse=True)[:top]:
+            target = usage.labels.get('table') or usage.labels.get('workbook') or ''
+            lines.append(f'{usage.py_peak / MB:>12.1f} {usage.rss_growth / MB:>13.1f} {usage.rss_peak / MB:>13.1f}'
+                         f'  {usage.stage} {target}')
+        if self.trace_allocations:
+            lines.append(f'当前最大的分配位置(前{top}):')
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ])
+            for stat in snapshot.statistics('lineno')[:top]:
+                frame = stat.traceback[0]
+                lines.append(f'{stat.size / MB:>12.1f} MB {stat.count:>9} 个  {frame.filename}:{frame.lineno}')
+        return '\n'.join(lines)
+
+
+class MemoryBudget:
+    """
+    单个Excel的内存预算
+    根据文件大小估算读取所需内存，超出预算时改用只读流式读取并串行解析
+    """
+
+    # openpyxl完整读取模式的内存约为文件大小的50倍，实际读取后按观测值修正
+    DEFAULT_RATIO = 50
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.ratio = self.DEFAULT_RATIO
+        self.__observed = False
+
+    def should_stream(self, file_path: str) -> bool:
+        return Path(file_path).stat().st_size * self.ratio > self.max_bytes
+
+    def observe(self, file_path: str, usage, low_memory: bool):
+        """记录实际内存峰值，超出预算时给出警告"""
+        size = Path(file_path).stat().st_size
+        if not low_memory and size > 0 and usage.peak > 0:
+            ratio = usage.peak / size
+            self.ratio = max(self.ratio, ratio) if self.__observed else ratio
+            self.__observed = True
+        if usage.peak > self.max_bytes:
+            mode = '流式读取' if low_memory else '完整读取'
+            print(f'警告: [{file_path}] {mode}内存峰值 {usage.peak / MB:.1f} MB 超出预算 {self.max_bytes / MB:.1f} MB')
+
+
+# 全局内存统计，通过 --memory_report 或 --max_memory_per_workbook 开启
+memory_monitor = MemoryMonitor()
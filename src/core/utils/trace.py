@@ -0,0 +1,122 @@
+﻿import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+class _NullSpan:
+    """关闭追踪时使用的空span，所有操作都不做任何事"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """一段计时区间，退出时记录为Chrome Trace的完整事件"""
+
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, tracer, name: str, cat: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = str(exc_val)
+        self.tracer.record(self, end)
+        return False
+
+    def set(self, **args):
+        """补充行数、单元格数、写入字节数等统计信息"""
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    按阶段记录耗时，输出Chrome Trace Event格式(chrome://tracing 或 Perfetto 打开)
+    未开启时span直接返回空对象，几乎没有额外开销
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.__events = []
+        self.__threads = {}
+        self.__origin = time.perf_counter_ns()
+
+    def enable(self):
+        self.enabled = True
+        self.__origin = time.perf_counter_ns()
+
+    def span(self, name: str, cat: str = 'stage', **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, cat, args)
+
+    def record(self, span: Span, end: int):
+        thread = threading.current_thread()
+        self.__threads[thread.ident] = thread.name
+        # list.append是原子操作，多线程记录无需加锁
+        self.__events.append((span.name, span.cat, span.start, end, thread.ident, span.args))
+
+    def save(self, file_path: str):
+        """写出Chrome Trace Event JSON"""
+        pid = os.getpid()
+        trace_events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in self.__threads.items()
+        ]
+        for name, cat, start, end, tid, args in self.__events:
+            trace_events.append({
+                'name': name,
+                'cat': cat,
+                'ph': 'X',
+                'ts': (start - self.__origin) / 1000,
+                'dur': (end - start) / 1000,
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            })
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+
+    def summary(self, top: int = 10) -> str:
+        """最慢的Excel文件和表"""
+        lines = []
+        for cat, key, title in (('workbook', 'workbook', 'Excel文件'), ('table', 'table', '表')):
+            totals = defaultdict(int)
+            rows = {}
+            for name, event_cat, start, end, tid, args in self.__events:
+                if event_cat != cat or key not in args:
+                    continue
+                totals[args[key]] += end - start
+                if 'rows' in args:
+                    rows[args[key]] = max(rows.get(args[key], 0), args['rows'])
+            if not totals:
+                continue
+            lines.append(f'最慢的{title}(前{top}):')
+            lines.append(f'{"耗时(ms)":>10} {"行数":>8}  {title}')
+            for item, total in sorted(totals.items(), key=lambda x: x[1], reverse=True)[:top]:
+                lines.append(f'{total / 1e6:>12.2f} {rows.get(item, "-"):>10}  {item}')
+        return '\n'.join(lines)
+
+
+# 全局追踪器，通过 --trace 开启
+tracer = Tracer()
@@ -1,358 +1,536 @@
-﻿import core.utils.utils
-from core.utils.exceptions import ConfigError
-from enum import Enum, auto
-from core.models import FieldMeta
-import yaml
-from pathlib import Path
-
-
-class TypeKind(Enum):
-    """类型种类
-    """
-    STRUCT = auto()
-    CLASS = auto()
-    ENUM = auto()
-
-
-class TypeSystem:
-    """类型系统
-    支持自定义新增enum、struck、class
-    """
-
-    def __init__(self, input_dir, output_dir, base_language, export_type):
-        self.custom_types = {}
-        self.base_language = base_language
-        self.export_type = export_type
-        self.input_dir = input_dir
-        self.output_dir = output_dir
-        self.builtin_types = {
-            'int': 0,
-            'float': 0.0,
-            'long': 0,
-            'string': '',
-            'bool': False,
-            'double': 0.0,
-            'char': '\0',
-            'byte': 0,
-            'sbyte': 0,
-            'short': 0,
-            'uint': 0,
-            'ulong': 0,
-            'ushort': 0,
-            'decimal': 0,
-            'datetime': 0,
-        }
-
-        self.validation_logic = {
-            TypeKind.STRUCT: self.__validate_composite_type,
-            TypeKind.CLASS: self.__validate_composite_type,
-            TypeKind.ENUM: self.__validate_enum_type,
-        }
-
-    def load_custom_types(self, file_path: str):
-        """加载自定义类型
-        """
-        with open(file_path, 'r', encoding='utf-8') as f:
-            types = yaml.safe_load(f) or {}
-
-        for type_name, defs in types.items():
-            self.__validate_custom_type_definition(type_name, defs)
-            self.custom_types[type_name] = defs
-
-    def get_default_value(self, type_name: str):
-        """
-        获取配置默认值，包含内置和自定义的
-        """
-        # 处理泛型类型 (如 list<int>)
-        if type_name.lower().startswith('list<'):
-            return []
-        if type_name.lower().startswith('map<'):
-            return {}
-
-        if self.is_custom_support_type(type_name):
-            return self.__get_custom_type_default_value(type_name)
-
-        return self.__get_builtin_type_default_value(type_name)
-
-    def is_support_type(self, type_name: str) -> bool:
-        """判断是否支持的类型
-        """
-        return self._is_valid_field_type(type_name)
-
-    def is_builtin_support_type(self, type_name: str) -> bool:
-        """判断是否支持的类型
-        """
-        return type_name in self.builtin_types
-
-    def is_custom_support_type(self, type_name: str) -> bool:
-        """判断是否支持的类型
-        """
-        return type_name in self.custom_types
-
-    def get_type_definition(self, type_name: str) -> dict:
-        """获取类型定义
-        """
-        if type_name in self.builtin_types:
-            return self.builtin_types[type_name]
-        elif type_name in self.custom_types:
-            return self.custom_types.get(type_name, {})
-        else:
-            raise ConfigError(f'未定义的类型: {type_name}')
-
-    def get_custom_type_fields(self, type_name: str) -> dict:
-        """获取自定义类型定义的所有属性字段"""
-        if type_name in self.custom_types:
-            defs = self.custom_types.get(type_name, {})
-            return defs.get('fields', {})
-        else:
-            raise ConfigError(f'未定义的类型: {type_name}')
-
-    def export_all_custom_cs(self):
-        Path(f'{self.output_dir}/scripts').mkdir(parents=True, exist_ok=True)
-        with open('./custom/TableCustomTypeTemplate.txt', 'r', encoding='utf-8') as f:
-            code_template = f.read()
-        for type_name, type_defs in self.custom_types.items():
-            # 有忽略标签就不导出
-            if type_defs.get('ignore', False):
-                continue
-            type_kind_enum = self.__parse_2_type_kind_enum(type_defs['type'])
-            fields = type_defs.get('fields', {})
-            final_code = None
-            if type_kind_enum in [TypeKind.STRUCT, TypeKind.CLASS]:
-                all_using = set()
-                field_lines = []
-                assignments = []
-                ctor_fields = []
-                for field, yaml_type in fields.items():
-                    code_line, usings = self.generate_field_code_cs(field, yaml_type, False)
-                    all_using.update(usings)
-                    field_lines.append(code_line)
-                    csharp_type = self.map_to_csharp_type(yaml_type)
-                    ctor_fields.append(f'{csharp_type} {field}')
-                    assignments.append(f'this.{field} = {field};')
-
-                using_code = '\n    '.join(sorted(all_using)) + '\n' if all_using else ''
-                fields_code = '\n        '.join(field_lines)
-
-                ctor_code = f'\n        internal {type_name}({", ".join(ctor_fields)})\n        ' + '{\n            ' + '\n            '.join(
-                    assignments) + '\n        }'
-
-                final_code = code_template \
-                    .replace('$AttributeType$', type_defs['type']) \
-                    .replace('$AttributeName$', type_name) \
-                    .replace('$Usings$', using_code) \
-                    .replace('$Fields$', fields_code) \
-                    .replace('$Constructor$', ctor_code)
-            elif type_kind_enum == TypeKind.ENUM:
-                enum_items = ',\n        '.join(fields)
-                final_code = code_template \
-                    .replace('$AttributeType$', 'enum') \
-                    .replace('$AttributeName$', type_name) \
-                    .replace('$Usings$', '') \
-                    .replace('$Fields$', enum_items) \
-                    .replace('$Constructor$', '')
-            if not final_code is None:
-                with open(f'{self.output_dir}/scripts/{type_name}.cs', 'w', encoding='utf-8') as f:
-                    f.write(final_code)
-
-    def map_to_csharp_type(self, config_type: str) -> str:
-        """核心转换类型，将配置类型转成C#识别的类型"""
-        generic_type, inner_types = self.__parse_generic_type(config_type)
-        # 递归处理泛型类型
-        if generic_type.lower() == 'list':
-            return f'List<{self.map_to_csharp_type(inner_types[0])}>'
-        elif generic_type.lower() == 'map':
-            key_type = self.map_to_csharp_type(inner_types[0])
-            value_type = self.map_to_csharp_type(inner_types[1])
-            return f'Dictionary<{key_type}, {value_type}>'
-        elif generic_type.lower() == 'datetime':
-            # 日期类型是转换成时间戳long
-            return f'long'
-        return config_type
-
-    def generate_field_code_cs(self, field_name: str, config_type: str, pascal=False):
-        """生成字段代码和需要的using语句"""
-        using_statements = set()
-        csharp_type = self.map_to_csharp_type(config_type)
-        if 'List<' in csharp_type or 'Dictionary<' in csharp_type:
-            using_statements.add('using System.Collections.Generic;')
-        if csharp_type in ['Vector2', 'Vector3', 'Vector4', 'Color']:
-            using_statements.add('using UnityEngine;')
-
-        # 属性名称转换
-        prop_name = field_name
-        if pascal:
-            prop_name = self.__snake_to_pascal(field_name)
-        return f'public {csharp_type} {prop_name} {{ get; }}', using_statements
-
-    def __snake_to_pascal(self, name: str) -> str:
-        """转换成驼峰命名"""
-        return ''.join([word.title() for word in name.split('_')])
-
-    def __parse_generic_type(self, yaml_type: str) -> tuple:
-        """解析泛型类型声明 如List、Dictionary"""
-        if yaml_type.lower().startswith(('list<', 'map<')):
-            bracket_index = yaml_type.find('<')
-            type_name = yaml_type[:bracket_index]
-            inner_types = yaml_type[bracket_index + 1:-1].split(',')
-            return type_name, [t.strip() for t in inner_types]
-        return '', []
-
-    def __get_builtin_type_default_value(self, type_name: str):
-        """获取内置类型默认值
-        """
-        if type_name in self.builtin_types:
-            return self.builtin_types[type_name]
-        else:
-            raise ConfigError(f'获取内置类型默认值失败，未定义的内置类型: {type_name}')
-
-    def __get_custom_type_default_value(self, type_name: str):
-        """获取自定义类型默认值
-        """
-        if type_name in self.custom_types:
-            defs = self.custom_types.get(type_name, {})
-            if 'default' in defs:
-                return self.__parse_default_value(type_name, defs['default'], defs)
-
-            type_kind_enum = self.__parse_2_type_kind_enum(defs['type'])
-            if type_kind_enum == TypeKind.ENUM:
-                return defs['fields'][0]
-            elif type_kind_enum == TypeKind.STRUCT:
-                return self.__generate_struct_default_value(defs)
-            elif type_kind_enum == TypeKind.CLASS:
-                return {}
-            else:
-                raise ConfigError(f'未知的类型种类: {defs["type"]}')
-        else:
-            raise ConfigError(f'未定义的类型: {type_name}')
-
-    def __parse_default_value(self, type_name: str, default_spec, defs: dict):
-        """解析自定义类型默认值配置"""
-        type_kind_enum = self.__parse_2_type_kind_enum(defs['type'])
-        if type_kind_enum == TypeKind.ENUM:
-            if default_spec not in defs['fields']:
-                raise ConfigError(
-                    f"自定义类型 {type_name} 字段 '{default_spec}' 的默认值 '{default_spec}' 不在枚举值列表中")
-        elif type_kind_enum == TypeKind.STRUCT or type_kind_enum == TypeKind.CLASS:
-            required_fields = set(defs['fields'].keys())
-            provided_fields = set(default_spec.keys())
-            missing = required_fields - provided_fields
-            if missing:
-                raise ConfigError(
-                    f"自定义类型 {type_name} 字段 '{default_spec}' 的默认值 '{missing}' 不在字段列表中")
-
-            return {
-                field: self.get_default_value(defs['fields'][field])
-                for field in required_fields
-            }
-
-        return default_spec
-
-    def __generate_struct_default_value(self, defs: dict):
-        return {
-            field_name: self.get_default_value(field_type)
-            for field_name, field_type in defs['fields'].items()
-        }
-
-    def __validate_composite_type(self, type_name: str, defs: dict):
-        """
-        验证结构体和类类型的字段定义
-        """
-        for field_name, field_def in defs.get('fields', {}).items():
-            if not self._is_valid_field_type(field_def):
-                raise ConfigError(
-                    f"自定义类型 {type_name} 字段 '{field_name}' 的类型 '{field_def}' 不支持"
-                )
-
-    def __validate_enum_type(self, type_name: str, defs: dict):
-        """
-        验证枚举类型的值定义
-        """
-        if len(defs['fields']) == 0:
-            raise ConfigError(f"枚举类型 '{type_name}' 缺少值定义,至少要有一个值")
-
-        if len(set(defs['fields'])) != len(defs['fields']):
-            duplicates = [v for i, v in enumerate(defs['fields']) if v in defs['fields'][:i]]
-            raise ConfigError(
-                f"自定义枚举类型 '{type_name}' 的值定义有重复项: {duplicates}"
-            )
-
-    def __validate_custom_type_definition(self, type_name: str, defs):
-        """
-        验证自定义类型配置是否正确
-        """
-        self.__validate_type_structure(type_name, defs)
-
-        # 具体的类型验证逻辑
-        type_kind_enum = self.__parse_2_type_kind_enum(defs['type'])
-        self.validation_logic[type_kind_enum](type_name, defs)
-
-    def __validate_type_structure(self, type_name: str, defs: dict):
-        """验证类型定义基础结构"""
-        if 'type' not in defs:
-            raise ConfigError(f"缺少必要字段 'type' (类型: {type_name})")
-
-        type_kind = defs['type']
-        type_kind_enum = self.__parse_2_type_kind_enum(type_kind)
-        required_fields = self.__get_required_fields(type_kind_enum)
-
-        missing_fields = [f for f in required_fields if f not in defs]
-        if missing_fields:
-            raise ConfigError(
-                f"类型 '{type_name}' 缺少必要字段: {missing_fields} "
-                f"(类型种类: {type_kind})"
-            )
-        # 字段名称是否合法
-        fields_name = []
-        if type_kind_enum == TypeKind.STRUCT or type_kind_enum == TypeKind.CLASS:
-            fields_name = defs['fields'].keys()
-        if type_kind_enum == TypeKind.ENUM:
-            fields_name = defs['fields']
-        for field_name in fields_name:
-            if not core.utils.utils.validate_str_legal(field_name):
-                raise ConfigError(f"自定义类型[{type_name}],字段名称 '{field_name}' 不合法")
-
-    def _is_valid_field_type(self, field_type: str) -> bool:
-        """递归验证字段类型有效性"""
-        # 处理泛型类型 例如list<int>
-        if field_type.lower().startswith('list<'):
-            if not field_type.endswith('>'):
-                return False
-            inner_type = field_type[5:-1]
-            return self._is_valid_field_type(inner_type)
-        if field_type.lower().startswith('map<'):
-            if not field_type.endswith('>'):
-                return False
-            key_type, value_type = field_type[4:-1].split(',')
-            return self._is_valid_field_type(key_type) and self._is_valid_field_type(value_type)
-
-        # 基础类型检查
-        return self.is_builtin_support_type(field_type) or self.is_custom_support_type(field_type)
-
-    def __parse_2_type_kind_enum(self, type_kind):
-        if type_kind == 'struct':
-            return TypeKind.STRUCT
-        elif type_kind == 'class':
-            return TypeKind.CLASS
-        elif type_kind == 'enum':
-            return TypeKind.ENUM
-        else:
-            raise ValueError(f'未支持的自定义类型: {type_kind}')
-
-    def __get_required_fields(self, type_kind):
-        """获取类型定义必须包含的字段"""
-        if type_kind in [TypeKind.STRUCT, TypeKind.CLASS, TypeKind.ENUM]:
-            return ['fields']
-        else:
-            raise ValueError(f'未支持的自定义类型: {type_kind}')
-
-
-if __name__ == '__main__':
-    pass
-    # ts = TypeSystem()
-    # ts.load_custom_types('custom_types.yaml')
-    # print(ts.get_type_definition('int'))
-    # print(ts.get_type_definition('string'))
-    # print(ts.get_type_definition('AttributeData'))
-    # print(ts.get_type_definition('ItemType'))
-    # print(ts.get_type_definition('CharacterClass'))
+﻿import core.utils.utils
+import hashlib
+import pickle
+import threading
+from core.utils.exceptions import ConfigError
+from core.utils.utils import FrozenDict, freeze
+from core.utils.converters import make_builtin_converter, make_enum_converter
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Any, Callable, Optional, Tuple
+from pathlib import Path
+
+
+class TypeKind(Enum):
+    """类型种类
+    """
+    STRUCT = auto()
+    CLASS = auto()
+    ENUM = auto()
+    BUILTIN = auto()
+    LIST = auto()
+    MAP = auto()
+
+
+CUSTOM_TYPE_KINDS = (TypeKind.STRUCT, TypeKind.CLASS, TypeKind.ENUM)
+
+
+@dataclass(frozen=True, eq=False)
+class TypeDescriptor:
+    """解析后的类型描述
+    同一类型全局只有一个实例，可直接用is比较
+    - children: list为(元素,) map为(键,值) struct/class为各字段类型
+    - field_names: struct/class的字段名，与children一一对应
+    - converter: 内置类型和枚举的转换器 (原始值, 字段标签) -> 值，复合类型为None
+    """
+    name: str
+    kind: TypeKind
+    children: Tuple['TypeDescriptor', ...] = ()
+    field_names: Tuple[str, ...] = ()
+    definition: Optional[FrozenDict] = None
+    csharp_name: str = ''
+    default: Any = None
+    converter: Optional[Callable[[Any, tuple], Any]] = None
+
+    @property
+    def is_custom(self) -> bool:
+        return self.kind in CUSTOM_TYPE_KINDS
+
+    def __repr__(self):
+        return f'TypeDescriptor({self.name})'
+
+
+class TypeSystem:
+    """类型系统
+    支持自定义新增enum、struck、class
+    """
+
+    def __init__(self, input_dir, output_dir, base_language, export_type):
+        self.custom_types = {}
+        # 自定义类型配置文件哈希，类型定义变化时解析缓存随之失效
+        self.custom_types_hash = ''
+        self.base_language = base_language
+        self.export_type = export_type
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.builtin_types = {
+            'int': 0,
+            'float': 0.0,
+            'long': 0,
+            'string': '',
+            'bool': False,
+            'double': 0.0,
+            'char': '\0',
+            'byte': 0,
+            'sbyte': 0,
+            'short': 0,
+            'uint': 0,
+            'ulong': 0,
+            'ushort': 0,
+            'decimal': 0,
+            'datetime': 0,
+        }
+
+        # 类型描述缓存 原始类型字符串/规范类型名 -> TypeDescriptor
+        self.__descriptors = {}
+        self.__descriptor_lock = threading.RLock()
+
+        self.validation_logic = {
+            TypeKind.STRUCT: self.__validate_composite_type,
+            TypeKind.CLASS: self.__validate_composite_type,
+            TypeKind.ENUM: self.__validate_enum_type,
+        }
+
+    def load_custom_types(self, file_path: str, cache_dir: str = None):
+        """加载自定义类型
+        指定cache_dir时，校验通过的类型定义按文件哈希缓存，内容未变化时无需解析和校验yaml
+        """
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        self.custom_types_hash = hashlib.md5(content).hexdigest()
+        registry_file = Path(cache_dir) / f'custom_types_{self.custom_types_hash}.pickle' if cache_dir else None
+        if registry_file is not None and registry_file.exists():
+            try:
+                with open(registry_file, 'rb') as f:
+                    self.custom_types.update(pickle.load(f))
+                self.__descriptors.clear()
+                return
+            except Exception as e:
+                print(f"Error reading type registry {registry_file}: {e}")
+
+        # yaml只在类型定义变化时才需要导入
+        import yaml
+        types = yaml.safe_load(content.decode('utf-8')) or {}
+
+        for type_name, defs in types.items():
+            self.__validate_custom_type_definition(type_name, defs)
+            self.custom_types[type_name] = defs
+            # 类型定义变化后描述需要重新解析
+            self.__descriptors.clear()
+
+        if registry_file is not None:
+            for old_file in registry_file.parent.glob('custom_types_*.pickle'):
+                old_file.unlink(missing_ok=True)
+            tmp_file = registry_file.with_suffix('.tmp')
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(self.custom_types, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp_file.replace(registry_file)
+
+    def describe(self, type_name: str) -> TypeDescriptor:
+        """
+        获取类型描述，结果按类型字符串缓存，后续查询只需一次字典查找
+        不支持的类型抛出ConfigError
+        """
+        descriptor = self.__descriptors.get(type_name)
+        if descriptor is None:
+            with self.__descriptor_lock:
+                descriptor = self.__descriptors.get(type_name)
+                if descriptor is None:
+                    descriptor = self.__parse_type(type_name)
+                    self.__descriptors[type_name] = descriptor
+        return descriptor
+
+    def get_default_value(self, type_name: str):
+        """
+        获取配置默认值，包含内置和自定义的
+        返回的默认值是共享的不可变对象
+        """
+        return self.describe(type_name).default
+
+    def is_support_type(self, type_name: str) -> bool:
+        """判断是否支持的类型
+        """
+        return self._is_valid_field_type(type_name)
+
+    def is_builtin_support_type(self, type_name: str) -> bool:
+        """判断是否支持的类型
+        """
+        return type_name in self.builtin_types
+
+    def is_custom_support_type(self, type_name: str) -> bool:
+        """判断是否支持的类型
+        """
+        return type_name in self.custom_types
+
+    def get_type_definition(self, type_name: str) -> dict:
+        """获取类型定义
+        """
+        if type_name in self.builtin_types:
+            return self.builtin_types[type_name]
+        elif type_name in self.custom_types:
+            return self.custom_types.get(type_name, {})
+        else:
+            raise ConfigError(f'未定义的类型: {type_name}')
+
+    def get_custom_type_fields(self, type_name: str) -> dict:
+        """获取自定义类型定义的所有属性字段"""
+        if type_name in self.custom_types:
+            defs = self.custom_types.get(type_name, {})
+            return defs.get('fields', {})
+        else:
+            raise ConfigError(f'未定义的类型: {type_name}')
+
+    def export_all_custom_types(self, last_stamp: str = None) -> str:
+        """按基础语言导出所有自定义类型的代码"""
+        if self.base_language == 'cpp':
+            return self.export_all_custom_cpp(last_stamp)
+        return self.export_all_custom_cs(last_stamp)
+
+    def export_all_custom_cs(self, last_stamp: str = None) -> str:
+        """
+        导出所有自定义类型的C#代码
+        :param last_stamp: 上次导出时的标记，类型定义、模板均未变化且文件都在时跳过导出
+        :return: 本次导出的标记
+        """
+        with open('./custom/TableCustomTypeTemplate.txt', 'r', encoding='utf-8') as f:
+            code_template = f.read()
+        stamp = hashlib.md5(f'{self.custom_types_hash}|{code_template}'.encode('utf-8')).hexdigest()
+        if stamp == last_stamp and all(Path(file).exists() for file in self.get_custom_type_files()):
+            return stamp
+        Path(f'{self.output_dir}/scripts').mkdir(parents=True, exist_ok=True)
+        for type_name, type_defs in self.custom_types.items():
+            # 有忽略标签就不导出
+            if type_defs.get('ignore', False):
+                continue
+            type_kind_enum = self.__parse_2_type_kind_enum(type_defs['type'])
+            fields = type_defs.get('fields', {})
+            final_code = None
+            if type_kind_enum in [TypeKind.STRUCT, TypeKind.CLASS]:
+                all_using = set()
+                field_lines = []
+                assignments = []
+                ctor_fields = []
+                for field, yaml_type in fields.items():
+                    code_line, usings = self.generate_field_code_cs(field, yaml_type, False)
+                    all_using.update(usings)
+                    field_lines.append(code_line)
+                    csharp_type = self.map_to_csharp_type(yaml_type)
+                    ctor_fields.append(f'{csharp_type} {field}')
+                    assignments.append(f'this.{field} = {field};')
+
+                using_code = '\n    '.join(sorted(all_using)) + '\n' if all_using else ''
+                fields_code = '\n        '.join(field_lines)
+
+                ctor_code = f'\n        internal {type_name}({", ".join(ctor_fields)})\n        ' + '{\n            ' + '\n            '.join(
+                    assignments) + '\n        }'
+
+                final_code = code_template \
+                    .replace('$AttributeType$', type_defs['type']) \
+                    .replace('$AttributeName$', type_name) \
+                    .replace('$Usings$', using_code) \
+                    .replace('$Fields$', fields_code) \
+                    .replace('$Constructor$', ctor_code)
+            elif type_kind_enum == TypeKind.ENUM:
+                enum_items = ',\n        '.join(fields)
+                final_code = code_template \
+                    .replace('$AttributeType$', 'enum') \
+                    .replace('$AttributeName$', type_name) \
+                    .replace('$Usings$', '') \
+                    .replace('$Fields$', enum_items) \
+                    .replace('$Constructor$', '')
+            if not final_code is None:
+                with open(f'{self.output_dir}/scripts/{type_name}.cs', 'w', encoding='utf-8') as f:
+                    f.write(final_code)
+        return stamp
+
+    def export_all_custom_cpp(self, last_stamp: str = None) -> str:
+        """导出所有自定义类型的C++代码及二进制数据加载器，标记的含义与export_all_custom_cs相同"""
+        from core.exporters.cpp import CppCodeGenerator
+        return CppCodeGenerator(self).export_custom_types(last_stamp)
+
+    def get_custom_type_files(self) -> list:
+        """自定义类型生成的代码文件"""
+        if self.base_language == 'cpp':
+            from core.exporters.cpp import CppCodeGenerator
+            return CppCodeGenerator(self).get_custom_type_files()
+        return [f'{self.output_dir}/scripts/{type_name}.cs' for type_name, type_defs in self.custom_types.items()
+                if not type_defs.get('ignore', False)]
+
+    def map_to_csharp_type(self, config_type: str) -> str:
+        """核心转换类型，将配置类型转成C#识别的类型"""
+        return self.describe(config_type).csharp_name
+
+    def generate_field_code_cs(self, field_name: str, config_type: str, pascal=False):
+        """生成字段代码和需要的using语句"""
+        using_statements = set()
+        csharp_type = self.map_to_csharp_type(config_type)
+        if 'List<' in csharp_type or 'Dictionary<' in csharp_type:
+            using_statements.add('using System.Collections.Generic;')
+        if csharp_type in ['Vector2', 'Vector3', 'Vector4', 'Color']:
+            using_statements.add('using UnityEngine;')
+
+        # 属性名称转换
+        prop_name = field_name
+        if pascal:
+            prop_name = self.__snake_to_pascal(field_name)
+        return f'public {csharp_type} {prop_name} {{ get; }}', using_statements
+
+    def __snake_to_pascal(self, name: str) -> str:
+        """转换成驼峰命名"""
+        return ''.join([word.title() for word in name.split('_')])
+
+    def __parse_type(self, type_name: str) -> TypeDescriptor:
+        """解析类型字符串，泛型参数支持任意嵌套 如map<int,list<int>>"""
+        if not isinstance(type_name, str) or not type_name.strip():
+            raise ConfigError(f'未定义的类型: {type_name}')
+        if type_name != type_name.strip():
+            return self.describe(type_name.strip())
+        bracket_index = type_name.find('<')
+        if bracket_index < 0:
+            return self.__describe_named_type(type_name)
+
+        generic_type = type_name[:bracket_index].strip().lower()
+        if generic_type not in ('list', 'map') or not type_name.endswith('>'):
+            raise ConfigError(f'未定义的类型: {type_name}')
+        inner_types = self.__split_generic_arguments(type_name[bracket_index + 1:-1], type_name)
+        children = tuple(self.describe(t) for t in inner_types)
+        if generic_type == 'list':
+            if len(children) != 1:
+                raise ConfigError(f'list泛型参数个数错误: {type_name}')
+            canonical = f'list<{children[0].name}>'
+            kind = TypeKind.LIST
+            csharp_name = f'List<{children[0].csharp_name}>'
+            default = ()
+        else:
+            if len(children) != 2:
+                raise ConfigError(f'map泛型参数个数错误: {type_name}')
+            canonical = f'map<{children[0].name},{children[1].name}>'
+            kind = TypeKind.MAP
+            csharp_name = f'Dictionary<{children[0].csharp_name}, {children[1].csharp_name}>'
+            default = FrozenDict()
+
+        # 不同写法的同一类型共享同一个描述
+        if canonical != type_name and canonical in self.__descriptors:
+            return self.__descriptors[canonical]
+        descriptor = TypeDescriptor(name=canonical, kind=kind, children=children,
+                                    csharp_name=csharp_name, default=default)
+        self.__descriptors[canonical] = descriptor
+        return descriptor
+
+    def __split_generic_arguments(self, arguments: str, type_name: str) -> list:
+        """按最外层逗号切分泛型参数"""
+        parts = []
+        depth = 0
+        start = 0
+        for i, char in enumerate(arguments):
+            if char == '<':
+                depth += 1
+            elif char == '>':
+                depth -= 1
+                if depth < 0:
+                    raise ConfigError(f'泛型括号不匹配: {type_name}')
+            elif char == ',' and depth == 0:
+                parts.append(arguments[start:i].strip())
+                start = i + 1
+        if depth != 0:
+            raise ConfigError(f'泛型括号不匹配: {type_name}')
+        parts.append(arguments[start:].strip())
+        if any(not part for part in parts):
+            raise ConfigError(f'泛型参数为空: {type_name}')
+        return parts
+
+    def __describe_named_type(self, type_name: str) -> TypeDescriptor:
+        """内置类型和自定义类型"""
+        if type_name in self.builtin_types:
+            return TypeDescriptor(
+                name=type_name,
+                kind=TypeKind.BUILTIN,
+                # 日期类型是转换成时间戳long
+                csharp_name='long' if type_name == 'datetime' else type_name,
+                default=self.__get_builtin_type_default_value(type_name),
+                converter=make_builtin_converter(type_name)
+            )
+        if type_name not in self.custom_types:
+            raise ConfigError(f'未定义的类型: {type_name}')
+
+        defs = self.custom_types[type_name]
+        kind = self.__parse_2_type_kind_enum(defs['type'])
+        if kind == TypeKind.ENUM:
+            return TypeDescriptor(
+                name=type_name,
+                kind=kind,
+                definition=freeze(defs),
+                csharp_name=type_name,
+                default=self.__get_custom_type_default_value(type_name),
+                converter=make_enum_converter(type_name, defs['fields'])
+            )
+        fields = defs.get('fields', {})
+        return TypeDescriptor(
+            name=type_name,
+            kind=kind,
+            children=tuple(self.describe(t) for t in fields.values()),
+            field_names=tuple(fields.keys()),
+            definition=freeze(defs),
+            csharp_name=type_name,
+            default=freeze(self.__get_custom_type_default_value(type_name))
+        )
+
+    def __get_builtin_type_default_value(self, type_name: str):
+        """获取内置类型默认值
+        """
+        if type_name in self.builtin_types:
+            return self.builtin_types[type_name]
+        else:
+            raise ConfigError(f'获取内置类型默认值失败，未定义的内置类型: {type_name}')
+
+    def __get_custom_type_default_value(self, type_name: str):
+        """获取自定义类型默认值
+        """
+        if type_name in self.custom_types:
+            defs = self.custom_types.get(type_name, {})
+            if 'default' in defs:
+                return self.__parse_default_value(type_name, defs['default'], defs)
+
+            type_kind_enum = self.__parse_2_type_kind_enum(defs['type'])
+            if type_kind_enum == TypeKind.ENUM:
+                return defs['fields'][0]
+            elif type_kind_enum == TypeKind.STRUCT:
+                return self.__generate_struct_default_value(defs)
+            elif type_kind_enum == TypeKind.CLASS:
+                return {}
+            else:
+                raise ConfigError(f'未知的类型种类: {defs["type"]}')
+        else:
+            raise ConfigError(f'未定义的类型: {type_name}')
+
+    def __parse_default_value(self, type_name: str, default_spec, defs: dict):
+        """解析自定义类型默认值配置"""
+        type_kind_enum = self.__parse_2_type_kind_enum(defs['type'])
+        if type_kind_enum == TypeKind.ENUM:
+            if default_spec not in defs['fields']:
+                raise ConfigError(
+                    f"自定义类型 {type_name} 字段 '{default_spec}' 的默认值 '{default_spec}' 不在枚举值列表中")
+        elif type_kind_enum == TypeKind.STRUCT or type_kind_enum == TypeKind.CLASS:
+            required_fields = set(defs['fields'].keys())
+            provided_fields = set(default_spec.keys())
+            missing = required_fields - provided_fields
+            if missing:
+                raise ConfigError(
+                    f"自定义类型 {type_name} 字段 '{default_spec}' 的默认值 '{missing}' 不在字段列表中")
+
+            return {
+                field: self.__convert_default_spec(field_type, default_spec[field])
+                for field, field_type in defs['fields'].items()
+            }
+
+        return default_spec
+
+    def __convert_default_spec(self, field_type: str, value):
+        """将yaml中配置的默认值转换为字段类型"""
+        descriptor = self.describe(field_type)
+        if value is None:
+            return descriptor.default
+        if descriptor.converter is not None:
+            return descriptor.converter(value, ())
+        return freeze(value)
+
+    def __generate_struct_default_value(self, defs: dict):
+        return {
+            field_name: self.get_default_value(field_type)
+            for field_name, field_type in defs['fields'].items()
+        }
+
+
+    def __validate_composite_type(self, type_name: str, defs: dict):
+        """
+        验证结构体和类类型的字段定义
+        """
+        for field_name, field_def in defs.get('fields', {}).items():
+            if not self._is_valid_field_type(field_def):
+                raise ConfigError(
+                    f"自定义类型 {type_name} 字段 '{field_name}' 的类型 '{field_def}' 不支持"
+                )
+
+    def __validate_enum_type(self, type_name: str, defs: dict):
+        """
+        验证枚举类型的值定义
+        """
+        if len(defs['fields']) == 0:
+            raise ConfigError(f"枚举类型 '{type_name}' 缺少值定义,至少要有一个值")
+
+        if len(set(defs['fields'])) != len(defs['fields']):
+            duplicates = [v for i, v in enumerate(defs['fields']) if v in defs['fields'][:i]]
+            raise ConfigError(
+                f"自定义枚举类型 '{type_name}' 的值定义有重复项: {duplicates}"
+            )
+
+    def __validate_custom_type_definition(self, type_name: str, defs):
+        """
+        验证自定义类型配置是否正确
+        """
+        self.__validate_type_structure(type_name, defs)
+
+        # 具体的类型验证逻辑
+        type_kind_enum = self.__parse_2_type_kind_enum(defs['type'])
+        self.validation_logic[type_kind_enum](type_name, defs)
+
+    def __validate_type_structure(self, type_name: str, defs: dict):
+        """验证类型定义基础结构"""
+        if 'type' not in defs:
+            raise ConfigError(f"缺少必要字段 'type' (类型: {type_name})")
+
+        type_kind = defs['type']
+        type_kind_enum = self.__parse_2_type_kind_enum(type_kind)
+        required_fields = self.__get_required_fields(type_kind_enum)
+
+        missing_fields = [f for f in required_fields if f not in defs]
+        if missing_fields:
+            raise ConfigError(
+                f"类型 '{type_name}' 缺少必要字段: {missing_fields} "
+                f"(类型种类: {type_kind})"
+            )
+        # 字段名称是否合法
+        fields_name = []
+        if type_kind_enum == TypeKind.STRUCT or type_kind_enum == TypeKind.CLASS:
+            fields_name = defs['fields'].keys()
+        if type_kind_enum == TypeKind.ENUM:
+            fields_name = defs['fields']
+        for field_name in fields_name:
+            if not core.utils.utils.validate_str_legal(field_name):
+                raise ConfigError(f"自定义类型[{type_name}],字段名称 '{field_name}' 不合法")
+
+    def _is_valid_field_type(self, field_type: str) -> bool:
+        """递归验证字段类型有效性"""
+        try:
+            self.describe(field_type)
+            return True
+        except ConfigError:
+            return False
+
+    def __parse_2_type_kind_enum(self, type_kind):
+        if type_kind == 'struct':
+            return TypeKind.STRUCT
+        elif type_kind == 'class':
+            return TypeKind.CLASS
+        elif type_kind == 'enum':
+            return TypeKind.ENUM
+        else:
+            raise ValueError(f'未支持的自定义类型: {type_kind}')
+
+    def __get_required_fields(self, type_kind):
+        """获取类型定义必须包含的字段"""
+        if type_kind in [TypeKind.STRUCT, TypeKind.CLASS, TypeKind.ENUM]:
+            return ['fields']
+        else:
+            raise ValueError(f'未支持的自定义类型: {type_kind}')
+
+
+if __name__ == '__main__':
+    pass
+    # ts = TypeSystem()
+    # ts.load_custom_types('custom_types.yaml')
+    # print(ts.get_type_definition('int'))
+    # print(ts.get_type_definition('string'))
+    # print(ts.get_type_definition('AttributeData'))
+    # print(ts.get_type_definition('ItemType'))
+    # print(ts.get_type_definition('CharacterClass'))
@@ -0,0 +1,202 @@
+﻿import time
+import traceback
+from pathlib import Path
+from typing import Dict, List
+
+from core.excel_reader import ExcelProcessor
+from core.exporters.factory import create_exporter
+from core.i18n.extractor import I18NExtractor
+from core.models import SheetConfig
+from core.processors.merger import SheetMergerProcessor
+from core.processors.validators import RepeatValidator, LinkValidator, ExportNameValidator
+from core.utils.cache import CacheSystem, LruCache
+from core.utils.type_system import TypeSystem
+
+
+class ExcelWatcher:
+    """
+    常驻内存监听输入目录，Excel保存后只对受影响的表重新读取、校验和导出
+    类型系统、已解析的表、链接键索引和导出器在多次导出之间保留
+    """
+
+    def __init__(self, type_system: TypeSystem, cache_system: CacheSystem, struct_cache: LruCache,
+                 file_configs: Dict[str, List[SheetConfig]], custom_types_file: str,
+                 failed_files: set = None, sort_by_key: bool = False, exporter_options: dict = None,
+                 interval: float = 0.3, debounce: float = 0.3):
+        self.type_system = type_system
+        self.cache_system = cache_system
+        self.struct_cache = struct_cache
+        self.custom_types_file = Path(custom_types_file)
+        self.sort_by_key = sort_by_key
+        # 创建导出器的参数，如增量补丁、分块压缩
+        self.exporter_options = exporter_options or {}
+        # 轮询间隔及保存防抖时间，单位秒
+        self.interval = interval
+        self.debounce = debounce
+        # Excel路径 -> 该文件解析出的Sheet配置
+        self.file_configs = dict(file_configs)
+        self.link_validator = LinkValidator()
+        self.exporter = None
+        # 解析失败的文件，修复前不导出，避免导出缺少部分数据的表
+        self.__failed_files = set(failed_files or ())
+        # 待导出的表名，None表示需要全量导出
+        self.__pending_names = None
+        self.__file_states = self.__scan_files()
+        self.__types_state = self.__get_state(self.custom_types_file)
+
+    def run(self):
+        """全量校验导出一次后进入监听循环，Ctrl+C退出"""
+        self.__try_export()
+        print(f'开始监听目录 {self.type_system.input_dir} ，Ctrl+C退出')
+        try:
+            while True:
+                time.sleep(self.interval)
+                self.__poll()
+        except KeyboardInterrupt:
+            print('已停止监听')
+
+    def __poll(self):
+        file_states = self.__scan_files()
+        types_state = self.__get_state(self.custom_types_file)
+        if file_states == self.__file_states and types_state == self.__types_state:
+            return
+
+        # 防抖，保存期间文件可能多次变化，稳定后再处理
+        while True:
+            time.sleep(self.debounce)
+            new_file_states = self.__scan_files()
+            new_types_state = self.__get_state(self.custom_types_file)
+            if new_file_states == file_states and new_types_state == types_state:
+                break
+            file_states, types_state = new_file_states, new_types_state
+
+        start = time.perf_counter()
+        if types_state != self.__types_state:
+            # 自定义类型变化会影响所有表的解析结果
+            self.__types_state = types_state
+            if not self.__reload_type_system():
+                return
+            self.file_configs.clear()
+            changed = set(file_states)
+            self.__pending_names = None
+        else:
+            changed = {path for path, state in file_states.items() if self.__file_states.get(path) != state}
+        removed = set(self.__file_states) - set(file_states)
+        self.__file_states = file_states
+
+        names = self.__ingest(changed, removed)
+        if self.__pending_names is not None:
+            self.__pending_names.update(names)
+        if self.__try_export():
+            print(f'增量导出完成，耗时：{time.perf_counter() - start:.3f} 秒')
+
+    def __ingest(self, changed: set, removed: set) -> set:
+        """重新读取变化的Excel，返回受影响的导出名称"""
+        names = set()
+        for file_path in removed:
+            names.update(config.export_name for config in self.file_configs.pop(file_path, []))
+            self.cache_system.remove_file(file_path)
+            self.__failed_files.discard(file_path)
+
+        for file_path in sorted(changed):
+            names.update(config.export_name for config in self.file_configs.get(file_path, []))
+            try:
+                file_md5 = self.cache_system.refresh_file(file_path)
+                excel_processor = ExcelProcessor(self.type_system, self.struct_cache)
+                configs = excel_processor.process_workbook(file_path, file_md5)
+                self.cache_system.save_parts(file_md5, self.type_system.custom_types_hash, configs)
+            except Exception as e:
+                print(f"[{file_path}] 转换失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}")
+                self.__failed_files.add(file_path)
+                continue
+            print(f'文件[ {file_path} ]有更新，已重新读取')
+            self.__failed_files.discard(file_path)
+            self.file_configs[file_path] = configs
+            names.update(config.export_name for config in configs)
+        return names
+
+    def __try_export(self) -> bool:
+        """校验并导出待处理的表，失败的表保留到下次修改后重试"""
+        if self.__failed_files:
+            print(f'Excel处理失败，等待修改: {", ".join(sorted(self.__failed_files))}')
+            return False
+        if self.__pending_names is not None and not self.__pending_names:
+            return False
+        try:
+            configs = [config for file_path in sorted(self.file_configs) for config in self.file_configs[file_path]]
+            merged = SheetMergerProcessor(self.type_system, self.sort_by_key).merge(configs)
+            if self.__pending_names is None:
+                targets = merged
+            else:
+                targets = [config for config in merged if config.export_name in self.__pending_names]
+
+            errors = []
+            for validator in [RepeatValidator(), ExportNameValidator()]:
+                errors.extend(validator.validate(targets))
+            errors.extend(self.link_validator.validate(merged, self.__pending_names))
+            if errors:
+                for e in errors:
+                    print(e)
+                print('数据校验失败，等待修改')
+                return False
+
+            if self.exporter is None:
+                self.exporter = create_exporter(self.type_system, **self.exporter_options)
+            errors = self.exporter.check_options(config.export_name for config in merged)
+            if errors:
+                for e in errors:
+                    print(e)
+                return False
+            self.exporter.before_export()
+            outdated = self.exporter.sync_tables({config.export_name: config.source_files for config in merged})
+            target_names = {config.export_name for config in targets}
+            targets = targets + [config for config in merged
+                                 if config.export_name in outdated and config.export_name not in target_names]
+            extractor = I18NExtractor(self.type_system, self.exporter.i18n)
+            for config in targets:
+                print(f'表[ {config.export_name} ]开始导出数据')
+                extractor.extract(config)
+                self.exporter.export_base_language_class(config)
+                self.exporter.export_data(config)
+            self.exporter.after_export()
+            self.cache_system.save_cache()
+        except Exception as e:
+            print(f'导出数据失败，异常信息: {e} \n异常堆栈: {traceback.format_exc()}')
+            return False
+        self.__pending_names = set()
+        return True
+
+    def __reload_type_system(self) -> bool:
+        """重新加载自定义类型，失败时保留原有类型系统"""
+        old = self.type_system
+        try:
+            type_system = TypeSystem(old.input_dir, old.output_dir, old.base_language, old.export_type)
+            type_system.load_custom_types(str(self.custom_types_file))
+            type_system.export_all_custom_types()
+        except Exception as e:
+            print(f"[自定义类型系统] 重新加载失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}")
+            return False
+        print('自定义类型有更新，重新读取所有Excel')
+        self.type_system = type_system
+        self.struct_cache.clear()
+        self.exporter = None
+        return True
+
+    def __scan_files(self) -> dict:
+        """记录所有Excel的修改时间和大小，忽略Excel打开时生成的~$临时文件"""
+        states = {}
+        for file_path in Path(self.type_system.input_dir).glob('**/*.xlsx'):
+            if file_path.name.startswith('~$'):
+                continue
+            state = self.__get_state(file_path)
+            if state is not None:
+                states[str(file_path)] = state
+        return states
+
+    @staticmethod
+    def __get_state(file_path: Path):
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
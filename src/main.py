@@ -1,155 +1,516 @@
-import argparse
-import traceback
-from pathlib import Path
-from typing import List
-
-from core.excel_reader import ExcelProcessor
-from core.utils.type_system import TypeSystem
-from core.models import SheetConfig
-from core.processors.merger import SheetMergerProcessor
-from core.utils.utils import timer_decorator
-from core.utils.cache import CacheSystem
-
-
-def process_cache_system(args):
-    # 1.初始化缓存系统，文件变更检测
-    cache_system = CacheSystem(args.input_dir)
-    return cache_system
-
-
-def process_type_system(args):
-    # 2.初始化并注册类型系统
-    errors = []
-    type_system = None
-    try:
-        type_system = TypeSystem(args.input_dir, args.output_dir, args.base_language, args.export_type)
-        type_system.load_custom_types('./custom/custom_types.yaml')
-        type_system.export_all_custom_cs()
-    except Exception as e:
-        errors.append(f"[自定义类型系统] 初始化失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}")
-    return type_system, errors
-
-
-def process_single_file(file_path, type_system) -> tuple[List[SheetConfig], list[str]]:
-    # 3.处理单个Excel文件
-    errors = []
-    config = None
-    try:
-        excel_processor = ExcelProcessor(type_system)
-        configs = excel_processor.process_workbook(file_path)
-
-        # 4.合并跨Sheet数据
-        merger = SheetMergerProcessor(type_system)
-        config = merger.merge(configs)
-    except Exception as e:
-        errors.append(f"[{file_path}] 转换失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}")
-    finally:
-        return config, errors
-
-
-@timer_decorator
-def process_valid_configs(configs: List[SheetConfig]) -> list[str]:
-    # 5.各种校验
-    from core.processors.validators import RepeatValidator, LinkValidator, ExportNameValidator
-    validators = [RepeatValidator(), LinkValidator(), ExportNameValidator()]
-    errors = []
-    try:
-        for validator in validators:
-            es = validator.validate(configs)
-            if es and len(es) > 0:
-                for e in es:
-                    errors.append(e)
-    except Exception as e:
-        errors.append(f"数据校验失败，异常信息: {e} \n异常堆栈: {traceback.format_exc()}")
-    finally:
-        return errors
-
-
-@timer_decorator
-def process_export_configs(configs: List[SheetConfig], type_system: TypeSystem, cache_system: CacheSystem) -> list[str]:
-    # 6.导出数据及基类
-    from core.exporters.json import JsonExporter
-    from core.exporters.csharp import CSharpExporter
-    from core.exporters.bin import BinaryExporter
-
-    errors = []
-    try:
-        # 创建导出目录
-        Path(type_system.output_dir).mkdir(parents=True, exist_ok=True)
-        exporter = None
-        if type_system.export_type == 'json':
-            exporter = JsonExporter(type_system)
-        elif type_system.export_type == 'csharp':
-            exporter = CSharpExporter(type_system)
-        elif type_system.export_type == 'bin':
-            exporter = BinaryExporter(type_system)
-        else:
-            errors.append(f'暂未支持的导出类型: {type_system.export_type}')
-            return errors
-
-        exporter.before_export()
-        for config in configs:
-            if cache_system.is_modify_file(config.source_file_md5):
-                print(f'文件[ {config.source_file} ]有更新，开始导出数据')
-                exporter.export_base_language_class(config)
-                exporter.export_data(config)
-        exporter.after_export()
-    except Exception as e:
-        errors.append(f'导出数据失败，异常信息: {e} \n异常堆栈: {traceback.format_exc()}')
-    return errors
-
-
-@timer_decorator
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("input_dir", type=str)
-    parser.add_argument("output_dir", type=str)
-    parser.add_argument("--base_language", choices=['cs', 'cpp'], type=str, default='cs')
-    parser.add_argument("--export_type", choices=['json', 'csharp', 'bin'], type=str, default='csharp')
-    args = parser.parse_args()
-    errors = []
-    cache_system = process_cache_system(args)
-
-    type_system, es = process_type_system(args)
-    if len(es) > 0:
-        print("自定义类型系统初始化失败,已停止导出!")
-        exit(1)
-
-    configs = []
-    for excel_file in Path(type_system.input_dir).glob('**/*.xlsx'):
-        if excel_file.name.startswith('~$'):
-            continue
-        config, es = process_single_file(str(excel_file), type_system)
-        if len(es):
-            errors.append(es)
-        if not config is None and len(config) > 0:
-            for c in config:
-                configs.append(c)
-
-    if len(errors) > 0:
-        for es in errors:
-            print(es)
-        print("Excel处理失败,已停止导出!")
-        exit(1)
-
-    # 这里可以再合并一次，以实现可以跨Excel配置合并数据，不过现在的处理还是不允许跨Excel配置
-
-    errors = process_valid_configs(configs)
-    if len(errors) > 0:
-        for es in errors:
-            print(es)
-        print("数据校验失败,已停止导出!")
-        exit(1)
-
-    errors = process_export_configs(configs, type_system, cache_system)
-    if len(errors) > 0:
-        for es in errors:
-            print(es)
-        print("导出数据失败,已停止导出!")
-        exit(1)
-    cache_system.save_cache()
-
-
-if __name__ == '__main__':
-    main()
-    print("导出完成!")
+import argparse
+import traceback
+from pathlib import Path
+from typing import List
+
+from core.utils.type_system import TypeSystem
+from core.models import SheetConfig
+from core.utils.utils import timer_decorator
+from core.utils.cache import CacheSystem, LruCache
+from core.utils.trace import tracer
+from core.utils.memory import memory_monitor, MemoryBudget, MB
+from core.utils.layout import layout_report
+from core.selection import ExportSelection, create_selection
+from core.utils.exceptions import ShardError, SqlLinkCheckError
+
+CUSTOM_TYPES_FILE = './custom/custom_types.yaml'
+
+
+def process_cache_system(args, cache_dir: str = './__cache__'):
+    # 1.初始化缓存系统，文件变更检测
+    with tracer.span('hash_all'):
+        cache_system = CacheSystem(args.input_dir, cache_dir)
+    return cache_system
+
+
+def process_type_system(args, cache_system: CacheSystem, export_custom_types: bool = True):
+    # 2.初始化并注册类型系统，类型定义未变化时读取已校验的缓存，且不重新生成自定义类型代码
+    errors = []
+    type_system = None
+    types_changed = True
+    try:
+        type_system = TypeSystem(args.input_dir, args.output_dir, args.base_language, args.export_type)
+        type_system.load_custom_types(CUSTOM_TYPES_FILE, cache_system.cache_dir)
+        if not export_custom_types:
+            return type_system, types_changed, errors
+        output_key = str(Path(args.output_dir).resolve())
+        stamp_name = f'custom_{args.base_language}'
+        last_stamp = cache_system.load_stamp(stamp_name, output_key)
+        stamp = type_system.export_all_custom_types(last_stamp)
+        types_changed = stamp != last_stamp
+        cache_system.save_stamp(stamp_name, output_key, stamp)
+    except Exception as e:
+        errors.append(f"[自定义类型系统] 初始化失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}")
+    return type_system, types_changed, errors
+
+
+def process_single_file(file_path, type_system, cache_system: CacheSystem, struct_cache: LruCache = None,
+                        parts_memo: dict = None,
+                        memory_budget: MemoryBudget = None) -> tuple[List[SheetConfig], list[str]]:
+    # 3.处理单个Excel文件，未修改的文件直接读取解析缓存
+    errors = []
+    configs = None
+    try:
+        file_md5 = cache_system.get_file_md5(file_path)
+        part_key = (file_md5, type_system.custom_types_hash)
+        # 常驻服务的内存缓存，命中时无需反序列化
+        if parts_memo is not None and parts_memo.get(file_path, (None,))[0] == part_key:
+            return parts_memo[file_path][1], errors
+        configs = cache_system.load_parts(file_md5, type_system.custom_types_hash)
+        if configs is None:
+            # openpyxl导入较慢，只在确实需要解析Excel时导入
+            from core.excel_reader import ExcelProcessor
+            excel_processor = ExcelProcessor(type_system, struct_cache)
+            # 预计超出内存预算的Excel改用流式读取
+            low_memory = memory_budget is not None and memory_budget.should_stream(file_path)
+            with memory_monitor.measure('load', workbook=file_path) as usage:
+                configs = excel_processor.process_workbook(file_path, file_md5, low_memory)
+                usage.set(table=', '.join(config.export_name for config in configs))
+            if memory_budget is not None:
+                memory_budget.observe(file_path, usage, low_memory)
+            cache_system.save_parts(file_md5, type_system.custom_types_hash, configs)
+        else:
+            # 内容相同的文件可能已移动或改名
+            for config in configs:
+                config.source_file = file_path
+                config.source_files = {file_path: file_md5}
+        if parts_memo is not None:
+            parts_memo[file_path] = (part_key, configs)
+    except Exception as e:
+        errors.append(f"[{file_path}] 转换失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}")
+    finally:
+        return configs, errors
+
+
+@timer_decorator
+def process_merge_configs(configs: List[SheetConfig], type_system: TypeSystem,
+                          sort_by_key: bool) -> tuple[List[SheetConfig], list[str]]:
+    # 4.合并同导出名称的Sheet数据，支持跨Excel
+    errors = []
+    merged = []
+    try:
+        from core.processors.merger import SheetMergerProcessor
+        with tracer.span('merge', sheets=len(configs)) as span, memory_monitor.measure('merge'):
+            merger = SheetMergerProcessor(type_system, sort_by_key)
+            merged = merger.merge(configs)
+            span.set(tables=len(merged))
+    except Exception as e:
+        errors.append(f"合并配置失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}")
+    return merged, errors
+
+
+@timer_decorator
+def process_valid_configs(configs: List[SheetConfig], link_validator=None, check_links: bool = True) -> list[str]:
+    # 5.各种校验，check_links为False时链接由SQLite导出器在提交前校验
+    from core.processors.validators import RepeatValidator, LinkValidator, ExportNameValidator
+    validators = [RepeatValidator(), ExportNameValidator()]
+    if check_links:
+        validators.insert(1, link_validator or LinkValidator())
+    errors = []
+    try:
+        for validator in validators:
+            with tracer.span(f'validate:{type(validator).__name__}'):
+                es = validator.validate(configs)
+            if es and len(es) > 0:
+                for e in es:
+                    errors.append(e)
+    except Exception as e:
+        errors.append(f"数据校验失败，异常信息: {e} \n异常堆栈: {traceback.format_exc()}")
+    finally:
+        return errors
+
+
+def create_exporter_options(args, cache_system: CacheSystem) -> dict:
+    """命令行中与导出器相关的参数"""
+    return {
+        'row_snapshots': cache_system if getattr(args, 'patch', False) else None,
+        'compress': getattr(args, 'compress', None),
+        'block_rows': getattr(args, 'block_rows', None) or 256,
+        'soa_tables': getattr(args, 'soa', None),
+        'link_check': getattr(args, 'sql_link_check', False),
+    }
+
+
+def is_output_synced(args, cache_system: CacheSystem) -> bool:
+    """文件缓存由所有导出类型共享，SQLite数据库需额外确认包含输入目录中所有Excel的表"""
+    if args.export_type == 'sqlite':
+        from core.exporters.sqlite import SQLITE_FILE, is_database_synced
+        return is_database_synced(Path(args.output_dir) / 'data' / SQLITE_FILE, set(cache_system.file_md5.values()))
+    return True
+
+
+@timer_decorator
+def process_export_configs(configs: List[SheetConfig], type_system: TypeSystem, cache_system: CacheSystem,
+                           exporter=None, exporter_options: dict = None, export_names=None) -> list[str]:
+    # 6.导出数据及基类，export_names为所有导出名称，分片导出时包含其它分片的表
+    from core.exporters.factory import create_exporter
+    from core.i18n.extractor import I18NExtractor
+
+    errors = []
+    try:
+        # 创建导出目录
+        Path(type_system.output_dir).mkdir(parents=True, exist_ok=True)
+        if exporter is None:
+            exporter = create_exporter(type_system, **(exporter_options or {}))
+        if exporter is None:
+            errors.append(f'暂未支持的导出类型: {type_system.export_type}')
+            return errors
+        errors = exporter.check_options(export_names or [config.export_name for config in configs])
+        if errors:
+            return errors
+
+        exporter.before_export()
+        outdated = exporter.sync_tables({config.export_name: config.source_files for config in configs})
+        extractor = I18NExtractor(type_system, exporter.i18n)
+        for config in configs:
+            if config.export_name in outdated or \
+                    any(cache_system.is_modify_file(md5) for md5 in config.source_files.values()):
+                print(f'文件[ {", ".join(config.source_files)} ]有更新，开始导出数据')
+                with tracer.span('i18n', 'table', table=config.export_name, rows=len(config.rows_values)):
+                    extractor.extract(config)
+                with tracer.span('export', 'table', table=config.export_name, rows=len(config.rows_values)), \
+                        memory_monitor.measure('export', table=config.export_name):
+                    exporter.export_base_language_class(config)
+                    exporter.export_data(config)
+        with tracer.span('after_export'):
+            exporter.after_export()
+    except SqlLinkCheckError:
+        raise
+    except Exception as e:
+        errors.append(f'导出数据失败，异常信息: {e} \n异常堆栈: {traceback.format_exc()}')
+    return errors
+
+
+def run_export(args, struct_cache: LruCache = None, parts_memo: dict = None) -> bool:
+    """执行一次完整的导出流程，常驻服务多次调用时复用结构体缓存和Excel解析结果"""
+    errors = []
+    shard = getattr(args, 'shard', None)
+    # 分片使用独立的缓存目录，同一台机器上的多个分片互不影响
+    cache_system = process_cache_system(args, f'./__cache__/{shard.name}' if shard else './__cache__')
+
+    # 自定义类型代码只由第一个分片生成
+    type_system, types_changed, es = process_type_system(args, cache_system, shard is None or shard.index == 0)
+    if len(es) > 0:
+        for e in es:
+            print(e)
+        print("自定义类型系统初始化失败,已停止导出!")
+        return False
+
+    if shard is not None:
+        return process_shard(args, type_system, cache_system, shard, struct_cache)
+
+    selection = create_selection(args)
+    if not args.watch and selection is None and not types_changed and not cache_system.has_changes() \
+            and is_output_synced(args, cache_system):
+        print("没有需要导出的修改")
+        return True
+
+    # 限定导出范围时只读取选中的表及其链接的表，复用流水线的分组和持久化索引
+    if (getattr(args, 'pipeline', None) or selection is not None) and not args.watch:
+        return process_pipeline(args, type_system, cache_system, struct_cache, selection)
+
+    configs = []
+    # 常驻模式按文件保留解析结果
+    file_configs = {}
+    failed_files = set()
+    if struct_cache is None:
+        struct_cache = LruCache(args.struct_cache_size)
+    memory_budget = None
+    if getattr(args, 'max_memory_per_workbook', None):
+        memory_budget = MemoryBudget(args.max_memory_per_workbook * MB)
+    # 排序保证跨Excel合并时各部分的顺序稳定
+    for excel_file in sorted(Path(type_system.input_dir).glob('**/*.xlsx')):
+        if excel_file.name.startswith('~$'):
+            continue
+        config, es = process_single_file(str(excel_file), type_system, cache_system, struct_cache, parts_memo,
+                                         memory_budget)
+        if len(es):
+            errors.append(es)
+            failed_files.add(str(excel_file))
+        if not config is None and len(config) > 0:
+            file_configs[str(excel_file)] = config
+            for c in config:
+                configs.append(c)
+    if parts_memo is not None:
+        # 只保留本次目录中仍存在的文件
+        for file_path in set(parts_memo) - set(file_configs):
+            del parts_memo[file_path]
+
+    if len(errors) > 0:
+        for es in errors:
+            print(es)
+        if not args.watch:
+            print("Excel处理失败,已停止导出!")
+            return False
+    print(f'结构体解析缓存 {struct_cache.stats()}')
+
+    if args.watch:
+        from core.watch import ExcelWatcher
+        watcher = ExcelWatcher(type_system, cache_system, struct_cache, file_configs, CUSTOM_TYPES_FILE,
+                               failed_files, args.sort_by_key, create_exporter_options(args, cache_system))
+        watcher.run()
+        return True
+
+    configs, errors = process_merge_configs(configs, type_system, args.sort_by_key)
+    if len(errors) > 0:
+        for es in errors:
+            print(es)
+        print("合并配置失败,已停止导出!")
+        return False
+
+    errors = process_valid_configs(configs, check_links=not getattr(args, 'sql_link_check', False))
+    if len(errors) > 0:
+        for es in errors:
+            print(es)
+        print("数据校验失败,已停止导出!")
+        return False
+
+    try:
+        errors = process_export_configs(configs, type_system, cache_system,
+                                        exporter_options=create_exporter_options(args, cache_system))
+    except SqlLinkCheckError as e:
+        for es in e.errors:
+            print(es)
+        print("数据校验失败,已停止导出!")
+        return False
+    if len(errors) > 0:
+        for es in errors:
+            print(es)
+        print("导出数据失败,已停止导出!")
+        return False
+    cache_system.save_cache()
+    return True
+
+
+def process_pipeline(args, type_system: TypeSystem, cache_system: CacheSystem, struct_cache: LruCache = None,
+                     selection: ExportSelection = None) -> bool:
+    # 流水线模式，逐表读取、校验、导出，内存中只保留链接校验所需的键索引
+    from core.pipeline import StreamingPipeline
+    if struct_cache is None:
+        struct_cache = LruCache(args.struct_cache_size)
+    pipeline = StreamingPipeline(type_system, cache_system, struct_cache, getattr(args, 'pipeline', None) or 2,
+                                 args.sort_by_key, selection, create_exporter_options(args, cache_system))
+    errors = pipeline.run()
+    if len(errors) > 0:
+        for es in errors:
+            print(es)
+        print("流水线处理失败,已停止导出!")
+        return False
+    # 限定范围时未导出的修改留到之后的导出
+    cache_system.save_cache(pipeline.exported_files if selection is not None else None)
+    return True
+
+
+def process_shard(args, type_system: TypeSystem, cache_system: CacheSystem, shard,
+                  struct_cache: LruCache = None) -> bool:
+    # 分片导出，只处理分配到本分片的Excel，链接到其它分片的值与键索引、多语言一起写入清单，由合并步骤校验
+    from core.exporters.factory import create_exporter
+    from core.i18n.i18n_manager import I18NFragment
+    from core.processors.validators import LinkValidator
+    from core.shard import ShardPlanner, save_manifest, remove_manifest
+    from core.utils.footprint import FootprintFragment
+
+    remove_manifest(args.shard_dir, shard)
+    if struct_cache is None:
+        struct_cache = LruCache(args.struct_cache_size)
+    planner = ShardPlanner(type_system, cache_system, struct_cache)
+    try:
+        planner.plan(shard.count)
+    except Exception as e:
+        print(f'读取表头失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}')
+        print("分片导出失败,已停止导出!")
+        return False
+    shard_files = planner.get_files(shard)
+    print(f'分片 {shard.index}/{shard.count} 负责 {len(shard_files)} 个Excel')
+
+    configs = []
+    errors = []
+    for file_path in shard_files:
+        config, es = process_single_file(file_path, type_system, cache_system, struct_cache)
+        errors.extend(es)
+        if config:
+            configs.extend(config)
+    if len(errors) > 0:
+        for es in errors:
+            print(es)
+        print("Excel处理失败,已停止导出!")
+        return False
+
+    configs, errors = process_merge_configs(configs, type_system, args.sort_by_key)
+    if len(errors) == 0:
+        link_validator = LinkValidator(set(planner.table_order) - planner.get_tables(shard))
+        errors = process_valid_configs(configs, link_validator)
+    if len(errors) == 0:
+        exporter = create_exporter(type_system, I18NFragment(), footprints=FootprintFragment(),
+                                   **create_exporter_options(args, cache_system))
+        errors = process_export_configs(configs, type_system, cache_system, exporter, export_names=planner.table_order)
+    if len(errors) > 0:
+        for es in errors:
+            print(es)
+        print("分片导出失败,已停止导出!")
+        return False
+    save_manifest(args.shard_dir, shard, planner.build_manifest(shard, configs, link_validator, exporter))
+    cache_system.save_cache(shard_files)
+    return True
+
+
+def merge_shards(args) -> bool:
+    """合并所有分片的清单，完成跨分片校验并写入多语言"""
+    from core.shard import ShardMerger
+    try:
+        type_system = TypeSystem(args.input_dir, args.output_dir, args.base_language, args.export_type)
+        type_system.load_custom_types(CUSTOM_TYPES_FILE)
+    except Exception as e:
+        print(f"[自定义类型系统] 初始化失败 错误信息: {e} \n异常堆栈: {traceback.format_exc()}")
+        return False
+    errors = ShardMerger(type_system, args.shard_dir, args.merge_shards).run()
+    if len(errors) > 0:
+        for es in errors:
+            print(es)
+        print("分片合并失败!")
+        return False
+    print(f'已合并 {args.merge_shards} 个分片')
+    return True
+
+
+def serve_exports(args):
+    """常驻导出服务，所有请求共用已解析的Excel"""
+    from core.server import ExportServer
+    struct_cache = LruCache(args.struct_cache_size)
+    # 输入目录 -> {Excel路径: 解析结果}
+    parts_memos = {}
+
+    def run_job(request: dict) -> bool:
+        job_args = argparse.Namespace(**request)
+        job_args.watch = False
+        parts_memo = parts_memos.setdefault(str(Path(job_args.input_dir).resolve()), {})
+        return run_export(job_args, struct_cache, parts_memo)
+
+    ExportServer(args.serve, run_job).serve_forever()
+
+
+@timer_decorator
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_dir", type=str, nargs='?')
+    parser.add_argument("output_dir", type=str, nargs='?')
+    parser.add_argument("--base_language", choices=['cs', 'cpp'], type=str, default='cs')
+    parser.add_argument("--export_type", choices=['json', 'csharp', 'bin', 'sqlite'], type=str, default='csharp')
+    parser.add_argument("--struct_cache_size", type=int, default=4096, help='结构体解析缓存条目数，0为关闭缓存')
+    parser.add_argument("--sort_by_key", action='store_true', help='合并后的数据按CheckRepeat字段排序')
+    parser.add_argument("--watch", action='store_true', help='常驻监听输入目录，Excel保存后增量导出')
+    parser.add_argument("--serve", type=str, metavar='SOCKET', help='以常驻服务方式运行，监听指定的Unix socket')
+    parser.add_argument("--server", type=str, metavar='SOCKET', help='将导出请求发送给已启动的常驻服务')
+    parser.add_argument("--trace", type=str, metavar='FILE', help='记录各阶段耗时，输出Chrome Trace JSON文件')
+    parser.add_argument("--memory_report", action='store_true', help='统计每个Excel及每张表的内存峰值和最大的分配位置')
+    parser.add_argument("--layout_report", action='store_true', help='输出每张表优化字段顺序前后每行及整个数组的字节数')
+    parser.add_argument("--max_memory_per_workbook", type=int, metavar='MB',
+                        help='单个Excel的内存预算，预计超出时改用流式读取并串行解析')
+    parser.add_argument("--pipeline", type=int, metavar='N',
+                        help='流水线模式，逐表读取校验导出后释放，N为同时在内存中的表数量上限')
+    parser.add_argument("--only", type=str, nargs='+', metavar='NAME', help='只导出指定导出名称的表')
+    parser.add_argument("--files", type=str, nargs='+', metavar='GLOB',
+                        help='只导出匹配的Excel中的表，通配符相对输入目录或只匹配文件名')
+    parser.add_argument("--changed-since", dest='changed_since', type=str, metavar='REV',
+                        help='只导出git指定版本以来修改过的Excel中的表')
+    parser.add_argument("--patch", action='store_true',
+                        help='二进制导出时对比上次导出的每行数据，为修改的表生成增量补丁及变化日志')
+    parser.add_argument("--compress", choices=['zlib', 'lzma'], type=str,
+                        help='二进制导出时按块压缩，按主键查找只需解压一块，zlib适合运行时读取，lzma适合归档')
+    parser.add_argument("--block_rows", type=int, default=256, metavar='N', help='分块压缩时每块的行数')
+    parser.add_argument("--soa", type=str, nargs='+', metavar='NAME',
+                        help='C#导出时指定的表按列存储，每个字段一个数组，按行访问时才组装')
+    parser.add_argument("--sql_link_check", action='store_true',
+                        help='SQLite导出时不在内存中校验CheckLink，改为提交前在数据库中以索引反连接校验')
+    parser.add_argument("--shard", type=str, metavar='i/N', help='分片导出，只处理按路径哈希分配到第i个分片的Excel')
+    parser.add_argument("--merge_shards", type=int, metavar='N', help='合并N个分片的清单，完成跨分片校验和多语言合并')
+    parser.add_argument("--shard_dir", type=str, default='./__cache__/shards', help='分片清单目录')
+    args = parser.parse_args()
+    if args.serve:
+        serve_exports(args)
+        return
+    if args.input_dir is None or args.output_dir is None:
+        parser.error('需要指定 input_dir 和 output_dir')
+    if args.watch and create_selection(args) is not None:
+        parser.error('--watch 不能与 --only、--files、--changed-since 同时使用')
+    if args.patch and args.export_type != 'bin':
+        parser.error('--patch 只支持 --export_type bin')
+    if args.compress and args.export_type != 'bin':
+        parser.error('--compress 只支持 --export_type bin')
+    if args.compress and args.patch:
+        parser.error('--compress 不能与 --patch 同时使用')
+    if args.soa and args.export_type != 'csharp':
+        parser.error('--soa 只支持 --export_type csharp')
+    if args.block_rows < 1:
+        parser.error('--block_rows 需要大于0')
+    if args.sql_link_check:
+        if args.export_type != 'sqlite':
+            parser.error('--sql_link_check 只支持 --export_type sqlite')
+        if args.watch or args.pipeline or create_selection(args) is not None:
+            parser.error('--sql_link_check 不能与 --watch、--pipeline 及导出范围参数同时使用')
+    if args.shard:
+        if args.patch:
+            parser.error('--shard 不能与 --patch 同时使用')
+        if args.export_type == 'sqlite':
+            parser.error('--shard 不支持 --export_type sqlite，所有分片写入同一个数据库')
+        if args.watch or args.server or args.pipeline or args.merge_shards or create_selection(args) is not None:
+            parser.error('--shard 不能与 --watch、--server、--pipeline、--merge_shards 及导出范围参数同时使用')
+        from core.shard import ShardSpec
+        try:
+            args.shard = ShardSpec.parse(args.shard)
+        except ShardError as e:
+            parser.error(str(e))
+    if args.merge_shards:
+        if args.merge_shards < 1:
+            parser.error('--merge_shards 需要大于0')
+        if not merge_shards(args):
+            exit(1)
+        return
+
+    if args.server:
+        from core.server import request_export
+        if args.watch:
+            parser.error('--watch 不能与 --server 同时使用')
+        # 服务进程的工作目录可能不同，路径统一转为绝对路径
+        request = {
+            'input_dir': str(Path(args.input_dir).resolve()),
+            'output_dir': str(Path(args.output_dir).resolve()),
+            'base_language': args.base_language,
+            'export_type': args.export_type,
+            'struct_cache_size': args.struct_cache_size,
+            'sort_by_key': args.sort_by_key,
+            'max_memory_per_workbook': args.max_memory_per_workbook,
+            'pipeline': args.pipeline,
+            'only': args.only,
+            'files': args.files,
+            'changed_since': args.changed_since,
+            'patch': args.patch,
+            'compress': args.compress,
+            'block_rows': args.block_rows,
+            'soa': args.soa,
+            'sql_link_check': args.sql_link_check,
+        }
+        ok = request_export(args.server, request)
+    else:
+        if args.trace:
+            tracer.enable()
+        if args.memory_report or args.max_memory_per_workbook:
+            memory_monitor.enable(trace_allocations=args.memory_report)
+        if args.layout_report:
+            layout_report.enable()
+        ok = run_export(args)
+        if args.trace:
+            tracer.save(args.trace)
+            print(tracer.summary())
+            print(f'追踪文件已保存: {args.trace}')
+        if args.memory_report:
+            print(memory_monitor.report())
+        if args.layout_report:
+            print(layout_report.report())
+    if not ok:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
+    print("导出完成!")